@@ -40,7 +40,8 @@ def get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument('--input', '-i', dest='input', type=str,
                         choices=['DirectShow', 'CVCapture', 'ScreenCapture',
-                                 'AVFoundationCapture', 'CVFile'])
+                                 'AVFoundationCapture', 'CVFile',
+                                 'FFmpegPipe', 'ImageDirectory'])
     parser.add_argument('--input_file', '-f', dest='input_file', type=str,
                         nargs='*', help='Input video file. '
                         'Other flags can refer this flag as __INPUT_FILE__')
@@ -54,6 +55,8 @@ def get_args():
                         'If this is specified, the data is not uploaded.')
     parser.add_argument('--profile', dest='profile', action='store_true',
                         default=False)
+    parser.add_argument('--fps', dest='frame_rate', type=float,
+                        help='Frames per second to be analyzed.')
     parser.add_argument('--time', '-t', dest='time', type=str)
     parser.add_argument('--time_msec', dest='time_msec', type=int)
     parser.add_argument('--video_id', dest='video_id', type=str)
@@ -25,7 +25,7 @@ import time
 
 import ikalog.constants
 from ikalog.utils import *
-from ikalog.utils.character_recoginizer import DeadlyWeaponRecoginizer
+from ikalog.utils.character_recoginizer import deadly_weapon_recoginizers
 from ikalog.utils.neuralnet.weapon import WeaponClassifier
 import cv2
 import numpy as np
@@ -84,11 +84,15 @@ class APIServer(object):
         h = payload['sample_height']
         images = self._unpack_deadly_weapons_image(payload)
         lang = payload['game_language']
-        deadly_weapon_recoginizer = DeadlyWeaponRecoginizer(lang)
+        deadly_weapon_recoginizer = deadly_weapon_recoginizers.get(lang)
+
+        if deadly_weapon_recoginizer is None:
+            return {'status': 'error',
+                    'description': 'No deadly weapon model for %s' % lang}
 
         votes = {}
         for image in images:
-            weapon_id = deadly_weapon_recoginizer.predict(image)
+            weapon_id = deadly_weapon_recoginizer.match(image)
             votes[weapon_id] = votes.get(weapon_id, 0) + 1
 
         best_result = (None, 0)
@@ -28,6 +28,7 @@ import time
 import traceback
 
 from ikalog.utils import *
+from ikalog.utils.image_writer import ImageWriter
 from . import scenes
 
 # The IkaLog core engine.
@@ -167,6 +168,7 @@ class IkaEngine:
 
         t = self.capture.get_current_timestamp()
         context['engine']['msec'] = t
+        context['engine']['input_stats'] = self.capture.get_frame_stats()
         context['engine']['frame'] = frame
         context['engine']['preview'] = copy.deepcopy(frame)
         context['game']['offset_msec'] = IkaUtils.get_game_offset_msec(context)
@@ -178,6 +180,9 @@ class IkaEngine:
     def stop(self):
         if not self._stop:
             self.call_plugins('on_stop')
+
+            # Write out the files the plugins have queued.
+            self.get_service('image_writer').flush()
         self._stop = True
 
     def is_stopped(self):
@@ -208,10 +213,10 @@ class IkaEngine:
 
             'inkling_state': [None, None],
 
-            # Dict mapping from event_name (e.g. objective) to lists of lists
-            # of msec time and value.
+            # Dict mapping from event_name (e.g. objective) to EventSeries,
+            # which work as lists of lists of msec time and value.
             # e.g. 'events': {'objective': [[0, 0], [320, 99]]}
-            'events': {},
+            'events': EventTimeline(),
 
             # Float values of start and end times scince the epoch in second.
             # They are used with IkaUtils.GetTime.
@@ -236,6 +241,8 @@ class IkaEngine:
                 'source_file': None,  # file path if input is a file.
                 'frame': None,
                 'msec': None,
+                # Frame counters of the realtime input, or None.
+                'input_stats': None,
                 'service': {
                     'call_plugins': self.call_plugins,
                     'call_plugins_later': self.call_plugins_later,
@@ -257,7 +264,6 @@ class IkaEngine:
 
     def session_close(self):
         context = self.context
-        self.session_close_wdt = None
 
         if not context['game']['end_time']:
             # end_time should be initialized in GameFinish.
@@ -266,6 +272,9 @@ class IkaEngine:
             context['game']['end_offset_msec'] = context['engine']['msec']
 
         self.call_plugins('on_game_session_end')
+        # Cleared after the plugins, as a pending result delivered in
+        # on_game_session_end re-arms the watchdog.
+        self.session_close_wdt = None
         self.reset()
 
     def session_abort(self):
@@ -481,6 +490,7 @@ class IkaEngine:
 
         self.output_plugins = [self]
         self._services = {}
+        self.set_service('image_writer', ImageWriter())
         self.last_capture = time.time() - 100
 
         self._stop = False
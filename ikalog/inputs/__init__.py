@@ -21,6 +21,8 @@
 from .input import VideoInput
 from .opencv_videocapture import CVCapture
 from .opencv_file import CVFile
+from .ffmpeg_pipe import FFmpegPipe
+from .image_directory import ImageDirectory
 from .opencv_gstreamer import GStreamer
 from .osx import *
 from .consolidated_input import ConsolidatedInput
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import os
+import queue
+import re
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+from ikalog.utils import *
+from ikalog.inputs import VideoInput
+
+_re_pts_time = re.compile(r'pts_time:\s*([-0-9.]+)')
+
+
+class FFmpegPipe(VideoInput):
+    """
+    Reads video files through a local ffmpeg process.
+
+    ffmpeg decodes the video and emits raw BGR frames (1280x720) to a pipe.
+    Scaling, frame rate decimation and optional cropping are done inside
+    ffmpeg, on its own threads. Frames are read into preallocated buffers.
+
+    Note: The frame returned by read_frame() is one of the buffers, and
+    will be overwritten after num_buffers frames are read.
+    """
+
+    cap_recorded_video = True
+
+    # Number of frame buffers.
+    num_buffers = 4
+
+    # override
+    def _initialize_driver_func(self):
+        self._cleanup_driver_func()
+
+    # override
+    def _cleanup_driver_func(self):
+        self.lock.acquire()
+        try:
+            self._stop_process()
+            self._source_file = None
+            self.reset()
+        finally:
+            self.lock.release()
+
+    # override
+    def _is_active_func(self):
+        return (self._source_file is not None)
+
+    # override
+    def _select_device_by_index_func(self, source):
+        raise Exception(
+            '%s does not support selecting device by index.' % self)
+
+    # override
+    def _select_device_by_name_func(self, source):
+        if isinstance(source, str):
+            self._file_queue.put(source)
+        elif isinstance(source, list):
+            for item in source:
+                self._file_queue.put(item)
+        else:
+            return False
+
+        return self._init_with_sources()
+
+    # override
+    def put_source_file(self, file_path):
+        self._file_queue.put(file_path)
+        if self._source_file is None:
+            self._init_with_sources()
+        return True
+
+    # override
+    def on_eof(self):
+        return self._init_with_sources()
+
+    def _init_with_sources(self):
+        self._stop_process()
+
+        if self._file_queue.empty():
+            self._source_file = None
+            return False
+
+        self._source_file = self._file_queue.get()
+        self._start_msec = 0
+        self.reset_tick()
+
+        return self.is_active()
+
+    def _build_command(self):
+        filters = []
+
+        if self._crop is not None:
+            x, y, w, h = self._crop
+            filters.append('crop=%d:%d:%d:%d' % (w, h, x, y))
+
+        if self.fps_requested and not self.frame_skip_rt:
+            # round=up picks the first frame at or after each tick,
+            # same as the frame skipping of the other drivers.
+            filters.append('fps=%s:round=up' % self.fps_requested)
+
+        filters.append('scale=%d:%d' % (self.out_width, self.out_height))
+        # Timestamps of the output frames are reported to stderr.
+        filters.append('showinfo')
+
+        cmd = [self._ffmpeg_path, '-nostdin', '-hide_banner', '-nostats']
+
+        if self._start_msec:
+            # Input seeking (fast).
+            cmd.extend(['-ss', '%.3f' % (self._start_msec / 1000.0)])
+
+        cmd.extend(self._input_args)
+        cmd.extend([
+            '-i', self._source_file,
+            '-an', '-sn',
+            '-vf', ','.join(filters),
+            '-pix_fmt', 'bgr24',
+            '-f', 'rawvideo',
+            'pipe:1',
+        ])
+        return cmd
+
+    def _stderr_reader(self, process, pts_queue):
+        for line in iter(process.stderr.readline, b''):
+            line = line.decode('utf-8', 'replace')
+            m = _re_pts_time.search(line)
+            if m:
+                pts_queue.put(float(m.group(1)))
+            elif self._debug or ('error' in line.lower()):
+                IkaUtils.dprint('%s: %s' % (self, line.rstrip()))
+
+    def _start_process(self):
+        cmd = self._build_command()
+        if self._debug:
+            IkaUtils.dprint('%s: %s' % (self, ' '.join(cmd)))
+
+        frame_size = self.out_width * self.out_height * 3
+        self._process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=frame_size,
+        )
+        self._pts_queue = queue.Queue()
+        self._pts_count = 0
+        self._frame_count = 0
+
+        thread = threading.Thread(
+            target=self._stderr_reader,
+            args=(self._process, self._pts_queue),
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _stop_process(self):
+        if self._process is None:
+            return
+
+        try:
+            self._process.kill()
+            self._process.wait()
+            self._process.stdout.close()
+        except:
+            pass
+        self._process = None
+
+    def _read_into(self, buf):
+        """Returns True if the whole frame was read into buf."""
+        view = memoryview(buf).cast('B')
+        pos = 0
+        while pos < len(view):
+            n = self._process.stdout.readinto(view[pos:])
+            if not n:
+                return False
+            pos = pos + n
+        return True
+
+    def _next_timestamp(self):
+        # showinfo reports one pts_time per frame, in order.
+        while self._pts_count < self._frame_count:
+            try:
+                pts = self._pts_queue.get(timeout=1.0)
+            except queue.Empty:
+                break
+            self._pts_count = self._pts_count + 1
+
+        if self._pts_count < self._frame_count:
+            # Estimate from the frame rate if ffmpeg didn't tell (yet).
+            if not self.fps_requested:
+                return self.get_tick()
+            pts = (self._frame_count - 1) / self.fps_requested
+
+        return self._start_msec + pts * 1000.0
+
+    # override
+    def _read_frame_func(self):
+        if self._process is None:
+            self._start_process()
+
+        buf = self._buffers[self._buffer_index]
+        self._buffer_index = (self._buffer_index + 1) % len(self._buffers)
+
+        if not self._read_into(buf):
+            self._stop_process()
+            raise EOFError()
+
+        self._frame_count = self._frame_count + 1
+        self._current_msec = self._next_timestamp()
+        return buf
+
+    # override
+    def _skip_frame_recorded(self):
+        # ffmpeg already decimated the frames.
+        if self.frame_skip_rt:
+            return super(FFmpegPipe, self)._skip_frame_recorded()
+
+    # override
+    def _get_current_timestamp_func(self):
+        if self._current_msec is None:
+            return self.get_tick()
+        return self._current_msec
+
+    # override
+    def set_frame_rate(self, fps=None, realtime=False):
+        super(FFmpegPipe, self).set_frame_rate(fps, realtime)
+        if getattr(self, '_process', None) is not None:
+            self._restart_at(self._current_msec or 0)
+
+    # override
+    def set_pos_msec(self, pos_msec):
+        """Moves the video position to |pos_msec| in msec."""
+        self._restart_at(pos_msec)
+
+    def _restart_at(self, pos_msec):
+        self.lock.acquire()
+        try:
+            self._stop_process()
+            self._start_msec = pos_msec
+            self._current_msec = None
+        finally:
+            self.lock.release()
+
+    # override
+    def get_source_file(self):
+        return self._source_file
+
+    def set_crop(self, crop=None):
+        """
+        Crop the source image before scaling.
+        crop: (x, y, width, height) in the source resolution, or None.
+        """
+        self._crop = crop
+
+    def __init__(self, ffmpeg_path='ffmpeg', input_args=None, crop=None,
+                 debug=False):
+        self._ffmpeg_path = ffmpeg_path
+        self._input_args = input_args or []
+        self._crop = crop
+        self._debug = debug
+
+        self._process = None
+        self._pts_queue = None
+        self._pts_count = 0
+        self._frame_count = 0
+        self._source_file = None
+        self._file_queue = queue.Queue()
+        self._start_msec = 0
+        self._current_msec = None
+
+        self._buffers = [
+            np.empty((self.out_height, self.out_width, 3), dtype=np.uint8)
+            for i in range(self.num_buffers)
+        ]
+        self._buffer_index = 0
+
+        super(FFmpegPipe, self).__init__()
+
+if __name__ == "__main__":
+    import sys
+
+    obj = FFmpegPipe()
+    obj.select_source(name=sys.argv[1])
+
+    k = 0
+    while k != 27:
+        frame = obj.read_frame()
+        if frame is not None:
+            cv2.imshow(obj.__class__.__name__, frame)
+        k = cv2.waitKey(1)
@@ -78,44 +78,15 @@ from ikalog.utils import *
 
 class OffsetFilter(Filter):
 
-    def filter_matches(self, kp1, kp2, matches, ratio=0.75):
-        mkp1, mkp2 = [], []
-        for m in matches:
-            if len(m) == 2 and m[0].distance < m[1].distance * ratio:
-                m = m[0]
-                mkp1.append(kp1[m.queryIdx])
-                mkp2.append(kp2[m.trainIdx])
-        p1 = np.float32([kp.pt for kp in mkp1])
-        p2 = np.float32([kp.pt for kp in mkp2])
-        kp_pairs = zip(mkp1, mkp2)
-        return p1, p2, kp_pairs
-
     def calibrateWarp(self, capture_image):
         capture_image_gray = cv2.cvtColor(capture_image, cv2.COLOR_BGR2GRAY)
 
-        capture_image_keypoints, capture_image_descriptors = self.detector.detectAndCompute(
-            capture_image_gray, None)
-        print('caputure_image - %d features' % (len(capture_image_keypoints)))
-
-        print('matching...')
-
-        raw_matches = self.matcher.knnMatch(
-            self.calibration_image_descriptors,
-            trainDescriptors=capture_image_descriptors,
-            k=2
-        )
-        p1, p2, kp_pairs = self.filter_matches(
-            self.calibration_image_keypoints,
-            capture_image_keypoints,
-            raw_matches,
-        )
+        H, status = self.aligner.find_homography(capture_image_gray)
 
-        if len(p1) >= 4:
-            H, status = cv2.findHomography(p1, p2, cv2.RANSAC, 5.0)
+        if H is not None:
             print('%d / %d  inliers/matched' % (np.sum(status), len(status)))
         else:
-            H, status = None, None
-            print('%d matches found, not enough for homography estimation' % len(p1))
+            print('not enough matches found for homography estimation')
             self.calibration_requested = False
             return False
 
@@ -124,17 +95,7 @@ class OffsetFilter(Filter):
             self.calibration_requested = False
             return False
 
-        calibration_image_height, calibration_image_width = self.calibration_image_size
-
-        corners = np.float32(
-            [[0, 0],
-             [calibration_image_width, 0],
-             [calibration_image_width, calibration_image_height],
-             [0, calibration_image_height]]
-        )
-
-        pts1 = np.float32(cv2.perspectiveTransform(
-            corners.reshape(1, -1, 2), H).reshape(-1, 2) + (0, 0))
+        pts1 = self.aligner.corners(H)
 
         IkaUtils.dprint('pts1: %s' % [pts1])
         IkaUtils.dprint('pts2: %s' % [self.pts2])
@@ -156,6 +117,7 @@ class OffsetFilter(Filter):
         self.detector = model_object.detector
         self.norm = model_object.norm
         self.matcher = model_object.matcher
+        self.aligner = model_object.aligner
 
         self.calibration_image_size = model_object.calibration_image_size
         self.calibration_image_keypoints = model_object.calibration_image_keypoints
@@ -171,15 +133,21 @@ class OffsetFilter(Filter):
         self.pts2 = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
         self.offset = (0, 0)
 
-    def pre_execute(self, frame):
-        return True
+    @property
+    def offset(self):
+        return self._offset
 
-    def execute(self, frame):
-        if not (self.enabled and self.pre_execute(frame)):
-            return frame
+    @offset.setter
+    def offset(self, offset):
+        # The offset is an integer translation, so it is compiled into
+        # a pair of slices rather than a remap table.
+        self._offset = offset
+        self._slices = None
 
-        ox = self.offset[0]
-        oy = self.offset[1]
+        ox = int(offset[0])
+        oy = int(offset[1])
+        if (ox, oy) == (0, 0):
+            return
 
         sx1 = max(-ox, 0)
         sy1 = max(-oy, 0)
@@ -193,8 +161,24 @@ class OffsetFilter(Filter):
         w = min(out_width - dx1, out_width - sx1)
         h = min(out_height - dy1, out_height - sy1)
 
+        self._slices = (
+            (slice(dy1, dy1 + h), slice(dx1, dx1 + w)),
+            (slice(sy1, sy1 + h), slice(sx1, sx1 + w)),
+        )
+
+    def pre_execute(self, frame):
+        return True
+
+    def execute(self, frame):
+        if not (self.enabled and self.pre_execute(frame)):
+            return frame
+
+        if self._slices is None:
+            return frame
+
+        dst, src = self._slices
         new_frame = np.zeros(frame.shape, np.uint8)
-        new_frame[dy1:dy1 + h, dx1:dx1 + w] = frame[sy1:sy1 + h, sx1:sx1 + w]
+        new_frame[dst] = frame[src]
         return new_frame
 
     def __init__(self, parent, debug=False):
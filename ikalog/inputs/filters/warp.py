@@ -92,18 +92,6 @@ class WarpCalibrationUnacceptableSize(WarpCalibrationException):
 
 class WarpFilter(Filter):
 
-    def filter_matches(self, kp1, kp2, matches, ratio=0.75):
-        mkp1, mkp2 = [], []
-        for m in matches:
-            if len(m) == 2 and m[0].distance < m[1].distance * ratio:
-                m = m[0]
-                mkp1.append(kp1[m.queryIdx])
-                mkp2.append(kp2[m.trainIdx])
-        p1 = np.float32([kp.pt for kp in mkp1])
-        p2 = np.float32([kp.pt for kp in mkp2])
-        kp_pairs = zip(mkp1, mkp2)
-        return p1, p2, kp_pairs
-
     def set_bbox(self, x, y, w, h):
         corners = np.float32(
             [[x, y], [x + w, y], [w + x, y + h], [x, y + h]]
@@ -115,34 +103,18 @@ class WarpFilter(Filter):
         IkaUtils.dprint('pts2: %s' % [self.pts2])
 
         self.M = cv2.getPerspectiveTransform(self.pts1, self.pts2)
+        self._compile_maps()
         return True
 
     def calibrateWarp(self, capture_image, validation_func=None):
         capture_image_gray = cv2.cvtColor(capture_image, cv2.COLOR_BGR2GRAY)
 
-        capture_image_keypoints, capture_image_descriptors = self.detector.detectAndCompute(
-            capture_image_gray, None)
-        print('caputure_image - %d features' % (len(capture_image_keypoints)))
-
-        print('matching...')
+        H, status = self.aligner.find_homography(capture_image_gray)
 
-        raw_matches = self.matcher.knnMatch(
-            self.calibration_image_descriptors,
-            trainDescriptors=capture_image_descriptors,
-            k=2
-        )
-        p1, p2, kp_pairs = self.filter_matches(
-            self.calibration_image_keypoints,
-            capture_image_keypoints,
-            raw_matches,
-        )
-
-        if len(p1) >= 4:
-            H, status = cv2.findHomography(p1, p2, cv2.RANSAC, 5.0)
+        if H is not None:
             print('%d / %d  inliers/matched' % (np.sum(status), len(status)))
         else:
-            H, status = None, None
-            print('%d matches found, not enough for homography estimation' % len(p1))
+            print('not enough matches found for homography estimation')
             self.calibration_requested = False
             raise WarpCalibrationNotFound()
 
@@ -154,17 +126,7 @@ class WarpFilter(Filter):
         if len(status) < 1000:
             raise WarpCalibrationNotFound()
 
-        calibration_image_height, calibration_image_width = self.calibration_image_size
-
-        corners = np.float32(
-            [[0, 0],
-             [calibration_image_width, 0],
-             [calibration_image_width, calibration_image_height],
-             [0, calibration_image_height]]
-        )
-
-        pts1 = np.float32(cv2.perspectiveTransform(
-            corners.reshape(1, -1, 2), H).reshape(-1, 2) + (0, 0))
+        pts1 = self.aligner.corners(H)
 
         IkaUtils.dprint('pts1: %s' % [pts1])
         IkaUtils.dprint('pts2: %s' % [self.pts2])
@@ -176,8 +138,52 @@ class WarpFilter(Filter):
                 raise WarpCalibrationUnacceptableSize((w, h))
 
         self.M = cv2.getPerspectiveTransform(pts1, self.pts2)
+        self._compile_maps()
         return True
 
+    def _compile_maps(self):
+        """
+        Compile self.M into fixed-point remap tables, so that each frame
+        is warped by a table lookup instead of a projective division per
+        pixel.
+        """
+        self.map1 = None
+        self.map2 = None
+
+        if np.allclose(self.M, np.eye(3)):
+            # Nothing to do.
+            return
+
+        w, h = self.out_size
+        xs, ys = np.meshgrid(
+            np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+        dst = np.dstack((xs, ys)).reshape(1, -1, 2)
+
+        # For each output pixel, where to pick up from the input.
+        src = cv2.perspectiveTransform(dst, np.linalg.inv(self.M))
+        map_x = src[0, :, 0].reshape(h, w)
+        map_y = src[0, :, 1].reshape(h, w)
+
+        self.map1, self.map2 = cv2.convertMaps(
+            map_x, map_y, cv2.CV_16SC2, nninterpolation=False)
+
+    def loadCalibrationFromFile(self, file):
+        f = open(file, 'rb')
+        d = pickle.load(f)
+        f.close()
+        self.M = d['M']
+        self.map1 = d['map1']
+        self.map2 = d['map2']
+
+    def saveCalibrationToFile(self, file):
+        f = open(file, 'wb')
+        pickle.dump({
+            'M': self.M,
+            'map1': self.map1,
+            'map2': self.map2,
+        }, f)
+        f.close()
+
     def tuples2keyPoints(self, tuples):
         new_l = []
         for point in tuples:
@@ -219,6 +225,7 @@ class WarpFilter(Filter):
         self.detector = model_object.detector
         self.norm = model_object.norm
         self.matcher = model_object.matcher
+        self.aligner = model_object.aligner
 
         self.calibration_image_size = model_object.calibration_image_size
         self.calibration_image_keypoints = model_object.calibration_image_keypoints
@@ -231,8 +238,10 @@ class WarpFilter(Filter):
         w = 1280
         h = 720
 
+        self.out_size = (w, h)
         self.pts2 = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
         self.M = cv2.getPerspectiveTransform(self.pts2, self.pts2)
+        self._compile_maps()
 
     def pre_execute(self, frame):
         return True
@@ -241,7 +250,12 @@ class WarpFilter(Filter):
         if not (self.enabled and self.pre_execute(frame)):
             return frame
 
-        return cv2.warpPerspective(frame, self.M, (1280, 720))
+        if self.map1 is None:
+            if frame.shape[:2] == (self.out_size[1], self.out_size[0]):
+                return frame
+            return cv2.warpPerspective(frame, self.M, self.out_size)
+
+        return cv2.remap(frame, self.map1, self.map2, cv2.INTER_LINEAR)
 
     def __init__(self, parent, debug=False):
         super().__init__(parent, debug=debug)
@@ -73,6 +73,7 @@ import cv2
 import numpy as np
 
 from ikalog.utils import *
+from ikalog.utils.feature_aligner import FeatureAligner
 
 class WarpFilterModel(object):
 
@@ -157,6 +158,13 @@ class WarpFilterModel(object):
             self.saveModelToFile(model_filename)
             IkaUtils.dprint('%s: Created model %s' % (self, model_filename))
 
+        # Shared by WarpFilter and OffsetFilter instances.
+        self.aligner = FeatureAligner(
+            self.calibration_image_keypoints,
+            self.calibration_image_descriptors,
+            self.calibration_image_size,
+        )
+
         self.trained = True
 
 
@@ -18,6 +18,9 @@
 #  limitations under the License.
 #
 
+import cv2
+import numpy as np
+
 from ikalog.inputs.filters import Filter
 from ikalog.utils import *
 
@@ -48,20 +51,38 @@ class WhiteBalanceFilter(Filter):
             return img
         return self.filterImage(img)
 
+    @staticmethod
+    def build_lut(coffs):
+        """
+        Build a 256-entry lookup table per channel for the coefficients.
+        Returns an array of shape (1, 256, 3) which can be passed to cv2.LUT.
+        """
+        levels = np.arange(256, dtype=np.float32)
+        lut = np.empty((1, 256, len(coffs)), np.uint8)
+        for n in range(len(coffs)):
+            lut[0, :, n] = np.minimum(levels * coffs[n], 255)
+        return lut
+
+    @property
+    def coffs(self):
+        return self._coffs
+
+    @coffs.setter
+    def coffs(self, coffs):
+        # The coefficients change only on calibration.
+        self._coffs = coffs
+        self._lut = None if coffs is None else self.build_lut(coffs)
+
     def filterImage(self, img, coffs=None):
         if coffs is None:
-            coffs = self.coffs
+            lut = self._lut
+        else:
+            lut = self.build_lut(coffs)
 
-        if coffs is None:
+        if lut is None:
             return img
 
-        img_work = np.array(img, np.float32)
-
-        for n in range(len(coffs)):
-            img_work[:, :, n] = img_work[:, :, n] * coffs[n]
-            img_work[img_work > 255] = 255
-
-        return np.array(img_work, np.uint8)
+        return cv2.LUT(img, lut)
 
     def calibrateColor(self, capture_image):
         img_720p = cv2.resize(capture_image, (1280, 720))
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import time
+
+import cv2
+import numpy as np
+
+from ikalog.utils import *
+from ikalog.inputs import VideoInput
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python 3.7 or earlier.
+    shared_memory = None
+
+# Header layout (int64 words).
+_HDR_LATEST = 0
+_HDR_NUM_SLOTS = 1
+_HDR_HEIGHT = 2
+_HDR_WIDTH = 3
+_HDR_CHANNELS = 4
+_HDR_SIZE = 8
+
+# Per-slot words following the header: sequence number, timestamp (usec).
+_SLOT_WORDS = 2
+
+
+class FrameBus(object):
+    """
+    Ring buffer of frames in shared memory.
+
+    A producer process publishes numbered and timestamped frames, and
+    consumer processes attach the bus by its name and get views of the
+    frames without copying them through a pipe.
+
+    Each slot carries the sequence number of the frame in it. The
+    producer invalidates the slot while writing it, and consumers check
+    the number again after using the frame, so that a frame overwritten
+    in the meantime is detected (seqlock).
+    """
+
+    @staticmethod
+    def _attach_shm(name):
+        try:
+            # Python 3.13+: Don't let the resource tracker of a consumer
+            # process unlink the producer's memory on exit.
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            pass
+
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+        return shm
+
+    def _map(self):
+        buf = self._shm.buf
+        self._header = np.ndarray((_HDR_SIZE,), np.int64, buf)
+
+        num_slots = int(self._header[_HDR_NUM_SLOTS])
+        self.shape = (
+            int(self._header[_HDR_HEIGHT]),
+            int(self._header[_HDR_WIDTH]),
+            int(self._header[_HDR_CHANNELS]),
+        )
+        self.num_slots = num_slots
+
+        offset = _HDR_SIZE * 8
+        self._slots = np.ndarray(
+            (num_slots, _SLOT_WORDS), np.int64, buf, offset)
+
+        offset = offset + num_slots * _SLOT_WORDS * 8
+        self._frames = np.ndarray(
+            (num_slots,) + self.shape, np.uint8, buf, offset)
+
+    @classmethod
+    def create(cls, name=None, shape=(720, 1280, 3), num_slots=8):
+        """
+        Create a new bus (producer side).
+        """
+        if shared_memory is None:
+            raise Exception('FrameBus requires Python 3.8 or later.')
+
+        frame_size = int(np.prod(shape))
+        size = (_HDR_SIZE + num_slots * _SLOT_WORDS) * 8 + \
+            num_slots * frame_size
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((_HDR_SIZE,), np.int64, shm.buf)
+        header[:] = 0
+        header[_HDR_LATEST] = -1
+        header[_HDR_NUM_SLOTS] = num_slots
+        header[_HDR_HEIGHT:_HDR_CHANNELS + 1] = shape
+        del header
+
+        bus = cls(shm, owner=True)
+        bus._slots[:, 0] = -1
+        return bus
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach an existing bus by its name (consumer side).
+        """
+        if shared_memory is None:
+            raise Exception('FrameBus requires Python 3.8 or later.')
+
+        return cls(cls._attach_shm(name), owner=False)
+
+    def publish(self, frame, msec):
+        """
+        Publish a frame. Returns its sequence number.
+        """
+        assert frame.shape == self.shape
+
+        seq = int(self._header[_HDR_LATEST]) + 1
+        slot = seq % self.num_slots
+
+        self._slots[slot, 0] = -1
+        self._frames[slot][...] = frame
+        self._slots[slot, 1] = int(msec * 1000)
+        self._slots[slot, 0] = seq
+        self._header[_HDR_LATEST] = seq
+
+        return seq
+
+    def get_latest_seq(self):
+        return int(self._header[_HDR_LATEST])
+
+    def get_frame(self, seq):
+        """
+        Returns (view of the frame, msec) of the frame seq, or
+        (None, None) if the frame is not (or no longer) in the bus.
+        The view is valid while is_valid(seq) is True.
+        """
+        if seq < 0:
+            return None, None
+
+        slot = seq % self.num_slots
+        if self._slots[slot, 0] != seq:
+            return None, None
+
+        msec = self._slots[slot, 1] / 1000.0
+        return self._frames[slot], msec
+
+    def is_valid(self, seq):
+        """
+        Returns True if the frame seq has not been overwritten yet.
+        """
+        return self._slots[seq % self.num_slots, 0] == seq
+
+    def wait_next(self, last_seq, timeout=1.0, interval=0.002):
+        """
+        Wait for a frame newer than last_seq.
+        Returns the latest sequence number, or None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = self.get_latest_seq()
+            if seq > last_seq:
+                return seq
+            if time.monotonic() > deadline:
+                return None
+            time.sleep(interval)
+
+    def close(self):
+        if self._shm is None:
+            return
+
+        # Release the views before closing the mapping.
+        self._header = None
+        self._slots = None
+        self._frames = None
+
+        try:
+            self._shm.close()
+        except BufferError:
+            # Frames returned without copy are still referenced.
+            IkaUtils.dprint('%s: Frames are still in use' % self)
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __init__(self, shm, owner=False):
+        self._shm = shm
+        self._owner = owner
+        self.name = shm.name
+        self._map()
+
+
+class FrameBusInput(VideoInput):
+    """
+    Reads frames from a FrameBus published by another process.
+
+    roi:  (x1, y1, x2, y2) of the view in the published frame. The view
+          is scaled to 1280x720.
+    copy: If False, full-frame views of the shared memory are returned
+          as is. The caller must finish with the frame before the
+          producer wraps around the ring buffer.
+    """
+
+    # override
+    def _initialize_driver_func(self):
+        pass
+
+    # override
+    def _cleanup_driver_func(self):
+        if self._bus is not None:
+            self._bus.close()
+            self._bus = None
+
+    # override
+    def _is_active_func(self):
+        return (self._bus is not None)
+
+    # override
+    def _select_device_by_index_func(self, source):
+        raise Exception(
+            '%s does not support selecting device by index.' % self)
+
+    # override
+    def _select_device_by_name_func(self, source):
+        self._cleanup_driver_func()
+        try:
+            self._bus = FrameBus.attach(source)
+        except FileNotFoundError:
+            IkaUtils.dprint('%s: Frame bus "%s" not found' % (self, source))
+            return False
+        self._last_seq = -1
+        return True
+
+    def set_roi(self, roi=None):
+        self._roi = roi
+
+    def _extract(self, frame):
+        if self._roi is not None:
+            x1, y1, x2, y2 = self._roi
+            frame = frame[y1:y2, x1:x2]
+
+        if frame.shape[0] != self.out_height or \
+                frame.shape[1] != self.out_width:
+            return cv2.resize(
+                frame, (self.out_width, self.out_height),
+                interpolation=cv2.INTER_NEAREST)
+
+        return np.copy(frame) if self._copy else frame
+
+    # override
+    def _read_frame_func(self):
+        while True:
+            seq = self._bus.wait_next(self._last_seq)
+            if seq is None:
+                return None
+
+            view, msec = self._bus.get_frame(seq)
+            if view is None:
+                continue
+
+            frame = self._extract(view)
+
+            # The producer has wrapped around while copying.
+            if (frame is not view) and not self._bus.is_valid(seq):
+                continue
+
+            self._skipped = self._skipped + max(seq - self._last_seq - 1, 0)
+            self._last_seq = seq
+            self._current_msec = msec
+            return frame
+
+    # override
+    def _get_current_timestamp_func(self):
+        if self._current_msec is None:
+            return self.get_tick()
+        return self._current_msec
+
+    def get_skipped_frames(self):
+        """Returns the number of published frames this consumer missed."""
+        return self._skipped
+
+    def __init__(self, roi=None, copy=True):
+        self._bus = None
+        self._roi = roi
+        self._copy = copy
+        self._last_seq = -1
+        self._current_msec = None
+        self._skipped = 0
+        super(FrameBusInput, self).__init__()
+
+
+if __name__ == "__main__":
+    # Publish frames from a video file (or a capture device) to a bus.
+    #   python frame_bus.py video.mp4 ikalog_bus
+    import sys
+
+    source = cv2.VideoCapture(sys.argv[1])
+    bus = FrameBus.create(name=sys.argv[2])
+    IkaUtils.dprint('Publishing to frame bus %s' % bus.name)
+
+    try:
+        while True:
+            ret, frame = source.read()
+            if not ret:
+                break
+            if frame.shape != bus.shape:
+                frame = cv2.resize(frame, (bus.shape[1], bus.shape[0]))
+            bus.publish(frame, source.get(cv2.CAP_PROP_POS_MSEC))
+    finally:
+        bus.close()
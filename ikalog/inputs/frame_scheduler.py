@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import time
+
+import numpy as np
+
+
+class FrameScheduler(object):
+    """
+    Frame pacing for live inputs.
+
+    The input calls wait() before reading a frame, so that the frame is
+    read at its slot and is as fresh as the device can give, then calls
+    on_frame() with the frame read.
+
+    Slots are on a fixed grid of monotonic deadlines (1 / fps apart).
+    When the caller comes back after its slot has passed, the missed
+    slots are counted as dropped and the grid is realigned to now,
+    rather than reading frames in a burst to catch up.
+
+    Counters:
+      frames:    Frames delivered.
+      late:      Frames read after their slot has passed.
+      dropped:   Slots skipped because the caller could not keep up.
+      duplicate: Frames identical to the previous one (the device did
+                 not produce a new frame in time).
+    """
+
+    # Pixel stride for the duplicate frame check.
+    duplicate_check_stride = 16
+
+    def set_fps(self, fps=None):
+        self._interval = (1.0 / fps) if fps else None
+        self._deadline = None
+
+    def get_interval(self):
+        return self._interval
+
+    def wait(self):
+        """
+        Sleep until the next frame slot.
+        Returns the number of slots dropped before this one.
+        """
+        if self._interval is None:
+            return 0
+
+        now = self._clock()
+
+        if self._deadline is None:
+            self._deadline = now + self._interval
+            return 0
+
+        dropped = 0
+        if now < self._deadline:
+            self._sleep(self._deadline - now)
+        else:
+            lateness = now - self._deadline
+            if lateness > self._interval:
+                dropped = int(lateness / self._interval)
+                self.stats['dropped'] += dropped
+                self._deadline = now
+            self.stats['late'] += 1
+
+        self._deadline = self._deadline + self._interval
+        return dropped
+
+    def on_frame(self, frame):
+        """
+        Account the frame read. Returns True if it is a duplicate.
+        """
+        if frame is None:
+            return False
+
+        self.stats['frames'] += 1
+
+        s = self.duplicate_check_stride
+        sample = frame[::s, ::s]
+        duplicate = (self._last_sample is not None) and \
+            np.array_equal(sample, self._last_sample)
+        self._last_sample = sample.copy()
+
+        if duplicate:
+            self.stats['duplicate'] += 1
+
+        return duplicate
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def reset(self):
+        self.stats = {
+            'frames': 0,
+            'late': 0,
+            'dropped': 0,
+            'duplicate': 0,
+        }
+        self._deadline = None
+        self._last_sample = None
+
+    def __init__(self, fps=None, clock=None, sleep=None):
+        self._clock = clock or time.monotonic
+        self._sleep = sleep or time.sleep
+        self.reset()
+        self.set_fps(fps)
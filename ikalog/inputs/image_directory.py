@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import collections
+import glob
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from ikalog.utils import *
+from ikalog.inputs import VideoInput
+
+_image_extensions = ('.png', '.jpg', '.jpeg', '.bmp')
+
+# e.g. 20160512_123456, 2016-05-12 12-34-56
+_re_datetime = re.compile(
+    r'(\d{4})[-_]?(\d{2})[-_]?(\d{2})[-_ T]?(\d{2})[-_:]?(\d{2})[-_:]?(\d{2})')
+
+
+class ImageDirectory(VideoInput):
+    """
+    Reads a sequence of image files as a video.
+
+    The source is a directory, a glob pattern, or a list of files. Files
+    are read in the order of their names. Images are decoded by a thread
+    pool ahead of the engine, into a bounded queue which keeps the order.
+
+    Timestamps come from the date and time in the filenames
+    (e.g. 20160512_123456.png) if any, or from the mtime of the files,
+    or are interval_msec apart if timestamp='index'.
+    """
+
+    cap_recorded_video = True
+
+    # override
+    def _initialize_driver_func(self):
+        self._cleanup_driver_func()
+
+    # override
+    def _cleanup_driver_func(self):
+        self._files = []
+        self._next_file = 0
+        self._pending = collections.deque()
+        self._source_file = None
+        self._current_msec = None
+        self._epoch_time = None
+
+    # override
+    def _is_active_func(self):
+        # Stays active after the last image, so that EOFError is raised.
+        return len(self._files) > 0
+
+    # override
+    def _select_device_by_index_func(self, source):
+        raise Exception(
+            '%s does not support selecting device by index.' % self)
+
+    # override
+    def _select_device_by_name_func(self, source):
+        self._cleanup_driver_func()
+        self._files = self.list_files(source)
+        self._times = self._get_file_times(self._files)
+
+        IkaUtils.dprint('%s: %d images' % (self, len(self._files)))
+        # The indexes are not wall-clock times.
+        if len(self._times) and (self._timestamp != 'index'):
+            self._epoch_time = self._times[0] / 1000.0
+
+        self._frame_interval = None
+        if len(self._times) > 1:
+            interval = float(np.median(np.diff(self._times)))
+            if interval > 0:
+                self._frame_interval = interval
+
+        return self.is_active()
+
+    @staticmethod
+    def list_files(source):
+        if isinstance(source, list):
+            files = []
+            for item in source:
+                files.extend(ImageDirectory.list_files(item))
+            return files
+
+        if os.path.isdir(source):
+            files = [os.path.join(source, f) for f in os.listdir(source)]
+        else:
+            files = glob.glob(source)
+
+        files = filter(
+            lambda f: os.path.splitext(f)[1].lower() in _image_extensions,
+            files)
+        return sorted(files)
+
+    @staticmethod
+    def get_file_time(filename):
+        """
+        Returns the time of the image in epoch seconds.
+        """
+        m = _re_datetime.search(os.path.basename(filename))
+        if m:
+            try:
+                t = time.strptime(''.join(m.groups()), '%Y%m%d%H%M%S')
+                return time.mktime(t)
+            except ValueError:
+                pass
+
+        return os.stat(filename).st_mtime
+
+    def _get_file_times(self, files):
+        """
+        Returns the list of timestamps (in epoch msec) for the files.
+        """
+        if self._timestamp == 'index':
+            return [i * self._interval_msec for i in range(len(files))]
+
+        times = []
+        last_time = None
+        for f in files:
+            t = self.get_file_time(f) * 1000
+            # The timestamps must not go back.
+            if (last_time is not None) and (t < last_time):
+                t = last_time
+            times.append(t)
+            last_time = t
+
+        return times
+
+    @staticmethod
+    def _decode(filename):
+        return cv2.imread(filename)
+
+    def _fill_queue(self):
+        while (len(self._pending) < self._queue_size) and \
+                (self._next_file < len(self._files)):
+            n = self._next_file
+            future = self._executor.submit(self._decode, self._files[n])
+            self._pending.append((n, future))
+            self._next_file = n + 1
+
+    def _next(self):
+        while True:
+            self._fill_queue()
+            if len(self._pending) == 0:
+                raise EOFError()
+
+            n, future = self._pending.popleft()
+            self._source_file = self._files[n]
+            self._current_msec = self._times[n] - self._times[0]
+
+            img = future.result()
+            if img is not None:
+                return img
+
+            IkaUtils.dprint('%s: Failed to read %s' %
+                            (self, self._source_file))
+
+    # override
+    def _read_frame_func(self):
+        return self._next()
+
+    # override
+    def _grab_frame_func(self):
+        self._next()
+
+    # override
+    def _get_frame_interval_msec_func(self):
+        return self._frame_interval
+
+    # override
+    def _get_current_timestamp_func(self):
+        if self._current_msec is None:
+            return 0
+        return self._current_msec
+
+    # override
+    def get_epoch_time(self):
+        return self._epoch_time
+
+    # override
+    def get_source_file(self):
+        return self._source_file
+
+    def __init__(self, num_workers=None, queue_size=None,
+                 timestamp='auto', interval_msec=1000):
+        self._num_workers = num_workers or os.cpu_count() or 1
+        self._queue_size = queue_size or self._num_workers * 2
+        self._timestamp = timestamp
+        self._interval_msec = interval_msec
+        self._executor = ThreadPoolExecutor(max_workers=self._num_workers)
+        self._times = []
+        self._frame_interval = None
+        super(ImageDirectory, self).__init__()
+
+
+if __name__ == "__main__":
+    import sys
+
+    obj = ImageDirectory()
+    obj.select_source(name=sys.argv[1:])
+
+    k = 0
+    while k != 27:
+        try:
+            frame = obj.read_frame()
+        except EOFError:
+            break
+        if frame is not None:
+            cv2.imshow(obj.__class__.__name__, frame)
+        k = cv2.waitKey(1)
@@ -26,6 +26,7 @@ import cv2
 
 from ikalog.utils import IkaUtils
 from ikalog.inputs.filters import OffsetFilter
+from ikalog.inputs.frame_scheduler import FrameScheduler
 
 
 class VideoInput(object):
@@ -93,6 +94,21 @@ class VideoInput(object):
     def _read_frame_func(self):
         raise
 
+    ##
+    # _grab_frame_func()
+    # Handler to skip a frame. Drivers may override this to skip
+    # the frame without decoding it.
+    # @param self    the object
+    def _grab_frame_func(self):
+        self._read_frame_func()
+
+    ##
+    # _get_frame_interval_msec_func()
+    # @param self    the object
+    # @return        Interval of the source frames in msec, or None if unknown.
+    def _get_frame_interval_msec_func(self):
+        return None
+
     ##
     # is_active()
     # Returns the state of the input source.
@@ -127,24 +143,6 @@ class VideoInput(object):
 
         self.set_frame_rate(None)  # Default framerate
 
-    ##
-    #
-    def _skip_frame_realtime(self):
-        current_tick = self.get_tick()
-        last_tick = self.last_tick
-        next_tick = current_tick
-
-        if self.fps_requested is not None:
-            next_tick2 = int(last_tick + (1000 / self.fps_requested * 2))
-            if current_tick < next_tick2:
-                next_tick = int(last_tick + (1000 / self.fps_requested))
-
-        while current_tick < next_tick:
-            time.sleep(0.05)
-            current_tick = self.get_tick()
-
-        return next_tick
-
     def _skip_frame_recorded(self):
 
         if self.frame_skip_rt:
@@ -154,10 +152,16 @@ class VideoInput(object):
         else:
             return
 
+        # Stop at the frame just before the target, so that the next
+        # read_frame() returns the frame at the target tick.
+        interval = self._get_frame_interval_msec_func()
+        if interval:
+            tick = tick - interval * 1.5
+
         video_msec = self.get_current_timestamp()
         skip = video_msec < tick
         while skip:
-            frame_ = self._read_frame_func()
+            self._grab_frame_func()
 
             video_msec = self.get_current_timestamp()
             skip = video_msec < tick
@@ -177,7 +181,10 @@ class VideoInput(object):
             if not self.is_active():
                 return None
 
-            next_tick = None
+            if not self.cap_recorded_video:
+                # Wait for the frame slot, and read the freshest frame.
+                self._scheduler.wait()
+
             img = self._read_frame_func()
 
             # Skip some frames for performance.
@@ -185,7 +192,7 @@ class VideoInput(object):
                 if self.cap_recorded_video:
                     self._skip_frame_recorded()
                 else:
-                    next_tick = self._skip_frame_realtime()
+                    self._scheduler.on_frame(img)
             except EOFError:
                 pass  # EOFError should be captured by the next cycle.
 
@@ -206,9 +213,6 @@ class VideoInput(object):
                 )
                 return None
 
-        if next_tick is not None:
-            self.last_tick = next_tick
-
         # need stratch?
         stratch = (
             img.shape[0] != self.output_geometry[0] or
@@ -234,6 +238,7 @@ class VideoInput(object):
     def reset_tick(self):
         self._base_tick = int(time.time() * 1000)
         self.last_tick = 0
+        self._scheduler.reset()
 
     def get_tick(self):
         return int(time.time() * 1000 - self._base_tick)
@@ -252,6 +257,17 @@ class VideoInput(object):
     def get_epoch_time(self):
         return None
 
+    ##
+    # get_frame_stats(self)
+    #
+    # Get frame counters of the realtime input.
+    # @return dict of frames, late, dropped and duplicate frame counts,
+    #         or None if the input is a recorded video.
+    def get_frame_stats(self):
+        if self.cap_recorded_video:
+            return None
+        return self._scheduler.get_stats()
+
     def set_pos_msec(self, pos_msec):
         pass
 
@@ -280,6 +296,7 @@ class VideoInput(object):
     def set_frame_rate(self, fps=None, realtime=False):
         self.fps_requested = fps
         self.frame_skip_rt = realtime
+        self._scheduler.set_fps(fps)
 
     def set_offset(self, offset=None):
         if offset is None:
@@ -306,6 +323,7 @@ class VideoInput(object):
         self.output_geometry = (720, 1280)
         self.effective_lines = 720
         self.lock = threading.Lock()
+        self._scheduler = FrameScheduler()
 
         self.is_realtime = True
         self.reset()
@@ -26,6 +26,7 @@ import threading
 import cv2
 from ikalog.utils import *
 from ikalog.inputs import VideoInput
+from ikalog.inputs.video_index import VideoIndex
 
 
 class CVFile(VideoInput):
@@ -92,11 +93,15 @@ class CVFile(VideoInput):
                 self.video_capture.release()
 
             self.reset()
+            self._index = None
+            self._index_tried = None
 
             # FIXME: Does it work with non-ascii path?
             self.video_capture = cv2.VideoCapture(self._source_file)
             if self.video_capture.isOpened():
                 self._epoch_time = self.get_start_time()
+                self._fps = self._get_fps()
+                self._next_frame = 0
             else:
                 self.video_capture = None
             self.reset_tick()
@@ -106,36 +111,91 @@ class CVFile(VideoInput):
 
         return self.is_active()
 
+    def _get_fps(self):
+        """Returns the frame rate of the video, or None if unreliable."""
+        fps = self.video_capture.get(cv2.CAP_PROP_FPS)
+        if not (1.0 < fps <= 240.0):
+            return None
+        return fps
+
+    def _get_index(self, allow_slow=False):
+        """
+        Returns the frame index of the current video, or None.
+        allow_slow: Build the index by decoding the video if needed.
+        """
+        if not (self._use_index and self._source_file):
+            return None
+
+        # Don't try again with the same (or a cheaper) method.
+        tried = self._index_tried
+        if (self._index is None) and \
+                not (tried == 'slow' or (tried == 'fast' and not allow_slow)):
+            self._index = VideoIndex.open(
+                self._source_file,
+                ffprobe_path=self._ffprobe_path,
+                allow_slow=allow_slow,
+                cache=self._cache_index,
+            )
+            self._index_tried = 'slow' if allow_slow else 'fast'
+
+            # The index knows the duration better than the headers.
+            if self._index is not None:
+                self._epoch_time = self.get_start_time()
+
+        return self._index
+
+    # override
+    def _get_frame_interval_msec_func(self):
+        if self._fps is None:
+            return None
+        return 1000.0 / self._fps
+
     # override
     def _get_current_timestamp_func(self):
         if self.video_capture is None:
             return self.get_tick()
 
+        if self._index is not None:
+            return self._index.timestamp(self._next_frame - 1)
+
+        # Compute the timestamp from the frame rate rather than querying
+        # the position on every frame.
+        if self._fps is not None:
+            return max(self._next_frame - 1, 0) * 1000.0 / self._fps
+
         video_msec = self.video_capture.get(cv2.CAP_PROP_POS_MSEC)
         return video_msec or self.get_tick()
 
+    def _grab(self):
+        if not self.video_capture.grab():
+            return False
+        self._next_frame = self._next_frame + 1
+        return True
 
     # override
-    def _read_frame_func(self):
-        ret, frame = self.video_capture.read()
-        if not ret:
+    def _grab_frame_func(self):
+        if not self._grab():
             raise EOFError()
 
+    # override
+    def _read_frame_func(self):
+        self._grab_frame_func()
+
         if self.frame_skip_rt:
             systime_msec = self.get_tick()
-            video_msec = self.video_capture.get(cv2.CAP_PROP_POS_MSEC)
             assert systime_msec >= 0
 
-            skip = video_msec < systime_msec
+            # Skip (without decoding) the frames behind the system time.
+            skip = self.get_current_timestamp() < systime_msec
             while skip:
-                ret, frame_ = self.video_capture.read()
-
-                if not ret:
+                if not self._grab():
                     break
+                skip = self.get_current_timestamp() < systime_msec
 
-                frame = frame_
-                video_msec = self.video_capture.get(cv2.CAP_PROP_POS_MSEC)
-                skip = video_msec < systime_msec
+        # Decode only the frame to be returned.
+        ret, frame = self.video_capture.retrieve()
+        if not ret:
+            raise EOFError()
 
         return frame
 
@@ -153,17 +213,54 @@ class CVFile(VideoInput):
 
         last_modified_time = os.stat(self._source_file).st_mtime
 
-        frames = self.video_capture.get(cv2.CAP_PROP_FRAME_COUNT)
-        fps = self.video_capture.get(cv2.CAP_PROP_FPS)
-        duration = frames / fps
+        # Don't build the index only for this; it is built on seeks.
+        index = self._index
+        if index is not None:
+            duration = index.get_duration_msec() / 1000.0
+        else:
+            frames = self.video_capture.get(cv2.CAP_PROP_FRAME_COUNT)
+            fps = self.video_capture.get(cv2.CAP_PROP_FPS)
+            duration = frames / fps
 
         return last_modified_time - duration
 
+    def _seek_frame(self, frame):
+        """Moves the video position so that the next frame is |frame|."""
+        # Seek to the keyframe (cheap), then skip forward without decoding.
+        keyframe = self._index.keyframe_before(frame)
+        if keyframe is None:
+            keyframe = frame
+
+        self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+        self._next_frame = int(self.video_capture.get(cv2.CAP_PROP_POS_FRAMES))
+
+        if self._next_frame > frame:
+            self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, frame)
+            self._next_frame = \
+                int(self.video_capture.get(cv2.CAP_PROP_POS_FRAMES))
+
+        while self._next_frame < frame:
+            if not self._grab():
+                break
+
     # override
     def set_pos_msec(self, pos_msec):
         """Moves the video position to |pos_msec| in msec."""
-        if self.video_capture:
-            self.video_capture.set(cv2.CAP_PROP_POS_MSEC, pos_msec)
+        if not self.video_capture:
+            return
+
+        # Nothing to do at the beginning (IkaLog.py always seeks).
+        if not pos_msec:
+            return
+
+        index = self._get_index(allow_slow=self._index_allow_slow)
+        if index is not None:
+            self._seek_frame(index.frame_at(pos_msec))
+            return
+
+        self.video_capture.set(cv2.CAP_PROP_POS_MSEC, pos_msec)
+        self._next_frame = \
+            int(self.video_capture.get(cv2.CAP_PROP_POS_FRAMES))
 
     # override
     def get_source_file(self):
@@ -172,6 +269,23 @@ class CVFile(VideoInput):
     def set_use_file_timestamp(self, use_file_timestamp=True):
         self._use_file_timestamp = use_file_timestamp
 
+    def set_use_index(self, use_index=True, ffprobe_path='ffprobe',
+                      allow_slow=False, cache=False):
+        """
+        Use a frame index for seeks and timestamps. The index is built
+        with ffprobe on the first seek.
+
+        allow_slow: If ffprobe is not available, build the index by
+                    decoding the video once.
+        cache:      Cache the index next to the video.
+        """
+        self._use_index = use_index
+        self._ffprobe_path = ffprobe_path
+        self._index_allow_slow = allow_slow
+        self._cache_index = cache
+        if not use_index:
+            self._index = None
+
     def _check_opencv_config(self):
         build_info = cv2.getBuildInformation()
         ffmpeg_line = re.search(r'FFMPEG\:\s+(.*)', build_info)
@@ -196,6 +310,14 @@ class CVFile(VideoInput):
         self._file_queue = queue.Queue()
         self._epoch_time = None
         self._use_file_timestamp = True
+        self._fps = None
+        self._next_frame = 0
+        self._use_index = True
+        self._ffprobe_path = 'ffprobe'
+        self._index_allow_slow = False
+        self._cache_index = False
+        self._index = None
+        self._index_tried = None
         super(CVFile, self).__init__()
 
     # backward compatibility
@@ -27,11 +27,75 @@ from ikalog.inputs import VideoInput
 
 
 class GStreamer(VideoInput):
-
-    # Note: This is for backward compatibility. GStreamer was a subclass of
-    # CVFile which sets this variable True. It might be OK to remove it.
+    """
+    Reads frames from a GStreamer pipeline through OpenCV.
+
+    If the source description does not end with an appsink, the input
+    completes it with in-pipeline conversion and scaling to BGR 1280x720,
+    and a low-latency appsink which keeps only the newest buffer
+    (drop=true max-buffers=1 sync=false). Complete pipelines ending with
+    appsink are used as is.
+
+    e.g.
+      'videotestsrc is-live=true'
+      'decklinksrc connection=hdmi mode=720p5994 device-number=0'
+      GStreamer.file_source('video.mp4')
+    """
+
+    # Updated per pipeline by select_source(). Live sources are paced by
+    # the frame scheduler and report the frame stats.
     cap_recorded_video = True
 
+    # Elements which read recorded media.
+    recorded_source_elements = ('filesrc', 'multifilesrc', 'splitmuxsrc')
+
+    # Smoothing factor of the latency measurement.
+    latency_ema_alpha = 0.1
+
+    @staticmethod
+    def file_source(filename):
+        """Returns a source description to decode the video file."""
+        return 'filesrc location="%s" ! decodebin' % filename
+
+    @staticmethod
+    def test_source(pattern='smpte'):
+        """Returns a live test pattern source description."""
+        return 'videotestsrc is-live=true pattern=%s' % pattern
+
+    @classmethod
+    def is_live_source(cls, source):
+        """
+        Returns True if the source description is a live source.
+        """
+        first_element = source.split('!')[0].strip()
+        element_name = first_element.split(' ')[0]
+
+        if element_name in cls.recorded_source_elements:
+            return False
+        if 'uri=file:' in first_element:
+            return False
+        if element_name == 'videotestsrc':
+            return 'is-live=true' in first_element
+        return True
+
+    def build_pipeline(self, source):
+        """
+        Returns the pipeline description for the source.
+        """
+        last_element = source.split('!')[-1].strip()
+        if last_element.startswith('appsink'):
+            return source
+
+        return ' ! '.join([
+            source,
+            'queue max-size-buffers=2 leaky=downstream',
+            'videoconvert',
+            'videoscale',
+            'video/x-raw,format=BGR,width=%d,height=%d' % (
+                self.out_width, self.out_height),
+            'appsink drop=true max-buffers=1 sync=false',
+        ])
+
     # override
     def _initialize_driver_func(self):
         # OpenCV File doesn't need pre-initialization.
@@ -63,7 +127,20 @@ class GStreamer(VideoInput):
                 self.video_capture.release()
 
             self.reset()
-            self.video_capture = cv2.VideoCapture(source)
+            self.cap_recorded_video = not self.is_live_source(source)
+            pipeline = self.build_pipeline(source)
+            IkaUtils.dprint('%s: pipeline: %s' % (self, pipeline))
+
+            # The pipeline starts running while VideoCapture opens it.
+            self._start_time = time.monotonic()
+            self._latency_msec = None
+            self.video_capture = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+
+            if not self.video_capture.isOpened():
+                IkaUtils.dprint(
+                    '%s: Failed to open the pipeline. '
+                    'Does OpenCV support GStreamer?' % self)
+                self.video_capture = None
 
         finally:
             self.lock.release()
@@ -101,10 +178,37 @@ class GStreamer(VideoInput):
                 video_msec = self.video_capture.get(cv2.CAP_PROP_POS_MSEC)
                 skip = video_msec < systime_msec
 
+        self._update_latency()
         return frame
 
+    def _update_latency(self):
+        # Buffer timestamps of live sources are the running time of the
+        # pipeline, so the difference to the time elapsed since the
+        # pipeline started is the latency until the frame reached us.
+        video_msec = self.video_capture.get(cv2.CAP_PROP_POS_MSEC)
+        if not video_msec:
+            return
+
+        elapsed_msec = (time.monotonic() - self._start_time) * 1000
+        latency = elapsed_msec - video_msec
+
+        if self._latency_msec is None:
+            self._latency_msec = latency
+        else:
+            a = self.latency_ema_alpha
+            self._latency_msec = self._latency_msec * (1 - a) + latency * a
+
+    def get_latency_msec(self):
+        """
+        Returns the measured pipeline latency in msec (moving average),
+        or None if not available. Meaningful only for live sources.
+        """
+        return self._latency_msec
+
     def __init__(self):
         self.video_capture = None
+        self._start_time = time.monotonic()
+        self._latency_msec = None
         super(GStreamer, self).__init__()
 
 
@@ -112,13 +216,15 @@ if __name__ == "__main__":
     import sys
 
     obj = GStreamer()
-    obj.select_source(
-        name='videotestsrc pattern = smpte ! videoconvert ! appsink'
-    )
+    if len(sys.argv) > 1:
+        obj.select_source(name=GStreamer.file_source(sys.argv[1]))
+    else:
+        obj.select_source(name=GStreamer.test_source())
 
     k = 0
     while k != 27:
         frame = obj.read_frame()
         if frame is not None:
             cv2.imshow(obj.__class__.__name__, frame)
-        cv2.waitKey(1)
+            IkaUtils.dprint('latency: %s msec' % obj.get_latency_msec())
+        k = cv2.waitKey(1)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import os
+import subprocess
+
+import cv2
+import numpy as np
+
+from ikalog.utils import *
+
+
+class VideoIndex(object):
+    """
+    Frame index of a video file.
+
+    Maps frame numbers (in presentation order) to timestamps, and knows
+    the keyframe positions if available. Optionally, the index is cached
+    next to the video (<video>.ikaindex.npz), keyed by the size and the
+    mtime of the video file.
+
+    The index is built by ffprobe from the packet headers, without
+    decoding the video. If ffprobe is not available, it can be built by
+    grabbing every frame with OpenCV (slow; keyframes are unknown).
+    """
+
+    cache_suffix = '.ikaindex.npz'
+
+    def num_frames(self):
+        return len(self.timestamps)
+
+    def frame_at(self, msec):
+        """
+        Returns the number of the first frame at or after msec.
+        """
+        frame = int(np.searchsorted(self.timestamps, msec - 0.5))
+        return min(frame, max(self.num_frames() - 1, 0))
+
+    def timestamp(self, frame):
+        """
+        Returns the timestamp of the frame in msec.
+        """
+        frame = min(max(frame, 0), self.num_frames() - 1)
+        return float(self.timestamps[frame])
+
+    def keyframe_before(self, frame):
+        """
+        Returns the number of the last keyframe at or before the frame,
+        or None if keyframes are unknown.
+        """
+        if self.keyframes is None or len(self.keyframes) == 0:
+            return None
+
+        i = int(np.searchsorted(self.keyframes, frame, side='right')) - 1
+        return int(self.keyframes[max(i, 0)])
+
+    def get_duration_msec(self):
+        if self.num_frames() == 0:
+            return 0.0
+        if self.num_frames() == 1:
+            return float(self.timestamps[0])
+
+        interval = np.median(np.diff(self.timestamps[-16:]))
+        return float(self.timestamps[-1] + interval)
+
+    @staticmethod
+    def _file_key(filename):
+        st = os.stat(filename)
+        return np.array([st.st_size, st.st_mtime], np.float64)
+
+    def save(self, filename):
+        np.savez(
+            filename + self.cache_suffix,
+            key=self._file_key(filename),
+            timestamps=self.timestamps,
+            keyframes=(self.keyframes if self.keyframes is not None
+                       else np.zeros(0, np.int64)),
+            has_keyframes=np.array(self.keyframes is not None),
+        )
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load the cached index. Returns None if not cached, or stale.
+        """
+        try:
+            with np.load(filename + cls.cache_suffix) as d:
+                if not np.array_equal(d['key'], cls._file_key(filename)):
+                    return None
+                keyframes = d['keyframes'] if d['has_keyframes'] else None
+                return cls(d['timestamps'], keyframes)
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+    @classmethod
+    def parse_ffprobe_packets(cls, text):
+        """
+        Parse the output of:
+          ffprobe -select_streams v:0 -show_entries packet=pts_time,flags
+                  -of csv=p=0
+        """
+        packets = []
+        for line in text.splitlines():
+            fields = line.strip().split(',')
+            if len(fields) < 2:
+                continue
+            try:
+                pts = float(fields[0])
+            except ValueError:
+                # N/A
+                continue
+            packets.append((pts, fields[1].startswith('K')))
+
+        # Packets are in decoding order; frames are in presentation order.
+        packets.sort(key=lambda p: p[0])
+
+        if len(packets) == 0:
+            return cls(np.zeros(0), np.zeros(0, np.int64))
+
+        pts_list = np.array([p[0] for p in packets], np.float64)
+        timestamps = (pts_list - pts_list[0]) * 1000.0
+        keyframes = np.array(
+            [i for i, p in enumerate(packets) if p[1]], np.int64)
+        return cls(timestamps, keyframes)
+
+    @classmethod
+    def build_with_ffprobe(cls, filename, ffprobe_path='ffprobe'):
+        """
+        Build the index from the packet headers. Returns None on failure.
+        """
+        cmd = [
+            ffprobe_path, '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags',
+            '-of', 'csv=p=0',
+            filename,
+        ]
+        try:
+            output = subprocess.check_output(cmd, stdin=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+        index = cls.parse_ffprobe_packets(output.decode('utf-8', 'replace'))
+        if index.num_frames() == 0:
+            return None
+        return index
+
+    @classmethod
+    def build_with_opencv(cls, filename):
+        """
+        Build the index by grabbing all the frames. Returns None on failure.
+        """
+        video_capture = cv2.VideoCapture(filename)
+        if not video_capture.isOpened():
+            return None
+
+        timestamps = []
+        try:
+            while video_capture.grab():
+                timestamps.append(video_capture.get(cv2.CAP_PROP_POS_MSEC))
+        finally:
+            video_capture.release()
+
+        if len(timestamps) == 0:
+            return None
+        return cls(np.array(timestamps, np.float64), None)
+
+    @classmethod
+    def open(cls, filename, ffprobe_path='ffprobe', allow_slow=False,
+             cache=False):
+        """
+        Returns the index of the video file, or None if it could not be
+        built.
+
+        allow_slow: Build with OpenCV if ffprobe is not available.
+        cache:      Use and write the cache file next to the video.
+        """
+        index = cls.load(filename) if cache else None
+        if index is not None:
+            return index
+
+        if ffprobe_path:
+            index = cls.build_with_ffprobe(filename, ffprobe_path)
+
+        if (index is None) and allow_slow:
+            IkaUtils.dprint('%s: Indexing %s' % (cls.__name__, filename))
+            index = cls.build_with_opencv(filename)
+
+        if (index is None) or (not cache):
+            return index
+
+        try:
+            index.save(filename)
+        except (IOError, OSError):
+            # The directory may be read-only. Use it without caching.
+            pass
+
+        return index
+
+    def __init__(self, timestamps, keyframes=None):
+        self.timestamps = np.asarray(timestamps, np.float64)
+        self.keyframes = None if keyframes is None else \
+            np.asarray(keyframes, np.int64)
@@ -86,8 +86,42 @@ class ScreenCapture(VideoInput):
     def reset(self):
         self._warp_filter = WarpFilter(self)
         self._calibration_requested = False
+        self.load_calibration()
         super(ScreenCapture, self).reset()
 
+    def load_calibration(self):
+        """
+        Restore the last calibration (with the compiled remap tables)
+        from calibration_file, if any.
+        """
+        if not (self._calibration_file and
+                os.path.exists(self._calibration_file)):
+            return False
+
+        try:
+            self._warp_filter.loadCalibrationFromFile(self._calibration_file)
+        except Exception:
+            IkaUtils.dprint('%s: Failed to load calibration from %s' %
+                            (self, self._calibration_file))
+            return False
+
+        self._warp_filter.enable()
+        IkaUtils.dprint('%s: Loaded calibration from %s' %
+                        (self, self._calibration_file))
+        return True
+
+    def save_calibration(self):
+        if not self._calibration_file:
+            return False
+
+        try:
+            self._warp_filter.saveCalibrationToFile(self._calibration_file)
+        except (IOError, OSError):
+            IkaUtils.dprint('%s: Failed to save calibration to %s' %
+                            (self, self._calibration_file))
+            return False
+        return True
+
     def auto_calibrate(self, img):
         try:
             r = self._warp_filter.calibrateWarp(
@@ -123,6 +157,7 @@ class ScreenCapture(VideoInput):
             IkaUtils.dprint(msg)
 
         self._warp_filter.enable()
+        self.save_calibration()
         IkaUtils.dprint(_('Calibration succeeded!'))
         return True
 
@@ -177,6 +212,10 @@ class ScreenCapture(VideoInput):
         IkaUtils.dprint(
             '%s: Does not support _select_device_by_name_func()' % self)
 
+    def __init__(self, calibration_file=None):
+        self._calibration_file = calibration_file
+        super(ScreenCapture, self).__init__()
+
 if __name__ == "__main__":
     obj = ScreenCapture()
 
@@ -18,6 +18,7 @@
 #  limitations under the License.
 #
 
+from .clip_recorder import ClipRecorder
 from .console import Console
 from .csv import CSV
 from .debug import DebugLog
@@ -30,6 +31,7 @@ from .preview import Screen
 from .preview_detected import PreviewDetected
 from .screenshot import Screenshot
 from .slack import Slack
+from .sqlite import SQLite
 from .statink import StatInk
 from .switcher import Switcher
 from .twitter import Twitter
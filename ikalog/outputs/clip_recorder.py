@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2015 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import collections
+import os
+import queue
+import threading
+import time
+import traceback
+
+import cv2
+import numpy as np
+
+from ikalog.utils import *
+
+# IkaLog Output Plugin: Write highlight clips from a ring buffer.
+
+
+class ClipRecorder(object):
+    """
+    Writes highlight clips around kills, deaths and finishes, live.
+
+    The frames are JPEG-encoded on a worker thread into a ring buffer of
+    the last pre_roll seconds (at most max_bytes). When an event occurs,
+    the clip takes the frames in the buffer, continues to take the
+    frames until its post-roll, and is written to dest_dir as a MJPEG
+    AVI file. Clips overlapping each other are merged into one.
+
+    The engine thread only queues the frames. If the worker can't keep
+    up, frames are dropped rather than stalling the engine. The events
+    go through a separate, unbounded queue, and are never dropped.
+    """
+
+    # (pre-roll, post-roll) in seconds.
+    clip_windows = {
+        'kill': (6.0, 2.5),
+        'death': (6.0, 2.5),
+        'finish': (6.0, 10.0),
+    }
+
+    # Engine thread
+
+    def on_frame_read(self, context):
+        msec = context['engine']['msec']
+        if (self._last_msec is not None) and \
+                (msec - self._last_msec < self._frame_interval_msec):
+            return
+        self._last_msec = msec
+
+        # The input may reuse the frame buffer (e.g. FFmpegPipe), so queue
+        # a copy. Downscaling makes it, and is cheap at the clip size.
+        frame = context['engine']['frame']
+        if (self.size is not None) and \
+                (frame.shape[1], frame.shape[0]) != tuple(self.size):
+            frame = cv2.resize(frame, tuple(self.size),
+                               interpolation=cv2.INTER_AREA)
+        else:
+            frame = frame.copy()
+
+        self._start()
+        try:
+            self._queue.put_nowait(('frame', msec, frame))
+        except queue.Full:
+            self.stats['dropped_frames'] += 1
+
+    def _add_clip(self, context, clip_type):
+        pre_roll, post_roll = self.clip_windows[clip_type]
+        msec = context['engine']['msec']
+        self._start()
+        self._clip_queue.put((msec, clip_type,
+                              msec - pre_roll * 1000,
+                              msec + post_roll * 1000))
+
+    def on_game_killed(self, context, params=None):
+        self._add_clip(context, 'kill')
+
+    def on_game_dead(self, context):
+        self._add_clip(context, 'death')
+
+    def on_game_finish(self, context):
+        self._add_clip(context, 'finish')
+
+    def on_stop(self, context):
+        self.close()
+
+    # Worker thread
+
+    def _encode(self, frame):
+        result, jpeg = cv2.imencode(
+            '.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not result:
+            return None
+        return jpeg.tobytes()
+
+    def _on_frame(self, msec, frame):
+        jpeg = self._encode(frame)
+        if jpeg is None:
+            return
+
+        self._ring.append((msec, jpeg))
+        self._ring_bytes = self._ring_bytes + len(jpeg)
+
+        # Keep the pre-roll, within the memory budget.
+        while (len(self._ring) > 1) and \
+                ((self._ring[0][0] < msec - self._ring_msec) or
+                 (self._ring_bytes > self.max_bytes)):
+            self._ring_bytes = self._ring_bytes - len(self._ring[0][1])
+            self._ring.popleft()
+
+        clip = self._clip
+        if clip is None:
+            return
+
+        if msec <= clip['end']:
+            clip['frames'].append((msec, jpeg))
+        else:
+            self._finish_clip()
+
+    def _on_clip(self, clip_type, start, end):
+        clip = self._clip
+        if (clip is not None) and (start <= clip['end']):
+            # Overlapping clips are merged.
+            clip['type'] = '%s+%s' % (clip['type'], clip_type)
+            clip['end'] = max(clip['end'], end)
+            return
+
+        if clip is not None:
+            self._finish_clip()
+
+        self._clip = {
+            'type': clip_type,
+            'start': start,
+            'end': end,
+            'frames': [f for f in self._ring if f[0] >= start],
+        }
+
+    def _finish_clip(self):
+        clip = self._clip
+        self._clip = None
+        if len(clip['frames']) > 0:
+            self._write_queue.put(clip)
+
+    def _handle_clips(self, msec=None):
+        """
+        Starts the clips of the events up to msec (or all if None), in
+        the order with the frames.
+        """
+        while True:
+            try:
+                self._pending_clips.append(self._clip_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        while (len(self._pending_clips) > 0) and \
+                ((msec is None) or (self._pending_clips[0][0] <= msec)):
+            self._on_clip(*self._pending_clips.popleft()[1:])
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    self._handle_clips()
+                    if self._clip is not None:
+                        self._finish_clip()
+                    self._write_queue.put(None)
+                    return
+
+                self._on_frame(item[1], item[2])
+                self._handle_clips(item[1])
+            except:
+                IkaUtils.dprint('%s: Exception in the worker' % self)
+                IkaUtils.dprint(traceback.format_exc())
+
+    def get_clip_filename(self, clip):
+        t = time.strftime('%Y%m%d_%H%M%S')
+        return os.path.join(self.dest_dir, 'clip_%s_%d_%s.avi' % (
+            t, int(clip['start'] / 1000), clip['type']))
+
+    def write_clip(self, clip):
+        """
+        Write the clip to a MJPEG AVI file. Returns the file name.
+        """
+        frames = clip['frames']
+        if len(frames) > 1:
+            interval = np.median(np.diff([f[0] for f in frames]))
+            fps = 1000.0 / interval if interval > 0 else 10.0
+        else:
+            fps = 10.0
+
+        img = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), 1)
+        height, width = img.shape[0:2]
+
+        if not os.path.exists(self.dest_dir):
+            os.makedirs(self.dest_dir)
+
+        filename = self.get_clip_filename(clip)
+        writer = cv2.VideoWriter(filename, cv2.VideoWriter_fourcc(*'MJPG'),
+                                 fps, (width, height))
+        try:
+            for msec, jpeg in frames:
+                img = cv2.imdecode(np.frombuffer(jpeg, np.uint8), 1)
+                writer.write(img)
+        finally:
+            writer.release()
+
+        IkaUtils.dprint('%s: Wrote a clip %s (%d frames)' %
+                        (self, filename, len(frames)))
+        return filename
+
+    def _writer(self):
+        while True:
+            clip = self._write_queue.get()
+            if clip is None:
+                return
+
+            try:
+                filename = self.write_clip(clip)
+                self.clips.append(filename)
+            except:
+                IkaUtils.dprint('%s: Failed to write a clip' % self)
+                IkaUtils.dprint(traceback.format_exc())
+
+    def _start(self):
+        if self._threads:
+            return
+
+        self._threads = [
+            threading.Thread(target=self._worker),
+            threading.Thread(target=self._writer),
+        ]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def close(self):
+        """
+        Write the clip in progress, and stop the workers.
+        """
+        if not self._threads:
+            return
+
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __init__(self, dest_dir='clips/', pre_roll=None, max_bytes=256 << 20,
+                 size=(640, 360), jpeg_quality=80, fps=10, max_queue=32):
+        self.dest_dir = dest_dir
+        self.max_bytes = max_bytes
+        self.size = size
+        self.jpeg_quality = jpeg_quality
+        self.clips = []
+        self.stats = {'dropped_frames': 0}
+
+        if pre_roll is None:
+            pre_roll = max(w[0] for w in self.clip_windows.values())
+        self._ring_msec = pre_roll * 1000
+        self._frame_interval_msec = (1000.0 / fps) if fps else 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._clip_queue = queue.Queue()
+        self._pending_clips = collections.deque()
+        self._write_queue = queue.Queue()
+        self._ring = collections.deque()
+        self._ring_bytes = 0
+        self._clip = None
+        self._last_msec = None
+        self._threads = []
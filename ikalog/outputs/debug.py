@@ -22,6 +22,7 @@ import sys
 import time
 
 from ikalog.utils import *
+from ikalog.utils.image_writer import get_image_writer
 
 
 # IkaLog Output Plugin: Write debug logs.
@@ -43,7 +44,8 @@ class DebugLog(object):
             time_str = time.strftime("%Y%m%d_%H%M%S", t)
             log_name = '%s_%s_%s.png' % (event, time_str, time.time())
             destfile = os.path.join(self.dir, log_name)
-            IkaUtils.writeScreenshot(destfile, context['engine']['frame'])
+            get_image_writer(context).write_image(
+                destfile, context['engine']['frame'])
 
     def on_frame_read_failed(self, context):
         pass
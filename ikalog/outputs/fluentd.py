@@ -19,6 +19,7 @@
 #
 
 from ikalog.utils import *
+from ikalog.utils.fluentd_forwarder import FluentdForwarder
 
 # Needed in GUI mode
 try:
@@ -149,17 +150,35 @@ class Fluentd(object):
     #
     def submit_record(self, recordType, record):
         try:
-            from fluent import sender
-            from fluent import event
-            if self.host is None:
-                sender = sender.setup(self.tag)
-            else:
-                sender.setup(self.tag, host=self.host, port=self.port)
-
-            event.Event(recordType, record)
+            tag = '%s.%s' % (self.tag, recordType)
+            self._get_forwarder().emit(tag, record)
         except:
             print("Fluentd: Failed to submit a record")
 
+    def _get_forwarder(self):
+        host = self.host or '127.0.0.1'
+        port = int(self.port or 24224)
+
+        # The host may be changed on the option tab.
+        f = self._forwarder
+        if (f is not None) and ((f.host != host) or (f.port != port)):
+            f.close(timeout=0)
+            f = None
+
+        if f is None:
+            f = FluentdForwarder(
+                host=host, port=port, buffer_dir=self.buffer_dir,
+                flush_size=self.flush_size,
+                flush_interval=self.flush_interval,
+            )
+            self._forwarder = f
+        return f
+
+    def get_metrics(self):
+        if self._forwarder is None:
+            return None
+        return self._forwarder.get_metrics()
+
     ##
     # Generate a record for on_game_individual_result.
     # @param self      The Object Pointer.
@@ -192,16 +211,14 @@ class Fluentd(object):
         self.submit_record('gameresult', record)
 
     ##
-    # Check availability of modules this plugin depends on.
-    # @param self      The Object Pointer.
+    # on_stop Hook
+    # @param self      The Object Pointer
+    # @param context   IkaLog context
     #
-    def check_import(self):
-        try:
-            from fluent import sender
-            from fluent import event
-        except:
-            print("モジュール fluent-logger がロードできませんでした。 Fluentd 連携ができません。")
-            print("インストールするには以下のコマンドを利用してください。\n    pip install fluent-logger\n")
+    def on_stop(self, context):
+        # Records not sent in time are kept in buffer_dir, if specified.
+        if self._forwarder is not None:
+            self._forwarder.close(timeout=5)
 
     ##
     # Constructor
@@ -210,16 +227,21 @@ class Fluentd(object):
     # @param username Username of the player.
     # @param host     Fluentd host if Fluentd is on a different node
     # @param port     Fluentd port
-    # @param username Name the bot use on Slack
+    # @param buffer_dir     Directory to keep the records not sent yet
+    # @param flush_size     Send the records when buffered this size (bytes)
+    # @param flush_interval Send the records after this interval (seconds)
     #
-    def __init__(self, tag='ikalog', username='ika', host=None, port=24224):
+    def __init__(self, tag='ikalog', username='ika', host=None, port=24224,
+                 buffer_dir=None, flush_size=64 * 1024, flush_interval=1.0):
         self.enabled = False
         self.tag = tag
         self.username = username
         self.host = host
         self.port = port
-
-        self.check_import()
+        self.buffer_dir = buffer_dir
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._forwarder = None
 
 if __name__ == "__main__":
     obj = Fluentd()
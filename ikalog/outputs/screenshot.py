@@ -22,6 +22,7 @@ import os
 import time
 
 from ikalog.scenes.plaza_user_stat import *  # Fixme...
+from ikalog.utils.image_writer import get_image_writer
 
 
 # Needed in GUI mode
@@ -114,7 +115,17 @@ class Screenshot(object):
                                 time.localtime(IkaUtils.getTime(context)))
         destfile = os.path.join(self.dir, 'ikabattle_%s.png' % timestr)
 
-        if IkaUtils.writeScreenshot(destfile, context['engine']['frame']):
+        # The current frame may be a later scene, if the scoreboard was
+        # analyzed in background.
+        img = context['game'].get('image_scoreboard')
+        if img is None:
+            img = context['engine']['frame']
+
+        get_image_writer(context).write_image(
+            destfile, img, callback=self._on_screenshot_written)
+
+    def _on_screenshot_written(self, destfile, success):
+        if success:
             print(_('Saved a screenshot %s') % destfile)
 
     def on_key_press(self, context, key):
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2015 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+from ikalog.utils import *
+from ikalog.utils.event_store import EventStore
+
+
+def _set(dest, dest_key, src, src_key):
+    if src_key not in src:
+        return
+    dest[dest_key] = src[src_key]
+
+# IkaOutput_SQLite: IkaLog Output Plugin for SQLite
+#
+# Write the game sessions, the players, the events and the timelines
+# (e.g. objective) to a SQLite database. Use tools/print_data.py --db to query the database.
+
+
+class SQLite(object):
+
+    def _open_game_session(self, context):
+        self._called_close_game_session = False
+        self._events = []
+
+    def on_game_go_sign(self, context):
+        self._open_game_session(context)
+        self._add_event(context, 'on_game_go_sign')
+
+    def on_game_start(self, context):
+        # Fallback in the case on_game_go_sign was skipped.
+        self._open_game_session(context)
+        self._add_event(context, 'on_game_start')
+
+    def on_game_death_reason_identified(self, context):
+        self._add_event(context, 'on_game_death_reason_identified', {
+            'reason': context['game'].get('last_death_reason'),
+        })
+
+    def on_uncaught_event(self, event_name, context, params=None):
+        if not event_name.startswith('on_game_'):
+            return
+
+        # High-rate state updates are not recorded.
+        if event_name.endswith('_update'):
+            return
+
+        self._add_event(context, event_name)
+
+    def _add_event(self, context, event_name, data=None):
+        at_msec = IkaUtils.get_game_offset_msec(context)
+        if at_msec is None:
+            return
+        self._events.append((int(at_msec), event_name, data))
+
+    ##
+    # Generate the session, and its players
+    # @param self      The Object Pointer.
+    # @param context   IkaLog context
+    #
+    def get_session(self, context):
+        session = {
+            'start_at': context['game'].get('start_time'),
+            'end_at': IkaUtils.get_end_time(context).timestamp(),
+            'map': context['game'].get('map'),
+            'rule': context['game'].get('rule'),
+            'result': IkaUtils.getWinLoseText(
+                context['game'].get('won'),
+                win_text='win', lose_text='lose', unknown_text=None),
+            'source_file': context['engine'].get('source_file'),
+        }
+
+        _set(session, 'lobby', context['lobby'], 'type')
+        if (not session.get('lobby')) and context['game'].get('is_fes'):
+            session['lobby'] = 'festa'
+
+        _set(session, 'udemae_pre', context['game'], 'result_udemae_str_pre')
+        _set(session, 'udemae_exp_pre', context['game'],
+             'result_udemae_exp_pre')
+        _set(session, 'udemae_after', context['game'], 'result_udemae_str')
+        _set(session, 'udemae_exp_after', context['game'],
+             'result_udemae_exp')
+
+        if context['scenes'].get('result_gears'):
+            _set(session, 'cash_after',
+                 context['scenes']['result_gears'], 'cash')
+
+        me = IkaUtils.getMyEntryFromContext(context)
+        if me:
+            for field in ['kills', 'deaths', 'score', 'weapon',
+                          'rank_in_team']:
+                _set(session, field, me, field)
+
+        players = []
+        for player in (context['game'].get('players') or []):
+            player_record = {'me': bool(player.get('me'))}
+            for field in ['team', 'kills', 'deaths', 'score', 'weapon',
+                          'rank_in_team']:
+                _set(player_record, field, player, field)
+            players.append(player_record)
+
+        return session, players
+
+    def _get_store(self):
+        if self._store is None:
+            self._store = EventStore(self.db_filename)
+        return self._store
+
+    def _close_game_session(self, context):
+        if self._called_close_game_session:
+            return
+        self._called_close_game_session = True
+
+        IkaUtils.dprint('%s (enabled = %s)' % (self, self.enabled))
+        if not self.enabled:
+            return
+
+        session, players = self.get_session(context)
+        timelines = context['game'].get('events')
+        if timelines is not None:
+            timelines = timelines.to_dict()
+        try:
+            self._get_store().add_session(
+                session, players, self._events, timelines)
+        except:
+            IkaUtils.dprint('%s: Failed to write the session to %s' %
+                            (self, self.db_filename))
+        self._events = []
+
+    def on_game_session_end(self, context):
+        self._close_game_session(context)
+
+    def on_game_session_abort(self, context):
+        self._close_game_session(context)
+
+    def on_stop(self, context):
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+
+    ##
+    # Constructor
+    # @param self         The Object Pointer.
+    # @param db_filename  SQLite database file name
+    #
+    def __init__(self, db_filename=None):
+        self.enabled = (not db_filename is None)
+        self.db_filename = db_filename
+        self._store = None
+        self._events = []
+
+        # If true, it means the data is not saved.
+        self._called_close_game_session = False
@@ -21,7 +21,6 @@
 import json
 import os
 import pprint
-import threading
 import time
 import traceback
 import uuid
@@ -30,12 +29,15 @@ import webbrowser
 import cv2
 import umsgpack
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from ikalog.constants import fes_rank_titles, stages, weapons, special_weapons
-from ikalog.utils.statink_uploader import UploadToStatInk
+from ikalog.utils.statink_spool import StatInkSpool
+from ikalog.utils.statink_uploader import PackPayload
 import ikalog.version
 from ikalog.utils import *
 from ikalog.utils.anonymizer import anonymize
+from ikalog.utils.image_writer import get_image_writer
 
 _ = Localization.gettext_translation('statink', fallback=True).gettext
 
@@ -216,21 +218,69 @@ class StatInk(object):
                 '%s: Failed convert weapon name %s to stas.ink value' % (self, weapon))
         return weapon_id
 
+    def _get_image_encode_params(self):
+        if self.image_format == 'jpg':
+            return ['.jpg', [cv2.IMWRITE_JPEG_QUALITY, self.image_quality]]
+
+        params = []
+        if self.image_compression is not None:
+            params = [cv2.IMWRITE_PNG_COMPRESSION, self.image_compression]
+        return ['.png', params]
+
     def encode_image(self, img):
-        result, img_png = cv2.imencode('.png', img)
+        ext, params = self._get_image_encode_params()
+        result, img_encoded = cv2.imencode(ext, img, params)
 
         if not result:
             IkaUtils.dprint('%s: Failed to encode the image (%s)' %
                             (self, img.shape))
             return None
 
-        s = img_png.tostring()
+        s = img_encoded.tobytes()
 
         IkaUtils.dprint('%s: Encoded screenshot (%dx%d %d bytes)' %
                         (self, img.shape[1], img.shape[0], len(s)))
 
         return s
 
+    def _encode_image_worker(self, img, anon=False):
+        # This function runs on worker thread.
+        if anon:
+            img = anonymize(
+                img,
+                anonOthers=self.anon_others,
+                anonAll=self.anon_all,
+            )
+        return self.encode_image(img)
+
+    def _start_encode_image(self, key, img, anon=False):
+        """
+        Start encoding the screenshot for payload[key] in background.
+        """
+        if img is None:
+            self._image_futures.pop(key, None)
+            return
+
+        self._image_futures[key] = self._image_executor.submit(
+            self._encode_image_worker, img, anon)
+
+    def _get_encoded_image(self, key, img, anon=False):
+        """
+        Returns the encoded screenshot for payload[key]. Waits for the
+        background encoding if started.
+        """
+        future = self._image_futures.get(key)
+        if future is None:
+            # The screenshot was not gathered by the hooks.
+            return self._encode_image_worker(img, anon)
+
+        try:
+            return future.result()
+        except:
+            IkaUtils.dprint('%s: Failed to encode %s' % (self, key))
+            IkaUtils.dprint(traceback.format_exc())
+            return None
+
     def _set_values(self, fields, dest, src):
         for field in fields:
 
@@ -391,7 +441,8 @@ class StatInk(object):
             }
 
         if self.img_gears is not None:
-            payload['image_gear'] = self.encode_image(self.img_gears)
+            payload['image_gear'] = self._get_encoded_image(
+                'image_gear', self.img_gears)
 
         # Agent Information
 
@@ -581,17 +632,14 @@ class StatInk(object):
         # Screenshots
 
         if self.img_result_detail is not None:
-            img_scoreboard = anonymize(
-                self.img_result_detail,
-                anonOthers = self.anon_others,
-                anonAll = self.anon_all,
-            )
-            payload['image_result'] = self.encode_image(img_scoreboard)
+            payload['image_result'] = self._get_encoded_image(
+                'image_result', self.img_result_detail, anon=True)
         else:
             IkaUtils.dprint('%s: img_result_detail is empty.' % self)
 
         if self.img_judge is not None:
-            payload['image_judge'] = self.encode_image(self.img_judge)
+            payload['image_judge'] = self._get_encoded_image(
+                'image_judge', self.img_judge)
         else:
             IkaUtils.dprint('%s: img_judge is empty.' % self)
 
@@ -617,28 +665,34 @@ class StatInk(object):
             IkaUtils.dprint('%s: Failed to write file' % self)
             IkaUtils.dprint(traceback.format_exc())
 
-    def write_payload_to_file(self, payload, filename=None):
+    def write_payload_to_file(self, payload, filename=None, context=None):
         if filename is None:
             t = datetime.now().strftime("%Y%m%d_%H%M")
             filename = os.path.join('/tmp', 'statink_%s.msgpack' % t)
 
         try:
-            f = open(filename, 'wb')
-            umsgpack.pack(payload, f)
-            f.close()
+            data = umsgpack.packb(payload)
         except:
             IkaUtils.dprint('%s: Failed to write msgpack file' % self)
             IkaUtils.dprint(traceback.format_exc())
+            return
 
-    def _post_payload_worker(self, context, payload, api_key,
-                             call_plugins_later_func=None):
-        # This function runs on worker thread.
-        error, statink_response = UploadToStatInk(payload,
-                                                  api_key,
-                                                  self.url_statink_v1_battle,
-                                                  self.show_response_enabled,
-                                                  (self.dry_run == 'server'))
+        get_image_writer(context or {}).write_file(filename, data)
 
+    def _get_spool(self):
+        if self._spool is None:
+            self._spool = StatInkSpool(
+                self.spool_dir,
+                url=self.url_statink_v1_battle,
+                num_workers=self.upload_workers,
+                callback=self._on_upload_done,
+            )
+        self._spool.show_response = self.show_response_enabled
+        return self._spool
+
+    def _on_upload_done(self, job, error, statink_response, context):
+        # This function runs on worker thread.
+        call_plugins_later_func = self._call_plugins_later_func
         if not call_plugins_later_func:
             return
 
@@ -680,12 +734,13 @@ class StatInk(object):
             raise('No API key specified')
 
         copied_context = IkaUtils.copy_context(context)
-        call_plugins_later_func = context['engine']['service']['call_plugins_later']
+        self._call_plugins_later_func = \
+            context['engine']['service']['call_plugins_later']
 
-        thread = threading.Thread(
-            target=self._post_payload_worker,
-            args=(copied_context, payload, api_key, call_plugins_later_func))
-        thread.start()
+        body = PackPayload(payload, api_key,
+                           dry_run=(self.dry_run == 'server'))
+        job = self._get_spool().put(body, context=copied_context)
+        IkaUtils.dprint('%s: Spooled the payload as %s' % (self, job))
 
     def print_payload(self, payload):
         payload = payload.copy()
@@ -731,6 +786,7 @@ class StatInk(object):
         self.img_result_detail = None
         self.img_judge = None
         self.img_gears = None
+        self._image_futures = {}
 
         IkaUtils.dprint('%s: Discarded screenshots' % self)
 
@@ -743,11 +799,14 @@ class StatInk(object):
         self.img_result_detail = context['game']['image_scoreboard']
         IkaUtils.dprint('%s: Gathered img_result (%s)' %
                         (self, self.img_result_detail.shape))
+        self._start_encode_image(
+            'image_result', self.img_result_detail, anon=True)
 
     def on_result_judge(self, context):
         self.img_judge = context['game'].get('image_judge', None)
         IkaUtils.dprint('%s: Gathered img_judge(%s)' %
                         (self, self.img_judge.shape))
+        self._start_encode_image('image_judge', self.img_judge)
 
     def _close_game_session(self, context):
         if self._called_close_game_session:
@@ -773,7 +832,8 @@ class StatInk(object):
 
         if self.debug_writePayloadToFile or self.payload_file:
             payload_file = IkaUtils.get_file_name(self.payload_file, context)
-            self.write_payload_to_file(payload, filename=payload_file)
+            self.write_payload_to_file(payload, filename=payload_file,
+                                       context=context)
 
         self.post_payload(context, payload)
 
@@ -781,6 +841,26 @@ class StatInk(object):
         self.img_gears = context['game']['image_gears']
         IkaUtils.dprint('%s: Gathered img_gears (%s)' %
                         (self, self.img_gears.shape))
+        self._start_encode_image('image_gear', self.img_gears)
+
+    def on_initialize_plugin(self, context):
+        self._call_plugins_later_func = \
+            context['engine']['service']['call_plugins_later']
+
+        # Upload the payloads left in the spool by the last run.
+        if self.enabled and os.path.exists(self.spool_dir):
+            self._get_spool().start()
+
+    def on_stop(self, context):
+        if self._spool is None:
+            return
+
+        # Don't hold the shutdown during an outage. The payloads not
+        # uploaded in time stay in the spool, and are resumed on the next
+        # start (on_initialize_plugin).
+        if not self._spool.wait(timeout=5):
+            IkaUtils.dprint('%s: %d payload(s) left in %s' %
+                            (self, self._spool.pending(), self.spool_dir))
 
     def on_game_session_end(self, context):
         self._close_game_session(context)
@@ -951,7 +1031,10 @@ class StatInk(object):
                  track_special_gauge=False, track_special_weapon=False,
                  anon_all = False, anon_others = False,
                  debug=False, dry_run=False, url='https://stat.ink',
-                 video_id=None, payload_file=None):
+                 video_id=None, payload_file=None,
+                 spool_dir='statink_spool/', upload_workers=2,
+                 image_format='png', image_quality=95, image_compression=None,
+                 image_workers=2):
         self.enabled = not (api_key is None)
         self.api_key = api_key
         self.dry_run = dry_run
@@ -975,12 +1058,23 @@ class StatInk(object):
         self.img_judge = None
         self.img_gears = None
 
+        # Screenshots are encoded in background as soon as gathered.
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.image_compression = image_compression
+        self._image_executor = ThreadPoolExecutor(max_workers=image_workers)
+        self._image_futures = {}
 
         self.url_statink_v1_battle = '%s/api/v1/battle' % url
 
         self.video_id = video_id
         self.payload_file = payload_file
 
+        self.spool_dir = spool_dir
+        self.upload_workers = upload_workers
+        self._spool = None
+        self._call_plugins_later_func = None
+
         # If true, it means the payload is not posted or saved.
         self._called_close_game_session = False
 
@@ -23,52 +23,154 @@ import time
 
 import cv2
 
+from ikalog.utils import *
 
-class PreviewRequestHandler(object):
 
-    def __init__(self, http_handler):
-        self._http_handler = http_handler
-        self._plugin = http_handler.server.parent
-        self._frame = None
-        self._new_image = False
-        self._stopped = False
+class PreviewEncoder(object):
+    """
+    Shared MJPEG encoder for the preview clients.
 
-        self._http_handler.send_response(200)
-        self._http_handler.send_header(
-            'Content-type', 'multipart/x-mixed-replace; boundary=--frame_boundary')
-        self._http_handler.end_headers()
+    The engine hands over each preview frame by put_frame(), which only
+    keeps the reference. The encoder thread encodes the latest frame, at
+    most fps times per second and only while any client subscribes, and
+    the same JPEG bytes are broadcast to all the clients.
+
+    A client always takes the latest JPEG, so a slow client just skips
+    the frames it could not send in time.
+    """
+
+    def put_frame(self, frame):
+        with self._cond:
+            self._frame = frame
+            self._frame_seq = self._frame_seq + 1
+            if self._subscribers > 0:
+                self._cond.notify_all()
+
+    def subscribe(self):
+        with self._cond:
+            self._subscribers = self._subscribers + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker)
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify_all()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers = self._subscribers - 1
 
-        self._plugin._listeners.append(self)
+    def get_jpeg(self, last_seq, timeout=1.0):
+        """
+        Wait for a JPEG newer than last_seq.
+        Returns (seq, JPEG bytes), or (last_seq, None) on timeout.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while (self._jpeg_seq <= last_seq) and not self._stopped:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return last_seq, None
+                self._cond.wait(remaining)
 
-        while not self._stopped:
-            time.sleep(0.05)
+            if self._jpeg_seq <= last_seq:
+                return last_seq, None
+            return self._jpeg_seq, self._jpeg
 
-            if (self._frame is None):
-                continue
+    def _encode(self, frame):
+        if (self.width is not None) and (self.height is not None) and \
+                (frame.shape[1] != self.width or frame.shape[0] != self.height):
+            frame = cv2.resize(frame, (self.width, self.height),
+                               interpolation=cv2.INTER_AREA)
 
-            # FIXME: JPEG data should be shared among connections, for
-            # performance
-            result, jpeg = cv2.imencode('.jpg', self._frame)
-            if not result:
-                continue
+        result, jpeg = cv2.imencode(
+            '.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not result:
+            return None
+        return jpeg.tobytes()
 
-            jpeg_length = len(jpeg)
-            self.new_image = False
+    def _worker(self):
+        encoded_seq = 0
+        while True:
+            with self._cond:
+                while (not self._stopped) and \
+                        ((self._subscribers == 0) or
+                         (self._frame_seq == encoded_seq)):
+                    self._cond.wait()
 
-            self._http_handler.wfile.write(
-                '--frame_boundary\r\n'.encode('utf-8')
-            )
-            self._http_handler.send_header('Content-type', 'image/jpeg')
-            self._http_handler.send_header('Content-length', str(jpeg_length))
-            self._http_handler.end_headers()
-            self._http_handler.wfile.write(jpeg)
+                if self._stopped:
+                    self._thread = None
+                    self._cond.notify_all()
+                    return
 
-        self._plugin._listeners.remove(self)
+                frame = self._frame
+                encoded_seq = self._frame_seq
 
-    def on_event(self, event_name, context, params=None):
-        if event_name == 'on_show_preview':
-            self._frame = context['engine']['frame']
-            self._new_image = (self._frame is not None)
+            jpeg = self._encode(frame)
 
-        elif event_name == 'on_stop':
+            with self._cond:
+                if jpeg is not None:
+                    self._jpeg = jpeg
+                    self._jpeg_seq = self._jpeg_seq + 1
+                    self.encoded = self.encoded + 1
+                    self._cond.notify_all()
+
+            # Frame rate limit.
+            time.sleep(1.0 / self.fps)
+
+    def is_stopped(self):
+        return self._stopped
+
+    def stop(self):
+        with self._cond:
             self._stopped = True
+            self._cond.notify_all()
+
+    def __init__(self, fps=20, width=None, height=None, quality=80):
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.quality = quality
+        self.encoded = 0
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_seq = 0
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._subscribers = 0
+        self._stopped = False
+        self._thread = None
+
+
+class PreviewRequestHandler(object):
+
+    def _send_jpeg(self, jpeg):
+        self._http_handler.wfile.write(
+            '--frame_boundary\r\n'.encode('utf-8')
+        )
+        self._http_handler.send_header('Content-type', 'image/jpeg')
+        self._http_handler.send_header('Content-length', str(len(jpeg)))
+        self._http_handler.end_headers()
+        self._http_handler.wfile.write(jpeg)
+
+    def __init__(self, http_handler):
+        self._http_handler = http_handler
+        self._plugin = http_handler.server.parent
+        encoder = self._plugin.get_preview_encoder()
+
+        self._http_handler.send_response(200)
+        self._http_handler.send_header(
+            'Content-type', 'multipart/x-mixed-replace; boundary=--frame_boundary')
+        self._http_handler.end_headers()
+
+        encoder.subscribe()
+        try:
+            seq = 0
+            while not encoder.is_stopped():
+                seq, jpeg = encoder.get_jpeg(seq)
+                if jpeg is not None:
+                    self._send_jpeg(jpeg)
+        except (ConnectionError, OSError):
+            IkaUtils.dprint('%s: Preview client disconnected' % self)
+        finally:
+            encoder.unsubscribe()
@@ -25,9 +25,12 @@ import threading
 import traceback
 
 from ikalog.utils import *
-from .preview import PreviewRequestHandler
+from .preview import PreviewEncoder, PreviewRequestHandler
 
 def _get_type_name(var):
+    # The event timeline, as lists of [msec, value].
+    if isinstance(var, EventSeries):
+        return var.tolist()
     return type(var).__name__
 
 
@@ -161,11 +164,16 @@ class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
 
 class RESTAPIServer(object):
 
-    def __init__(self, enabled=False, bind_addr='127.0.0.1', port=8888):
+    def __init__(self, enabled=False, bind_addr='127.0.0.1', port=8888,
+                 preview_fps=20, preview_width=None, preview_height=None,
+                 preview_quality=80):
         self._bind_addr = bind_addr
         self._port = port
         self._listeners = []
         self._httpd = None
+        self._preview = PreviewEncoder(
+            fps=preview_fps, width=preview_width, height=preview_height,
+            quality=preview_quality)
 
         self._worker_thread = None
 
@@ -205,6 +213,15 @@ class RESTAPIServer(object):
         if self._httpd:
             self._httpd.ikalog_context = context
 
+    def get_preview_encoder(self):
+        return self._preview
+
+    def on_show_preview(self, context):
+        self._preview.put_frame(context['engine']['frame'])
+
+    def on_stop(self, context):
+        self._preview.stop()
+
     def on_uncaught_event(self, event_name, context, params=None):
         for listener in self._listeners:
             listener.on_event(event_name, context, params)
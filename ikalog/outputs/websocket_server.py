@@ -18,6 +18,7 @@
 #  limitations under the License.
 #
 
+import collections
 import json
 import os
 import sys
@@ -50,7 +51,6 @@ websockets = []
 
 class IndexHandler(tornado.web.RequestHandler):
 
-    @tornado.web.asynchronous
     def get(self):
         # For testing....
         self.render("index.html")
@@ -64,6 +64,8 @@ class WebSocketHandler(tornado.websocket.WebSocketHandler):
 
     def open(self):
         IkaUtils.dprint("%s: Connected" % self)
+        self.pending_writes = 0
+        self.skipped_ticks = 0
         websockets.append(self)
 
     def on_message(self, message):
@@ -74,19 +76,130 @@ class WebSocketHandler(tornado.websocket.WebSocketHandler):
         del websockets[websockets.index(self)]
 
 
-class WebSocketServer(object):
+class WebSocketBroadcaster(object):
+    """
+    Broadcasts the messages to the WebSocket clients on the IOLoop.
 
-    def _send_message(self, d):
-        if len(websockets) == 0:
+    The engine thread only appends the message to the queue. The queue
+    is flushed on the IOLoop every interval seconds: messages of the
+    events in coalesce_events supersede the older ones of the same
+    event, and each message is encoded once for all the clients.
+
+    If batch is True, the messages of a tick are sent in a frame as a
+    JSON array. Otherwise each message is sent in its own frame.
+
+    A client which has max_pending_writes frames not written yet is
+    skipped for the tick, and is disconnected after max_skipped_ticks
+    ticks skipped in a row.
+    """
+
+    def attach(self, ioloop):
+        self._ioloop = ioloop
+
+    def enqueue(self, d):
+        if (len(self._clients) == 0) or (self._ioloop is None):
             return
 
-        IkaUtils.dprint('%s: number of websockets = %d' %
-                        (self, len(websockets)))
-        d_json = json.dumps(d, separators=(',', ':'), ensure_ascii=False)
+        with self._lock:
+            event = d.get('event')
+            if event in self.coalesce_events:
+                old = self._coalesce_index.get(event)
+                if old is not None:
+                    old[0] = None
+                    self.coalesced = self.coalesced + 1
+
+            item = [d]
+            self._queue.append(item)
+            if event in self.coalesce_events:
+                self._coalesce_index[event] = item
+
+            if len(self._queue) > self.max_queue:
+                self._queue.popleft()
+                self.dropped = self.dropped + 1
+
+            if self._scheduled:
+                return
+            self._scheduled = True
+
+        self._ioloop.add_callback(self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._ioloop.call_later(self.interval, self.flush)
+
+    def _take_messages(self):
+        with self._lock:
+            items = self._queue
+            self._queue = collections.deque()
+            self._coalesce_index = {}
+            self._scheduled = False
+
+        return [item[0] for item in items if item[0] is not None]
+
+    def _encode(self, messages):
+        if self.batch:
+            return [json.dumps(messages, separators=(',', ':'),
+                               ensure_ascii=False)]
+
+        return [json.dumps(d, separators=(',', ':'), ensure_ascii=False)
+                for d in messages]
+
+    def _on_write_done(self, client, future):
+        client.pending_writes = client.pending_writes - 1
+
+    def _write(self, client, frames):
+        if client.pending_writes >= self.max_pending_writes:
+            client.skipped_ticks = client.skipped_ticks + 1
+            if client.skipped_ticks > self.max_skipped_ticks:
+                IkaUtils.dprint('%s: Disconnecting slow client %s' %
+                                (self, client))
+                client.close()
+            return
 
-        for s in websockets:
-            IkaUtils.dprint('  Sending a message to %s' % s)
-            s.write_message(d_json)
+        client.skipped_ticks = 0
+        for frame in frames:
+            try:
+                future = client.write_message(frame)
+            except tornado.websocket.WebSocketClosedError:
+                return
+
+            client.pending_writes = client.pending_writes + 1
+            future.add_done_callback(
+                lambda f, client=client: self._on_write_done(client, f))
+
+    def flush(self):
+        # This function runs on the IOLoop.
+        messages = self._take_messages()
+        if len(messages) == 0:
+            return
+
+        frames = self._encode(messages)
+        for client in list(self._clients):
+            self._write(client, frames)
+
+    def __init__(self, clients, interval=0.1, batch=False,
+                 coalesce_events=('on_game_paint_score_update',),
+                 max_queue=256, max_pending_writes=64, max_skipped_ticks=50):
+        self.interval = interval
+        self.batch = batch
+        self.coalesce_events = set(coalesce_events)
+        self.max_queue = max_queue
+        self.max_pending_writes = max_pending_writes
+        self.max_skipped_ticks = max_skipped_ticks
+        self.coalesced = 0
+        self.dropped = 0
+
+        self._clients = clients
+        self._ioloop = None
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._coalesce_index = {}
+        self._scheduled = False
+
+
+class WebSocketServer(object):
+
+    def _send_message(self, d):
+        self._broadcaster.enqueue(d)
 
     # In-game basic events
 
@@ -307,6 +420,7 @@ class WebSocketServer(object):
 
         # FIXME: bind_addr
         self.application.listen(websocket_server._port)
+        self._broadcaster.attach(tornado.ioloop.IOLoop.instance())
 
         IkaUtils.dprint('%s: Listen port %d' % (self, websocket_server._port))
         IkaUtils.dprint('%s: Started server thread' % self)
@@ -416,11 +530,18 @@ class WebSocketServer(object):
 
         self.panel.SetSizer(self.layout)
 
-    def __init__(self, enabled=False, bind_addr='127.0.0.1', port=9090):
+    def __init__(self, enabled=False, bind_addr='127.0.0.1', port=9090,
+                 interval=0.1, batch=False,
+                 coalesce_events=('on_game_paint_score_update',),
+                 max_pending_writes=64):
         if not _tornado_imported:
             print("モジュール tornado がロードできませんでした。 WebSocket サーバが起動できません。")
             print("インストールするには以下のコマンドを利用してください。\n    pip install tornado\n")
             return
+        self._broadcaster = WebSocketBroadcaster(
+            websockets, interval=interval, batch=batch,
+            coalesce_events=coalesce_events,
+            max_pending_writes=max_pending_writes)
         self._enabled = enabled
         self._port = 9090
         self.worker_thread = None
@@ -24,6 +24,7 @@ import cv2
 from ikalog.scenes.stateful_scene import StatefulScene
 from ikalog.utils import *
 from ikalog.utils.character_recoginizer import *
+from ikalog.utils.image_writer import get_image_writer
 
 
 class GameDead(StatefulScene):
@@ -33,7 +34,13 @@ class GameDead(StatefulScene):
     }
 
     def recoginize_and_vote_death_reason(self, context):
-        if self.deadly_weapon_recoginizer is None:
+        # The result is already settled. No more recoginition needed.
+        if self._death_reason_votes.is_settled():
+            return False
+
+        # The model is loaded in background. Skip until it is ready.
+        recoginizer = deadly_weapon_recoginizers.get(block=False)
+        if recoginizer is None:
             return False
 
         lang_short = Localization.get_game_languages()[0][0:2]
@@ -60,7 +67,7 @@ class GameDead(StatefulScene):
             import time
             filename = os.path.join(  # training/ directory must already exist
                 'training', '_deadly_weapons.%s.png' % time.time())
-            cv2.imwrite(filename, img_weapon_b)
+            get_image_writer(context).write_image(filename, img_weapon_b)
             self.time_last_write = context['engine']['msec']
 
         # Workaround for languages that deadly_weapons is not trained
@@ -68,28 +75,19 @@ class GameDead(StatefulScene):
             return
 
         img_weapon_b_bgr = cv2.cvtColor(img_weapon_b, cv2.COLOR_GRAY2BGR)
-        weapon_id = self.deadly_weapon_recoginizer.match(img_weapon_b_bgr)
+        weapon_id = recoginizer.match(img_weapon_b_bgr)
 
-        # 投票する(あとでまとめて開票)
-        votes = self._cause_of_death_votes
-        votes[weapon_id] = votes.get(weapon_id, 0) + 1
+        # 投票する(当選が確定したらその時点で開票)
+        if self._death_reason_votes.vote(weapon_id):
+            self.identify_death_reason(context)
 
     def count_death_reason_votes(self, context):
-        votes = self._cause_of_death_votes
-        if len(votes) == 0:
+        key, accuracy = self._death_reason_votes.get_winner()
+        if key is None:
             return None
 
-        key_list = list(map(lambda key: key, votes.keys()))
-        count_list = list(map(lambda key: votes[key], key_list))
-
-        max_index = np.argmax(count_list)
-        key = key_list[max_index]
-
-        # softmax
-        sum_votes_exp = np.sum(np.exp(count_list))
-        accuracy = np.exp(count_list[max_index]) / sum_votes_exp
-
-        print('votes=%s accuracy=%3.3f' % (votes, accuracy))
+        print('votes=%s accuracy=%3.3f' %
+              (self._death_reason_votes.votes, accuracy))
 
         context['game']['last_death_reason'] = key
         context['game']['death_reasons'][key] = \
@@ -97,11 +95,26 @@ class GameDead(StatefulScene):
 
         return key
 
+    def identify_death_reason(self, context):
+        if self._death_reason_identified:
+            return
+
+        # Chattering (see _state_tracking)
+        if self.matched_in(context, 5 * 1000, attr='_last_event_msec'):
+            return
+
+        self._death_reason_identified = True
+        self.count_death_reason_votes(context)
+
+        if 'last_death_reason' in context['game']:
+            self._call_plugins('on_game_death_reason_identified')
+
     def reset(self):
         super(GameDead, self).reset()
 
         self._last_event_msec = - 100 * 1000
-        self._cause_of_death_votes = {}
+        self._death_reason_votes.reset()
+        self._death_reason_identified = False
 
     def _state_default(self, context):
         if not self.is_another_scene_matched(context, 'GameTimerIcon'):
@@ -144,17 +157,15 @@ class GameDead(StatefulScene):
 
         # それ以上マッチングしなかった場合 -> シーンを抜けている
         if not self.matched_in(context, 5 * 1000, attr='_last_event_msec'):
-            self.count_death_reason_votes(context)
-
-            if 'last_death_reason' in context['game']:
-                self._call_plugins('on_game_death_reason_identified')
-
+            # The votes were not settled while dead; count them now.
+            self.identify_death_reason(context)
             self._call_plugins('on_game_respawn')
 
         self._last_event_msec = context['engine']['msec']
         self._switch_state(self._state_default)
         context['game']['dead'] = False
-        self._cause_of_death_votes = {}
+        self._death_reason_votes.reset()
+        self._death_reason_identified = False
 
         return False
 
@@ -165,6 +176,8 @@ class GameDead(StatefulScene):
         pass
 
     def _init_scene(self, debug=False):
+        self._death_reason_votes = VoteAccumulator(min_votes=5, margin=4)
+
         self.mask_dead = IkaMatcher(
             1057, 657, 137, 26,
             img_file='game_dead.png',
@@ -177,10 +190,7 @@ class GameDead(StatefulScene):
             debug=debug,
         )
 
-        try:
-            self.deadly_weapon_recoginizer = DeadlyWeaponRecoginizer()
-        except:
-            self.deadly_weapon_recoginizer = None
+        deadly_weapon_recoginizers.load_async()
 
 if __name__ == "__main__":
     GameDead.main_func()
@@ -25,8 +25,8 @@ import os
 import pickle
 import re
 import sys
-import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import cv2
@@ -36,6 +36,7 @@ from ikalog.api import APIClient
 from ikalog.scenes.stateful_scene import StatefulScene
 from ikalog.inputs.filters import OffsetFilter
 from ikalog.utils import *
+from ikalog.utils.feature_aligner import FeatureAligner
 from ikalog.utils.player_name import *
 
 
@@ -56,10 +57,15 @@ class ResultDetail(StatefulScene):
     # AKAZE ベースのオフセット／サイズ調整
     #
 
-    def result_detail_normalizer(self, img):
+    # Features are detected only in this region of the result screen.
+    _akaze_roi = (680, 0, 1280, 720)
+
+    def result_detail_normalizer(self, img, left=0):
+        # img: 画像（left は img の左端の x 座標）
         # キーポイントとして不要な部分を削除
-        img = copy.deepcopy(img)
-        cv2.rectangle(img, (0, 000), (680, 720), (0, 0, 0), -1)
+        if left < 680:
+            img = copy.deepcopy(img)
+            cv2.rectangle(img, (0, 000), (680 - left, 720), (0, 0, 0), -1)
 
         # 特徴画像の生成
         white_filter = matcher.MM_WHITE()
@@ -67,17 +73,19 @@ class ResultDetail(StatefulScene):
         img_w = white_filter(img)
         img_dark = 255 - dark_filter(img)
 
+        x = 1000 - left
         img_features = img_dark + img_w
-        img_features[:, 1000:1280] = \
-            img_dark[:, 1000:1280] - img_w[:, 1000:1280]
+        img_features[:, x:] = img_dark[:, x:] - img_w[:, x:]
         # cv2.imshow('features', img_features)
         # cv2.waitKey(10000)
 
         return img_features
 
+    def _result_detail_normalizer_roi(self, img):
+        return self.result_detail_normalizer(img, left=self._akaze_roi[0])
+
     def get_keypoints(self, img):
-        detector = cv2.AKAZE_create()
-        keypoints, descriptors = detector.detectAndCompute(
+        keypoints, descriptors = self._akaze_detector.detectAndCompute(
             img,
             None,
         )
@@ -164,54 +172,31 @@ class ResultDetail(StatefulScene):
             )
             self.load_model_from_file(model_filename)
 
+        self._aligner = FeatureAligner(
+            self.ref_keypoints,
+            self.ref_descriptors,
+            self.ref_image_geometry,
+            roi=self._akaze_roi,
+        )
+
     def auto_warp(self, context):
         # 画面のオフセットを自動検出して image を返す (AKAZE利用)
 
         frame = context['engine'].get('frame', None)
         if frame is None:
             return None
-        keypoints, descs = self.get_keypoints(
-            self.result_detail_normalizer(frame))
-
-        matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
-        raw_matches = matcher.knnMatch(
-            descs,
-            trainDescriptors=self.ref_descriptors,
-            k=2
-        )
-        p2, p1, kp_pairs = self.filter_matches(
-            keypoints,
-            self.ref_keypoints,
-            raw_matches,
-        )
-
-        if len(p1) >= 4:
-            H, status = cv2.findHomography(p1, p2, cv2.RANSAC, 5.0)
-            print('%d / %d  inliers/matched' % (np.sum(status), len(status)))
-        else:
-            H, status = None, None
-            print('%d matches found, not enough for homography estimation' % len(p1))
-            raise
-
-        w = 1280
-        h = 720
-        corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
-        pts2 = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
-        pts1 = np.float32(cv2.perspectiveTransform(
-            corners.reshape(1, -1, 2), H).reshape(-1, 2) + (0, 0))
-        M = cv2.getPerspectiveTransform(pts1, pts2)
-
-        # out = cv2.drawKeypoints(img2, keypoints1, None)
-        new_frame = cv2.warpPerspective(frame, M, (w, h))
 
         # 変形した画像がマスクと一致するか？
-        matched = ImageUtils.match_with_mask(
-            new_frame, self.winlose_gray, 0.997, 0.22)
-        if matched:
-            return new_frame
-
-        IkaUtils.dprint('%s: auto_warp() function broke the image.' % self)
-        return None
+        def validate_func(new_frame):
+            return ImageUtils.match_with_mask(
+                new_frame, self.winlose_gray, 0.997, 0.22)
+
+        # None if the image could not be aligned.
+        return self._aligner.align(
+            frame,
+            normalizer=self._result_detail_normalizer_roi,
+            validate_func=validate_func,
+        )
 
     def adjust_method_generic(self, context, l):
         frame = context['engine']['frame']
@@ -308,7 +293,8 @@ class ResultDetail(StatefulScene):
                     params={'desc': best['desc']}
                 )
             if best.get('offset',None):
-                self._call_plugins('on_result_detail_calibration', best.get('offset'))
+                self._call_plugins_later(
+                    'on_result_detail_calibration', best.get('offset'))
 
         else:
             # Should not reach here
@@ -360,9 +346,6 @@ class ResultDetail(StatefulScene):
             self._analyze_kills_per_weapon(context)
             self._analyze_kills_per_player(context)
 
-        self._call_plugins_later('on_result_detail')
-        self._call_plugins_later('on_game_individual_result')
-
     def is_entry_me(self, img_entry):
         # ヒストグラムから、入力エントリが自分かを判断
         if len(img_entry.shape) > 2 and img_entry.shape[2] != 1:
@@ -505,20 +488,23 @@ class ResultDetail(StatefulScene):
 
         ct_name_classifier = PlayerNameClassifier(img_name_counter_team)
 
-        for kill_index in range(len(context['game'].get('kill_list', []))):
-            kill = context['game']['kill_list'][kill_index]
+        kill_list = list(filter(
+            lambda e: e[1].get('img_kill_hid', None) is not None,
+            enumerate(context['game'].get('kill_list', []))
+        ))
 
-            if kill.get('img_kill_hid', None) is None:
-                continue
-
-            player_index = ct_name_classifier.predict(kill['img_kill_hid'])
+        # Match all the kills at once.
+        results = ct_name_classifier.match_list(
+            list(map(lambda e: e[1]['img_kill_hid'], kill_list)))
 
+        for (kill_index, kill), (player_index, confidence) in \
+                zip(kill_list, results):
             if player_index is None:
                 continue
 
             if 1:
-                IkaUtils.dprint('%s: my kill %d -> player %d' %
-                                (self, kill_index, player_index))
+                IkaUtils.dprint('%s: my kill %d -> player %d (%3.3f)' %
+                                (self, kill_index, player_index, confidence))
 
             kill['player'] = counter_team[player_index]
 
@@ -720,7 +706,7 @@ class ResultDetail(StatefulScene):
 
         return x_diff
 
-    def analyze(self, context):
+    def _analyze_frame(self, context):
         context['game']['players'] = []
         weapon_list = []
 
@@ -777,12 +763,7 @@ class ResultDetail(StatefulScene):
                         del e_[f]
                 print(e_)
 
-        if 0:
-            worker = threading.Thread(
-                target=self.async_recoginiton_worker, args=(context,))
-            worker.start()
-        else:
-            self.async_recoginiton_worker(context)
+        self.async_recoginiton_worker(context)
 
         # チームカラー
         team_colors = self.analyze_team_colors(context, img)
@@ -796,10 +777,120 @@ class ResultDetail(StatefulScene):
         # context['game']['timestamp'] = datetime.now()
         context['game']['image_scoreboard'] = \
             copy.deepcopy(context['engine']['frame'])
-        self._call_plugins_later('on_result_detail_still')
 
         return True
 
+    def _call_result_events(self, call_plugins):
+        call_plugins('on_result_detail')
+        call_plugins('on_game_individual_result')
+        call_plugins('on_result_detail_still')
+
+    def analyze(self, context):
+        self._analyze_frame(context)
+        self._call_result_events(self._call_plugins_later)
+        return True
+
+    #
+    # Background analysis
+    #
+
+    def _use_async_analysis(self, context):
+        # Only live inputs may drop the following scenes while analyzing.
+        capture = getattr(self._engine, 'capture', None)
+        if capture is None:
+            return False
+        return not getattr(capture, 'cap_recorded_video', True)
+
+    def _async_analysis_worker(self, snapshot):
+        try:
+            self._analyze_frame(snapshot['context'])
+        except:
+            IkaUtils.dprint('%s: Exception occured in analysis.' % self)
+            IkaUtils.dprint(traceback.format_exc())
+            return None
+
+        # Deliver the result on the engine thread.
+        self._call_plugins_later('on_result_detail_analyzed', snapshot)
+        return snapshot
+
+    def analyze_async(self, context):
+        """
+        Analyze a frozen copy of the current frame on the worker thread.
+
+        The result is merged to context['game'] and the events are
+        fired on the engine thread, once the analysis is completed
+        (see on_result_detail_analyzed()).
+        """
+        game = context['game']
+        # The worker must not touch the objects the engine thread sees.
+        game_copy = copy.deepcopy(game)
+        snapshot = {
+            # To detect game reset during the analysis.
+            'game': game,
+            # To find the values updated by the analysis.
+            'game_orig': dict(game_copy),
+            'context': {
+                'engine': {
+                    'frame': context['engine']['frame'].copy(),
+                    'msec': context['engine']['msec'],
+                },
+                'game': game_copy,
+                'scenes': {},
+                'lobby': {},
+            },
+        }
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+
+        self._future = self._executor.submit(
+            self._async_analysis_worker, snapshot)
+
+    def on_result_detail_analyzed(self, context, snapshot):
+        # The result may be delivered in on_game_session_end() already.
+        if snapshot.get('delivered'):
+            return
+        snapshot['delivered'] = True
+
+        if context['game'] is not snapshot['game']:
+            IkaUtils.dprint(
+                '%s: The game was reset during analysis. Discarded.' % self)
+            return
+
+        # Merge the values updated by the analysis.
+        game_orig = snapshot['game_orig']
+        game_analyzed = snapshot['context']['game']
+        for key, value in game_analyzed.items():
+            if (key not in game_orig) or (game_orig[key] is not value):
+                context['game'][key] = value
+
+        # The players of my kills are set in the copied kill list.
+        kill_list = context['game'].get('kill_list', [])
+        for kill, kill_analyzed in \
+                zip(kill_list, game_analyzed.get('kill_list', [])):
+            if 'player' in kill_analyzed:
+                kill['player'] = kill_analyzed['player']
+
+        self._call_result_events(self._call_plugins)
+
+    def on_game_session_end(self, context):
+        # The session may be closed while the analysis is still running.
+        # Wait for it, and deliver the result before the game is reset.
+        future = self._future
+        self._future = None
+        if future is None:
+            return
+
+        snapshot = future.result()
+        if snapshot is not None:
+            self.on_result_detail_analyzed(context, snapshot)
+
+    def on_stop(self, context):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._future = None
+
     def reset(self):
         super(ResultDetail, self).reset()
 
@@ -879,7 +970,12 @@ class ResultDetail(StatefulScene):
             # ・is_entries_still_sliding() の返却値（X印の散らばり度）
             #   の履歴の最小値と最新値が一致したら妥協で matched_diffX = True
 
-        if (diff_pixels is not None) and (not matched_diff0):
+        triggered = self.matched_in(
+            context, 30 * 1000, attr='_last_event_msec')
+
+        # Skip once triggered; the frame may be still under analysis.
+        if (diff_pixels is not None) and (not matched_diff0) and \
+                (not triggered):
             # FIXME: adjust_image は非常にコストが高い
             img = self.adjust_image(context)
             img_entries = self.extract_entries(context, img)
@@ -899,10 +995,11 @@ class ResultDetail(StatefulScene):
         # triggered: すでに一定時間以内にイベントが取りがされた
         escaped = not self.matched_in(context, 1000)
         matched2 = matched_diff0 or matched_diffX
-        triggered = self.matched_in(
-            context, 30 * 1000, attr='_last_event_msec')
         if matched2 and (not triggered):
-            self.analyze(context)
+            if self._use_async_analysis(context):
+                self.analyze_async(context)
+            else:
+                self.analyze(context)
             # self.dump(context)
 #            self._call_plugins('on_result_detail')
 #            self._call_plugins('on_game_individual_result')
@@ -1025,6 +1122,9 @@ class ResultDetail(StatefulScene):
         self.fest_gender_recoginizer = character_recoginizer.FesGenderRecoginizer()
         self.fest_level_recoginizer = character_recoginizer.FesLevelRecoginizer()
 
+        self._executor = None
+        self._future = None
+        self._akaze_detector = cv2.AKAZE_create()
         self.load_akaze_model()
         self._client_local = APIClient(local_mode=True)
 #        self._client_remote =  APIClient(local_mode=False, base_uri='http://localhost:8000')
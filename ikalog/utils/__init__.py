@@ -26,6 +26,8 @@ from .image_utils import ImageUtils
 from .matcher import IkaMatcher
 from .certifi import Certifi
 from .localization import Localization
+from .vote import VoteAccumulator
+from .event_timeline import EventSeries, EventTimeline
 from .icon_recoginizer.icon import IconRecoginizer
 from .icon_recoginizer.weapon import WeaponRecoginizer
 from .icon_recoginizer.gearpower import GearPowerRecoginizer
@@ -20,6 +20,9 @@
 
 import cv2
 import os
+import threading
+import traceback
+
 import numpy as np
 
 from ikalog.utils.character_recoginizer import *
@@ -125,18 +128,32 @@ class DeadlyWeaponRecoginizer(CharacterRecoginizer):
         self.responses = l[1]
         self.name2id_table = l[2]
 
-    def __new__(cls, *args, **kwargs):
+    @staticmethod
+    def resolve_language(lang=None):
+        """
+        Resolve the game language to the one which has a trained model.
 
-        if not hasattr(cls, '__instance__'):
-            cls.__instance__ = super(
-                DeadlyWeaponRecoginizer, cls).__new__(cls, *args, **kwargs)
+        lang: Game language (e.g. 'en_NA'). None means the current game
+              language.
+        Returns the first language of the expanded candidates which has
+        data/deadly_weapons.<lang>.model, or the first candidate otherwise.
+        """
+        if lang is None:
+            langs = Localization.get_game_languages()
+        else:
+            langs = Localization.expand_languages(lang)
 
-        return cls.__instance__
+        for lang_ in langs:
+            if os.path.isfile(DeadlyWeaponRecoginizer.model_filename(lang_)):
+                return lang_
 
-    def __init__(self):
-        if hasattr(self, 'trained') and self.trained:
-            return
+        return langs[0]
 
+    @staticmethod
+    def model_filename(lang):
+        return 'data/deadly_weapons.%s.model' % lang
+
+    def __init__(self, lang=None):
         super(DeadlyWeaponRecoginizer, self).__init__()
 
         self.name2id_table = []
@@ -144,14 +161,9 @@ class DeadlyWeaponRecoginizer(CharacterRecoginizer):
         self.x_cutter = self  # 変則的だがカッターとして自分を使う
         self.sample_height = 16
 
-        lang = Localization.get_game_languages()[0]
-        for lang_ in Localization.get_game_languages():
-            model_name = 'data/deadly_weapons.%s.model' % lang_
-            if os.path.isfile(model_name):
-                lang = lang_
-                break
-
-        model_name = 'data/deadly_weapons.%s.model' % lang
+        lang = self.resolve_language(lang)
+        self.lang = lang
+        model_name = self.model_filename(lang)
 
         if os.path.isfile(model_name):
             self.load_model_from_file(model_name)
@@ -187,9 +199,97 @@ class DeadlyWeaponRecoginizer(CharacterRecoginizer):
 
         self.train()
 
+
+class DeadlyWeaponRecoginizerRegistry(object):
+    """
+    Holds one DeadlyWeaponRecoginizer per game language.
+
+    Models are loaded lazily, either on the caller's thread (get()) or
+    on a background thread (load_async()), and shared by all the users
+    in the process (GameDead, APIServer, ...).
+    """
+
+    def _load(self, lang):
+        try:
+            recoginizer = DeadlyWeaponRecoginizer(lang)
+        except:
+            IkaUtils.dprint('%s: Failed to load the model for %s' %
+                            (self, lang))
+            IkaUtils.dprint(traceback.format_exc())
+            recoginizer = None
+
+        self._recoginizers[lang] = recoginizer
+        self._events[lang].set()
+
+    def _reserve(self, lang):
+        """
+        Returns the event for the language, and True if the caller is
+        responsible to load the model.
+        """
+        with self._lock:
+            event = self._events.get(lang)
+            if event is not None:
+                return event, False
+
+            event = threading.Event()
+            self._events[lang] = event
+            return event, True
+
+    def _start_loader_thread(self, lang):
+        thread = threading.Thread(
+            target=self._load, args=(lang,),
+            name='DeadlyWeaponRecoginizer(%s)' % lang)
+        thread.daemon = True
+        thread.start()
+
+    def load_async(self, lang=None):
+        """
+        Start loading the model for the language on a background thread.
+        Does nothing if the model is already loaded (or being loaded).
+        """
+        lang = DeadlyWeaponRecoginizer.resolve_language(lang)
+        event, owner = self._reserve(lang)
+        if owner:
+            self._start_loader_thread(lang)
+        return event
+
+    def get(self, lang=None, block=True):
+        """
+        Returns the recoginizer for the language.
+
+        lang:  Game language. None means the current game language.
+        block: If False, returns None immediately while the model is
+               being loaded in background.
+        Returns None if the model is not available.
+        """
+        lang = DeadlyWeaponRecoginizer.resolve_language(lang)
+        event, owner = self._reserve(lang)
+
+        if owner:
+            if block:
+                self._load(lang)
+            else:
+                self._start_loader_thread(lang)
+
+        if block:
+            event.wait()
+        elif not event.is_set():
+            return None
+
+        return self._recoginizers.get(lang)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = {}
+        self._recoginizers = {}
+
+
+# Process-wide registry.
+deadly_weapon_recoginizers = DeadlyWeaponRecoginizerRegistry()
+
 if __name__ == "__main__":
     import sys
-    obj = DeadlyWeaponRecoginizer()
+    obj = deadly_weapon_recoginizers.get()
 
     # 引数で PNG ファイルを渡されている場合は、それに対して
     # 認識処理を行う
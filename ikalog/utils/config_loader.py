@@ -34,7 +34,8 @@ def _init_source(opts):
 
     # Set the input type
     input_type = (opts.get('input') or IkaConfig.INPUT_SOURCE)
-    if opts.get('input_file'):
+    if opts.get('input_file') and \
+            (input_type not in ['FFmpegPipe', 'ImageDirectory']):
         input_type = 'CVFile'
     if not input_type:
         input_type = 'GStreamer'
@@ -57,7 +58,8 @@ def _init_source(opts):
     # パターン3: Windows 上でスクリーンキャプチャを利用
     # 起動時は全画面を取り込み。 C キー押下で画面内にある WiiU 画面を検出
     if input_type == 'ScreenCapture':
-        source = inputs.ScreenCapture()
+        source = inputs.ScreenCapture(
+            calibration_file=input_args.get('calibration_file'))
         return source
 
     # パターン4: Mac 上で AVFoundation を介してキャプチャデバイスを利用
@@ -76,15 +78,45 @@ def _init_source(opts):
                                    input_args.get('source')))
         source.set_frame_rate(input_args.get('frame_rate'))
         source.set_use_file_timestamp(input_args.get('use_file_timestamp'))
+        source.set_use_index(input_args.get('use_index', True),
+                             input_args.get('ffprobe_path', 'ffprobe'),
+                             input_args.get('index_allow_slow', False),
+                             input_args.get('index_cache', False))
+        return source
+
+    # パターン5b: ffmpeg コマンドでビデオファイルを読み込む
+    # ffmpeg 側でデコード、リサイズ、フレームレート変換を行うので高速
+    if input_type == 'FFmpegPipe':
+        source = inputs.FFmpegPipe(
+            ffmpeg_path=input_args.get('ffmpeg_path', 'ffmpeg'),
+            input_args=input_args.get('input_args'),
+            crop=input_args.get('crop'),
+        )
+        source.select_source(name=(opts.get('input_file') or
+                                   input_args.get('source')))
+        source.set_frame_rate(input_args.get('frame_rate'))
+        return source
+
+    # パターン5c: 画像ファイル（ディレクトリ、ワイルドカード）を動画として読み込む
+    # スクリーンショットの再処理用。デコードは複数スレッドで行う
+    if input_type == 'ImageDirectory':
+        source = inputs.ImageDirectory(
+            num_workers=input_args.get('num_workers'),
+            timestamp=input_args.get('timestamp', 'auto'),
+        )
+        source.select_source(name=(opts.get('input_file') or
+                                   input_args.get('source')))
         return source
 
     # パターン6: OpenCV の GStreamerパイプラインからの読み込み機能を利用する
     # ・OpenCV が GStreamer に対応していること
-    # ・パイプラインは '$YOUR_STREAM_SOURCE ! videoconvert ! appsink'
+    # ・ソースだけを指定すると、BGR 1280x720 への変換と低遅延な appsink
+    #   (drop=true max-buffers=1 sync=false) が自動的に追加される
+    # ・appsink で終わるパイプラインはそのまま使われる
     #
     # 例) Blackmagic Design社のキャプチャデバイスのHDMIポートから720p 59.94fpsで取得する場合
     # source = inputs.GStreamer()
-    # source.select_source(name='decklinksrc connection=hdmi mode=720p5994 device-number=0 ! videoconvert ! appsink')
+    # source.select_source(name='decklinksrc connection=hdmi mode=720p5994 device-number=0')
     #
     # 例) テストパターンを表示
     if input_type == 'GStreamer':
@@ -92,6 +124,15 @@ def _init_source(opts):
         source.select_source(name=input_args.get('source'))
         return source
 
+    # パターン7: 別プロセスが共有メモリに書き込んだフレームを読み込む
+    # ・Python 3.8 以降が必要
+    # ・1つのキャプチャから複数の IkaLog プロセスで別々の領域を解析できる
+    if input_type == 'FrameBus':
+        from ikalog.inputs.frame_bus import FrameBusInput
+        source = FrameBusInput(roi=input_args.get('roi'))
+        source.select_source(name=input_args.get('source'))
+        return source
+
     if input_type == 'PYNQ':
         from ikalog.inputs.pynq_capture import PynqCapture
         source = PynqCapture(
@@ -141,6 +182,11 @@ def _init_outputs(opts):
         args = _replace_vars(output_args['Console'], vars)
         OutputPlugins.append(outputs.Console(**args))
 
+    # ClipRecorder: キル・デス・試合終了の前後をクリップとして保存します。
+    if 'ClipRecorder' in output_plugins:
+        args = _replace_vars(output_args['ClipRecorder'], vars)
+        OutputPlugins.append(outputs.ClipRecorder(**args))
+
     # IkaOutput_CSV: CSVログファイルを出力します。
     if 'CSV' in output_plugins:
         args = _replace_vars(output_args['CSV'], vars)
@@ -167,6 +213,11 @@ def _init_outputs(opts):
         args = _replace_vars(output_args['Screenshot'], vars)
         OutputPlugins.append(outputs.Screenshot(**args))
 
+    # SQLite: 戦績とイベントを SQLite データベースに記録します。
+    if 'SQLite' in output_plugins:
+        args = _replace_vars(output_args['SQLite'], vars)
+        OutputPlugins.append(outputs.SQLite(**args))
+
     # Slack: Slack 連携
     if 'Slack' in output_plugins:
         args = _replace_vars(output_args['Slack'], vars)
@@ -264,6 +315,10 @@ def config(opts):
     if 'frame_rate' in source_args:
         source.set_frame_rate(source_args['frame_rate'])
 
+    # コマンドラインで指定されたフレームレートを優先
+    if opts.get('frame_rate'):
+        source.set_frame_rate(opts['frame_rate'])
+
     # 使いたいプラグインを適宜設定
     OutputPlugins = _init_outputs(opts)
 
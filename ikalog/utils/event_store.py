@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import json
+import sqlite3
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    start_at REAL,
+    end_at REAL,
+    lobby TEXT,
+    rule TEXT,
+    map TEXT,
+    result TEXT,
+    weapon TEXT,
+    kills INTEGER,
+    deaths INTEGER,
+    score INTEGER,
+    rank_in_team INTEGER,
+    udemae_pre TEXT,
+    udemae_exp_pre INTEGER,
+    udemae_after TEXT,
+    udemae_exp_after INTEGER,
+    cash_after INTEGER,
+    source_file TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_end_at ON sessions (end_at);
+CREATE INDEX IF NOT EXISTS sessions_map ON sessions (map, end_at);
+CREATE INDEX IF NOT EXISTS sessions_rule ON sessions (rule, end_at);
+CREATE INDEX IF NOT EXISTS sessions_weapon ON sessions (weapon, end_at);
+
+CREATE TABLE IF NOT EXISTS players (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    me INTEGER,
+    team INTEGER,
+    kills INTEGER,
+    deaths INTEGER,
+    score INTEGER,
+    weapon TEXT,
+    rank_in_team INTEGER
+);
+CREATE INDEX IF NOT EXISTS players_session ON players (session_id);
+CREATE INDEX IF NOT EXISTS players_weapon ON players (weapon);
+
+CREATE TABLE IF NOT EXISTS events (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    at_msec INTEGER,
+    type TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_session ON events (session_id, at_msec);
+CREATE INDEX IF NOT EXISTS events_type ON events (type, session_id);
+
+CREATE TABLE IF NOT EXISTS timelines (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    name TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS timelines_session ON timelines (session_id, name);
+'''
+
+_session_columns = (
+    'start_at', 'end_at', 'lobby', 'rule', 'map', 'result', 'weapon',
+    'kills', 'deaths', 'score', 'rank_in_team',
+    'udemae_pre', 'udemae_exp_pre', 'udemae_after', 'udemae_exp_after',
+    'cash_after', 'source_file',
+)
+
+_player_columns = (
+    'me', 'team', 'kills', 'deaths', 'score', 'weapon', 'rank_in_team',
+)
+
+
+class EventStore(object):
+    """
+    SQLite database of game sessions, with their players, events and
+    timelines.
+
+    The database is in WAL mode, so that it can be queried while IkaLog
+    is writing to it. A session is written in a transaction with all
+    its players and events.
+    """
+
+    def add_session(self, session, players=None, events=None,
+                    timelines=None):
+        """
+        Add a session. Returns the id of the session.
+
+        session:   dict of the columns of sessions.
+        players:   list of dicts of the columns of players.
+        events:    list of (at_msec, type, data), data is a JSON-able dict.
+        timelines: dict of name to list of [msec, value]
+                   (e.g. EventTimeline.to_dict()).
+        """
+        values = [session.get(c) for c in _session_columns]
+        with self._db:
+            cursor = self._db.execute(
+                'INSERT INTO sessions (%s) VALUES (%s)' % (
+                    ','.join(_session_columns),
+                    ','.join(['?'] * len(_session_columns))),
+                values)
+            session_id = cursor.lastrowid
+
+            self._db.executemany(
+                'INSERT INTO players (session_id, %s) VALUES (?, %s)' % (
+                    ','.join(_player_columns),
+                    ','.join(['?'] * len(_player_columns))),
+                [[session_id] + [p.get(c) for c in _player_columns]
+                 for p in (players or [])])
+
+            self._db.executemany(
+                'INSERT INTO events (session_id, at_msec, type, data) '
+                'VALUES (?, ?, ?, ?)',
+                [(session_id, at_msec, event_type,
+                  None if data is None else
+                  json.dumps(data, separators=(',', ':'), default=str))
+                 for at_msec, event_type, data in (events or [])])
+
+            self._db.executemany(
+                'INSERT INTO timelines (session_id, name, data) '
+                'VALUES (?, ?, ?)',
+                [(session_id, name,
+                  json.dumps(series, separators=(',', ':'), default=str))
+                 for name, series in sorted((timelines or {}).items())])
+
+        return session_id
+
+    def query_sessions(self, map=None, rule=None, weapon=None, lobby=None,
+                       result=None, since=None, until=None, limit=None):
+        """
+        Returns the sessions matching the conditions, as a list of dicts,
+        in the order of end_at. since and until are in epoch seconds.
+        """
+        conditions = []
+        params = []
+        for column, value in [('map', map), ('rule', rule),
+                              ('weapon', weapon), ('lobby', lobby),
+                              ('result', result)]:
+            if value is not None:
+                conditions.append('%s = ?' % column)
+                params.append(value)
+
+        if since is not None:
+            conditions.append('end_at >= ?')
+            params.append(since)
+
+        if until is not None:
+            conditions.append('end_at < ?')
+            params.append(until)
+
+        sql = 'SELECT * FROM sessions'
+        if conditions:
+            sql = sql + ' WHERE ' + ' AND '.join(conditions)
+        sql = sql + ' ORDER BY end_at'
+        if limit is not None:
+            # The latest sessions.
+            sql = 'SELECT * FROM (%s DESC LIMIT %d) ORDER BY end_at' % (
+                sql, int(limit))
+
+        return [dict(row) for row in self._db.execute(sql, params)]
+
+    def get_players(self, session_id):
+        cursor = self._db.execute(
+            'SELECT * FROM players WHERE session_id = ? ORDER BY rowid',
+            (session_id,))
+        return [dict(row) for row in cursor]
+
+    def get_events(self, session_id, event_type=None):
+        """
+        Returns the events of the session as a list of
+        (at_msec, type, data).
+        """
+        sql = 'SELECT at_msec, type, data FROM events WHERE session_id = ?'
+        params = [session_id]
+        if event_type is not None:
+            sql = sql + ' AND type = ?'
+            params.append(event_type)
+        sql = sql + ' ORDER BY at_msec, rowid'
+
+        return [(row[0], row[1], None if row[2] is None else json.loads(row[2]))
+                for row in self._db.execute(sql, params)]
+
+    def get_timelines(self, session_id):
+        """
+        Returns the timelines of the session as a dict of name to
+        list of [msec, value].
+        """
+        cursor = self._db.execute(
+            'SELECT name, data FROM timelines WHERE session_id = ?',
+            (session_id,))
+        return dict((row[0], json.loads(row[1])) for row in cursor)
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._db = sqlite3.connect(filename)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(_schema)
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+import numpy as np
+
+_numeric_kinds = 'biuf'
+
+
+def _freeze(value):
+    """Returns the value with lists (and arrays) turned into tuples."""
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class EventSeries(object):
+    """
+    Timeline of a value, in columns.
+
+    Times (msec) and values are kept in growable numpy arrays. Numeric
+    values (scalars or fixed-size lists, e.g. splatzone counters) are
+    stored in a typed array; other values (e.g. ragged inkling states)
+    fall back to an object array, as immutable tuples.
+
+    Unchanged values are run-length compressed: an event with the same
+    value as the last one is not stored, so the series holds the times
+    the value has changed. An event at the time of the last event
+    replaces its value. Readers must place the events by their times
+    (e.g. tools/graph.html).
+
+    snapshot() returns a read-only view of the series without copying
+    the arrays. The series never modifies the elements a snapshot can
+    see; it copies the arrays instead.
+
+    For compatibility, the series behaves as a list of [msec, value].
+    """
+
+    initial_capacity = 16
+
+    def __len__(self):
+        return self._size
+
+    def _to_python(self, value):
+        if self._values.dtype == object:
+            # Immutable; safe to share with the snapshots.
+            return value
+        return value.tolist()
+
+    def _event(self, i):
+        return [int(self._times[i]), self._to_python(self._values[i])]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._event(j) for j in range(*i.indices(self._size))]
+
+        if i < 0:
+            i = i + self._size
+        if not (0 <= i < self._size):
+            raise IndexError('EventSeries index out of range')
+        return self._event(i)
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self._event(i)
+
+    def __eq__(self, other):
+        if isinstance(other, (EventSeries, list, tuple)):
+            if len(other) != self._size:
+                return False
+            return all(
+                (e1[0] == e2[0]) and (_freeze(e1[1]) == _freeze(e2[1]))
+                for e1, e2 in zip(self, other))
+        return NotImplemented
+
+    def __ne__(self, other):
+        r = self.__eq__(other)
+        return r if r is NotImplemented else not r
+
+    def __repr__(self):
+        return 'EventSeries(%r)' % self.tolist()
+
+    def __deepcopy__(self, memo):
+        s = memo.get(id(self))
+        if s is None:
+            s = self.snapshot()
+            memo[id(self)] = s
+        return s
+
+    def tolist(self):
+        return [self._event(i) for i in range(self._size)]
+
+    def get_times(self):
+        """Returns the times in msec as a read-only array."""
+        times = self._times[:self._size]
+        times.flags.writeable = False
+        return times
+
+    def get_values(self):
+        """Returns the values as a read-only array."""
+        values = self._values[:self._size]
+        values.flags.writeable = False
+        return values
+
+    def value_at(self, msec, default=None):
+        """Returns the value at msec, i.e. of the last event at or before."""
+        i = int(np.searchsorted(self._times[:self._size], msec,
+                                side='right')) - 1
+        if i < 0:
+            return default
+        return self._to_python(self._values[i])
+
+    def _get_value_dtype(self, value):
+        """
+        Returns (array, dtype) to store the value, or (value, object)
+        if the value is not a fixed-size numeric value.
+        """
+        if value is None or isinstance(value, (str, bytes, dict)):
+            return value, object
+
+        try:
+            a = np.asarray(value)
+        except ValueError:
+            # Ragged lists.
+            return value, object
+
+        if a.dtype.kind not in _numeric_kinds:
+            return value, object
+
+        return a, a.dtype
+
+    def _allocate(self, capacity, value_shape, dtype):
+        times = np.zeros(capacity, np.int64)
+        if dtype == object:
+            values = np.empty(capacity, object)
+        else:
+            values = np.zeros((capacity,) + value_shape, dtype)
+
+        n = self._size
+        times[:n] = self._times[:n]
+        if n:
+            if dtype == object and self._values.dtype != object:
+                for i in range(n):
+                    values[i] = _freeze(self._values[i])
+            else:
+                values[:n] = self._values[:n]
+
+        self._times = times
+        self._values = values
+        self._shared = 0
+
+    def _prepare(self, value):
+        """
+        Make room for the value. Returns the value to be stored.
+        """
+        a, dtype = self._get_value_dtype(value)
+        values = self._values
+
+        if values is None:
+            shape = () if dtype == object else a.shape
+            self._allocate(self.initial_capacity, shape, dtype)
+        else:
+            if values.dtype == object or dtype == object or \
+                    a.shape != values.shape[1:]:
+                # The series can't be typed (anymore).
+                dtype = object
+            else:
+                dtype = np.result_type(values.dtype, a.dtype)
+
+            capacity = len(self._times)
+            if dtype != values.dtype or self._size >= capacity:
+                self._allocate(max(capacity * 2, self.initial_capacity),
+                               values.shape[1:], dtype)
+
+        if dtype == object:
+            # Don't let anyone modify the stored value.
+            return _freeze(value)
+        return a
+
+    def _detach(self):
+        """Copy the arrays, if a snapshot sees the last event."""
+        if self._shared >= self._size:
+            self._allocate(len(self._times), self._values.shape[1:],
+                           self._values.dtype)
+
+    def _equals_value(self, i, value):
+        stored = self._values[i]
+        if self._values.dtype == object:
+            return stored == _freeze(value)
+
+        a, dtype = self._get_value_dtype(value)
+        if dtype == object:
+            return False
+        return np.array_equal(stored, a)
+
+    def add(self, msec, value):
+        """
+        Add an event. Returns True if the series has changed.
+        """
+        msec = int(msec)
+        n = self._size
+
+        if n and (self._times[n - 1] == msec):
+            # Replace the value of the last event.
+            if (n >= 2) and self._equals_value(n - 2, value):
+                # Back to the value before; the last event is redundant.
+                self._detach()
+                self._size = n - 1
+                return True
+
+            if self._equals_value(n - 1, value):
+                return False
+
+            self._detach()
+            n = n - 1
+            self._size = n
+
+        elif n and self._equals_value(n - 1, value):
+            # Run-length compression of unchanged values.
+            return False
+
+        a = self._prepare(value)
+        self._times[n] = msec
+        self._values[n] = a
+        self._size = n + 1
+        return True
+
+    def append(self, event):
+        """Add an event given as [msec, value] (list compatibility)."""
+        self.add(event[0], event[1])
+
+    def snapshot(self):
+        """
+        Returns a read-only view of the current events without copying.
+        """
+        s = EventSeries()
+        if self._size:
+            s._times = self._times[:self._size]
+            s._values = self._values[:self._size]
+            s._times.flags.writeable = False
+            s._values.flags.writeable = False
+            s._size = self._size
+            s._shared = self._size
+            self._shared = max(self._shared, self._size)
+        return s
+
+    def __init__(self, events=None):
+        self._times = np.zeros(0, np.int64)
+        self._values = None
+        self._size = 0
+        # Number of the events visible to snapshots.
+        self._shared = 0
+
+        for event in (events or []):
+            self.append(event)
+
+
+class EventTimeline(dict):
+    """
+    Dict mapping from event names (e.g. objective) to EventSeries.
+
+    It is context['game']['events']. Deep copies (e.g. by
+    IkaUtils.copy_context) are snapshots, which share the arrays.
+    """
+
+    def add(self, key, msec, value):
+        series = self.get(key)
+        if series is None:
+            series = EventSeries()
+            self[key] = series
+        return series.add(msec, value)
+
+    def snapshot(self):
+        return EventTimeline(
+            (key, series.snapshot()) for key, series in self.items())
+
+    def __deepcopy__(self, memo):
+        s = memo.get(id(self))
+        if s is None:
+            s = EventTimeline()
+            memo[id(self)] = s
+            for key, series in self.items():
+                s[key] = series.__deepcopy__(memo)
+        return s
+
+    def to_dict(self):
+        """Returns the events as a dict of lists of [msec, value]."""
+        return dict((key, series.tolist()) for key, series in self.items())
+
+    def __init__(self, events=None):
+        super(EventTimeline, self).__init__()
+        for key, series in dict(events or {}).items():
+            if not isinstance(series, EventSeries):
+                series = EventSeries(series)
+            self[key] = series
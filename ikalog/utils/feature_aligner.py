@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import threading
+
+import cv2
+import numpy as np
+
+# FLANN parameters for binary (AKAZE/ORB) descriptors.
+_FLANN_INDEX_LSH = 6
+_FLANN_LSH_PARAMS = dict(
+    algorithm=_FLANN_INDEX_LSH,
+    table_number=6,
+    key_size=12,
+    multi_probe_level=1,
+)
+
+
+class FeatureAligner(object):
+    """
+    Feature based image alignment against a reference image.
+
+    The detector and the matcher are built only once, and the reference
+    descriptors are registered to the matcher in advance, so that each
+    call only has to detect and match the features of the input image.
+
+    roi:       (x1, y1, x2, y2) of the informative region in the input
+               image. Features are detected only in the region.
+    use_flann: Use FLANN LSH index instead of brute-force matcher.
+
+    The homography maps the reference coordinates to the input ones.
+    """
+
+    def filter_matches(self, kp_query, matches, ratio=None):
+        """
+        Returns (reference points, input points) of the good matches.
+        """
+        ratio = ratio or self._ratio
+        p_ref, p_query = [], []
+        for m in matches:
+            if len(m) == 2 and m[0].distance < m[1].distance * ratio:
+                m = m[0]
+                p_ref.append(self.ref_keypoints[m.trainIdx].pt)
+                p_query.append(kp_query[m.queryIdx].pt)
+        return np.float32(p_ref), np.float32(p_query)
+
+    def detect(self, img, normalizer=None):
+        """
+        Detect keypoints and descriptors in the ROI of the image.
+
+        normalizer: Function to convert the cropped ROI to the feature
+                    image (same format as the reference).
+        Keypoint coordinates are relative to the whole image.
+        """
+        x1, y1 = 0, 0
+        if self._roi is not None:
+            x1, y1, x2, y2 = self._roi
+            img = img[y1:y2, x1:x2]
+
+        if normalizer is not None:
+            img = normalizer(img)
+
+        with self._lock:
+            keypoints, descriptors = self.detector.detectAndCompute(img, None)
+
+        if (x1, y1) != (0, 0):
+            for kp in keypoints:
+                kp.pt = (kp.pt[0] + x1, kp.pt[1] + y1)
+
+        return keypoints, descriptors
+
+    def find_homography(self, img, normalizer=None):
+        """
+        Find homography from the reference image to the image.
+
+        img:        Input image.
+        normalizer: See detect().
+        Returns (H, status), or (None, None) if not enough matches.
+        """
+        keypoints, descriptors = self.detect(img, normalizer)
+
+        if descriptors is None or len(keypoints) < 2:
+            return None, None
+
+        with self._lock:
+            raw_matches = self.matcher.knnMatch(descriptors, k=2)
+
+        p_ref, p_query = self.filter_matches(keypoints, raw_matches)
+
+        if len(p_ref) < 4:
+            return None, None
+
+        H, status = cv2.findHomography(p_ref, p_query, cv2.RANSAC, 5.0)
+        return H, status
+
+    def corners(self, H):
+        """
+        Returns the reference image corners projected by H.
+        """
+        h, w = self.ref_image_geometry[:2]
+        corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+        return np.float32(cv2.perspectiveTransform(
+            corners.reshape(1, -1, 2), H).reshape(-1, 2))
+
+    def warp_matrix(self, H, size):
+        """
+        Returns perspective matrix which warps the input image to
+        the reference geometry of size (w, h).
+        """
+        w, h = size
+        pts2 = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+        return cv2.getPerspectiveTransform(self.corners(H), pts2)
+
+    def align(self, img, normalizer=None, validate_func=None,
+              size=(1280, 720)):
+        """
+        Warp the image to the reference geometry.
+
+        img:           Image to be warped.
+        normalizer:    See detect().
+        validate_func: Function that receives the warped image and
+                       returns True if it is acceptable.
+
+        The last homography that passed validation is cached, and tried
+        first on the next call; features are detected only if it does
+        not validate anymore.
+
+        Returns the warped image, or None.
+        """
+        if self._last_M is not None:
+            new_img = cv2.warpPerspective(img, self._last_M, size)
+            if (validate_func is None) or validate_func(new_img):
+                return new_img
+
+        H, status = self.find_homography(img, normalizer)
+        if H is None:
+            return None
+
+        M = self.warp_matrix(H, size)
+        new_img = cv2.warpPerspective(img, M, size)
+
+        if (validate_func is not None) and (not validate_func(new_img)):
+            return None
+
+        self._last_M = M
+        return new_img
+
+    def get_displacement(self):
+        """
+        Returns how far (in pixels) the last good warp moves the image
+        corners, or None if there is no cached warp.
+        """
+        if self._last_M is None:
+            return None
+
+        h, w = self.ref_image_geometry[:2]
+        corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+        warped = cv2.perspectiveTransform(
+            corners.reshape(1, -1, 2), self._last_M).reshape(-1, 2)
+        return float(np.max(np.abs(warped - corners)))
+
+    def reset(self):
+        self._last_M = None
+
+    def __init__(self, ref_keypoints, ref_descriptors, ref_image_geometry,
+                 roi=None, use_flann=False, ratio=0.75):
+        self.ref_keypoints = ref_keypoints
+        self.ref_descriptors = ref_descriptors
+        self.ref_image_geometry = ref_image_geometry
+
+        self.detector = cv2.AKAZE_create()
+        if use_flann:
+            self.matcher = cv2.FlannBasedMatcher(_FLANN_LSH_PARAMS, {})
+        else:
+            self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+
+        self.matcher.add([ref_descriptors])
+        self.matcher.train()
+
+        self._roi = roi
+        self._ratio = ratio
+        # OpenCV detectors and matchers are not thread-safe.
+        self._lock = threading.Lock()
+
+        self.reset()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import collections
+import os
+import socket
+import threading
+import time
+import uuid
+
+import umsgpack
+
+from ikalog.utils import *
+
+
+class FluentdForwarder(object):
+    """
+    Buffered forwarder for Fluentd (Forward protocol, PackedForward mode).
+
+    emit() only packs the record into the buffer of the tag. The worker
+    thread seals the buffers into chunks when flush_size bytes have been
+    buffered, or flush_interval seconds have passed, and sends each
+    chunk in a message, waiting for its ack from Fluentd.
+
+    When Fluentd could not be reached, the chunks are written to
+    buffer_dir (if specified) and retried with exponential backoff. The
+    chunks left in buffer_dir are sent when the forwarder starts again.
+    The oldest chunks are dropped when more than max_chunks are pending.
+    """
+
+    suffix = '.chunk'
+
+    def emit(self, tag, record, timestamp=None):
+        """
+        Buffer the record. Never blocks on the network.
+        """
+        if timestamp is None:
+            timestamp = int(time.time())
+
+        entry = umsgpack.packb([timestamp, record])
+        with self._cond:
+            buf = self._buffers.get(tag)
+            if buf is None:
+                buf = self._buffers[tag] = []
+                self._buffer_since[tag] = time.time()
+            buf.append(entry)
+            self._buffered_bytes = self._buffered_bytes + len(entry)
+            self.metrics['emitted'] += 1
+
+            if self._buffered_bytes >= self.flush_size:
+                self._cond.notify()
+
+        self.start()
+
+    def get_metrics(self):
+        with self._cond:
+            metrics = dict(self.metrics)
+            metrics['buffered_records'] = \
+                sum(map(len, self._buffers.values()))
+            metrics['pending_chunks'] = len(self._chunks)
+        return metrics
+
+    # Chunks
+
+    def _seal(self, force=False):
+        """
+        Seal the buffers into chunks. Called with the lock held.
+        """
+        now = time.time()
+        full = self._buffered_bytes >= self.flush_size
+        for tag in list(self._buffers.keys()):
+            expired = (now - self._buffer_since[tag]) >= self.flush_interval
+            if not (force or full or expired):
+                continue
+
+            entries = self._buffers.pop(tag)
+            del self._buffer_since[tag]
+            chunk = {
+                'id': uuid.uuid4().hex,
+                'tag': tag,
+                'entries': b''.join(entries),
+                'size': len(entries),
+                'file': None,
+            }
+            self._buffered_bytes = self._buffered_bytes - \
+                len(chunk['entries'])
+            self._chunks.append(chunk)
+
+        while len(self._chunks) > self.max_chunks:
+            chunk = self._chunks.popleft()
+            self._remove_chunk_file(chunk)
+            self.metrics['dropped'] += chunk['size']
+
+    def _next_flush_time(self):
+        if len(self._buffer_since) == 0:
+            return None
+        return min(self._buffer_since.values()) + self.flush_interval
+
+    def _write_chunk_file(self, chunk):
+        if (self.buffer_dir is None) or (chunk['file'] is not None):
+            return
+
+        try:
+            if not os.path.exists(self.buffer_dir):
+                os.makedirs(self.buffer_dir)
+
+            filename = os.path.join(
+                self.buffer_dir, '%s_%s%s' % (
+                    time.strftime('%Y%m%d_%H%M%S'), chunk['id'], self.suffix))
+            f = open(filename + '.tmp', 'wb')
+            umsgpack.pack(
+                [chunk['tag'], chunk['entries'], chunk['size'], chunk['id']], f)
+            f.close()
+            os.replace(filename + '.tmp', filename)
+            chunk['file'] = filename
+        except (IOError, OSError):
+            IkaUtils.dprint('%s: Failed to write the chunk to %s' %
+                            (self, self.buffer_dir))
+
+    def _remove_chunk_file(self, chunk):
+        if chunk['file'] is None:
+            return
+
+        try:
+            os.remove(chunk['file'])
+        except OSError:
+            pass
+        chunk['file'] = None
+
+    def _load_chunk_files(self):
+        if (self.buffer_dir is None) or not os.path.exists(self.buffer_dir):
+            return []
+
+        chunks = []
+        for f in sorted(os.listdir(self.buffer_dir)):
+            filename = os.path.join(self.buffer_dir, f)
+            if f.endswith(self.suffix + '.tmp'):
+                # Incomplete write.
+                os.remove(filename)
+                continue
+            if not f.endswith(self.suffix):
+                continue
+
+            try:
+                with open(filename, 'rb') as fp:
+                    tag, entries, size, chunk_id = umsgpack.unpack(fp)
+            except Exception:
+                IkaUtils.dprint('%s: Broken chunk %s' % (self, filename))
+                continue
+
+            chunks.append({'id': chunk_id, 'tag': tag, 'entries': entries,
+                           'size': size, 'file': filename})
+        return chunks
+
+    # Connection
+
+    def _connect(self):
+        if self._socket is not None:
+            return
+
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=self.timeout)
+        self._socket = sock
+        self._socket_file = sock.makefile('rb')
+
+    def _disconnect(self):
+        if self._socket is None:
+            return
+
+        try:
+            self._socket_file.close()
+            self._socket.close()
+        except OSError:
+            pass
+        self._socket = None
+        self._socket_file = None
+
+    def _send_chunk(self, chunk):
+        """
+        Send the chunk. Raises an exception on failure.
+        """
+        option = {'size': chunk['size']}
+        if self.require_ack:
+            option['chunk'] = chunk['id']
+
+        message = umsgpack.packb([chunk['tag'], chunk['entries'], option])
+
+        self._connect()
+        try:
+            self._socket.sendall(message)
+            if self.require_ack:
+                response = umsgpack.unpack(self._socket_file)
+                if (not isinstance(response, dict)) or \
+                        (response.get('ack') != chunk['id']):
+                    raise IOError('Unexpected ack %s' % response)
+        except:
+            self._disconnect()
+            raise
+
+    # Worker
+
+    def _wait_for_work(self):
+        """
+        Wait until a chunk is ready to send. Called with the lock held.
+        """
+        while True:
+            self._seal(force=self._closing)
+
+            if len(self._chunks) > 0:
+                now = time.time()
+                if self._retry_at <= now:
+                    return True
+                if self._closing:
+                    return False
+                timeout = self._retry_at - now
+            else:
+                if self._closing:
+                    return False
+                next_flush = self._next_flush_time()
+                timeout = None if next_flush is None else \
+                    max(next_flush - time.time(), 0)
+
+            self._cond.wait(timeout)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                if not self._wait_for_work():
+                    break
+                chunk = self._chunks[0]
+
+            try:
+                self._send_chunk(chunk)
+            except Exception as e:
+                IkaUtils.dprint('%s: Failed to send a chunk: %s' % (self, e))
+                self._write_chunk_file(chunk)
+                with self._cond:
+                    self._retries = self._retries + 1
+                    self._retry_at = time.time() + min(
+                        self.retry_interval * (2 ** (self._retries - 1)),
+                        self.max_retry_interval)
+                    self.metrics['retries'] += 1
+                continue
+
+            self._remove_chunk_file(chunk)
+            with self._cond:
+                if len(self._chunks) and (self._chunks[0] is chunk):
+                    self._chunks.popleft()
+                self._retries = 0
+                self._retry_at = 0
+                self.metrics['sent_chunks'] += 1
+                self.metrics['sent_records'] += chunk['size']
+                self._cond.notify_all()
+
+        # Keep the chunks not sent for the next time.
+        with self._cond:
+            for chunk in self._chunks:
+                self._write_chunk_file(chunk)
+            self._disconnect()
+
+    def start(self):
+        """
+        Start the worker, and resume the chunks left in buffer_dir.
+        """
+        with self._cond:
+            if self._thread is not None:
+                return
+
+            self._closing = False
+            self._chunks.extendleft(reversed(self._load_chunk_files()))
+            self._thread = threading.Thread(target=self._worker)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def flush(self, timeout=None):
+        """
+        Send the buffered records now, and wait until sent.
+        Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            self._seal(force=True)
+            self._cond.notify_all()
+            while len(self._chunks) > 0:
+                remaining = None if deadline is None else \
+                    deadline - time.time()
+                if (remaining is not None) and (remaining <= 0):
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Try to send the buffered records, and stop the worker. Records
+        not sent are kept in buffer_dir.
+        """
+        with self._cond:
+            if self._thread is None:
+                return
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+
+        thread.join(timeout)
+        with self._cond:
+            self._thread = None
+
+    def __init__(self, host='127.0.0.1', port=24224, buffer_dir=None,
+                 flush_size=64 * 1024, flush_interval=1.0,
+                 retry_interval=1.0, max_retry_interval=60.0,
+                 max_chunks=1024, require_ack=True, timeout=10.0):
+        self.host = host
+        self.port = int(port)
+        self.buffer_dir = buffer_dir
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.max_chunks = max_chunks
+        self.require_ack = require_ack
+        self.timeout = timeout
+
+        self.metrics = {
+            'emitted': 0,
+            'sent_records': 0,
+            'sent_chunks': 0,
+            'retries': 0,
+            'dropped': 0,
+        }
+
+        self._cond = threading.Condition()
+        self._buffers = {}
+        self._buffer_since = {}
+        self._buffered_bytes = 0
+        self._chunks = collections.deque()
+        self._retries = 0
+        self._retry_at = 0
+        self._closing = False
+        self._thread = None
+        self._socket = None
+        self._socket_file = None
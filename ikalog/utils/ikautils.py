@@ -33,6 +33,7 @@ from ikalog.constants import stages, rules, gear_abilities, lobby_types
 # Constants for death_reason2text
 from ikalog.constants import hurtable_objects, oob_reasons, special_weapons, sub_weapons, weapons
 from ikalog.utils.localization import Localization
+from ikalog.utils.event_timeline import EventTimeline
 from ikalog.utils import imread
 
 class IkaUtils(object):
@@ -246,16 +247,19 @@ class IkaUtils(object):
 
     @staticmethod
     def add_event(context, key, value):
-        events = context['game'].setdefault('events', {}).setdefault(key, [])
-        game_time = IkaUtils.get_game_offset_msec(context)
+        events = context['game'].get('events')
+        if not isinstance(events, EventTimeline):
+            events = EventTimeline(events)
+            context['game']['events'] = events
 
-        # events is a list of lists of [time, value].
-        if events and events[-1][0] == game_time:
-            event = events[-1]
-            event[1] = value
-        else:
-            event = [game_time, value]
-            events.append(event)
+        # events maps keys to EventSeries, which work as lists of lists
+        # of [time, value].
+        game_time = IkaUtils.get_game_offset_msec(context)
+        if game_time is None:
+            # The game start was not seen (e.g. the recording begins in
+            # the middle of the battle); the event can't be placed.
+            return
+        events.add(key, game_time, value)
 
     @staticmethod
     def get_file_name(filename, context):
@@ -283,4 +287,6 @@ class IkaUtils(object):
         # these values are replaced with None before deepcopy.
         context2['engine']['engine'] = None  # IkaEngine
         context2['engine']['service'] = {}  # functions of IkaEngine
+        # context['game']['events'] is copied as a snapshot sharing the
+        # arrays (EventTimeline.__deepcopy__).
         return copy.deepcopy(context2)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import os
+import queue
+import threading
+import traceback
+
+import cv2
+import numpy as np
+
+from ikalog.utils.ikautils import IkaUtils
+
+_encode_formats = {
+    'png': '.png',
+    'jpg': '.jpg',
+    'jpeg': '.jpg',
+    'webp': '.webp',
+    'bmp': '.bmp',
+}
+
+
+class ImageWriter(object):
+    """
+    Writes images and files in background threads.
+
+    IkaEngine registers an instance as the 'image_writer' service, so
+    that plugins can save screenshots without stalling the engine:
+
+        writer = get_image_writer(context)
+        writer.write_image('screenshot.png', context['engine']['frame'])
+
+    format:    Encode images in this format ('png', 'jpg', ...) and
+               change the file extension accordingly. If None, the
+               format is chosen by the extension of the file name.
+    policy:    What to do when max_queue requests are pending.
+               'block' waits for the queue (backpressure), and 'drop'
+               drops the new request.
+    num_workers: If 0, requests are written synchronously.
+    """
+
+    def _get_encode_params(self, ext):
+        if ext == '.jpg':
+            return [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        if ext == '.png' and (self.png_compression is not None):
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        if ext == '.webp':
+            return [cv2.IMWRITE_WEBP_QUALITY, self.jpeg_quality]
+        return []
+
+    def get_filename(self, filename):
+        """
+        Returns the file name the image is written to.
+        """
+        if self.format is None:
+            return filename
+        return os.path.splitext(filename)[0] + _encode_formats[self.format]
+
+    def _encode(self, filename, img):
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == '.jpeg':
+            ext = '.jpg'
+        result, data = cv2.imencode(ext, img, self._get_encode_params(ext))
+        if not result:
+            raise Exception('Failed to encode the image as %s' % ext)
+        return data.tobytes()
+
+    def _write(self, filename, img=None, data=None, callback=None):
+        success = False
+        try:
+            if img is not None:
+                data = self._encode(filename, img)
+
+            # Not cv2.imwrite(), which doesn't support non-ASCII paths
+            # on some platforms.
+            f = open(filename, 'wb')
+            f.write(data)
+            f.close()
+            success = True
+        except:
+            IkaUtils.dprint('%s: Failed to write %s' % (self, filename))
+            IkaUtils.dprint(traceback.format_exc())
+
+        with self._lock:
+            self.stats['written' if success else 'errors'] += 1
+
+        if callback:
+            callback(filename, success)
+        return success
+
+    def _put(self, request):
+        if self.num_workers == 0:
+            self._write(**request)
+            return True
+
+        self._start()
+        try:
+            self._queue.put(request, block=(self.policy == 'block'))
+        except queue.Full:
+            with self._lock:
+                self.stats['dropped'] += 1
+            IkaUtils.dprint('%s: Queue is full, dropped %s' %
+                            (self, request['filename']))
+            return False
+        return True
+
+    def write_image(self, filename, img, copy=True, callback=None):
+        """
+        Encode and write the image.
+        Returns False if the request is dropped.
+
+        copy:     If False, the caller must not modify the image after
+                  the call.
+        callback: callback(filename, success) is called when written.
+        """
+        if copy:
+            img = np.copy(img)
+        return self._put({
+            'filename': self.get_filename(filename),
+            'img': img,
+            'callback': callback,
+        })
+
+    def write_file(self, filename, data, callback=None):
+        """
+        Write the bytes to the file.
+        Returns False if the request is dropped.
+        """
+        return self._put({
+            'filename': filename,
+            'data': data,
+            'callback': callback,
+        })
+
+    def _worker(self):
+        while True:
+            request = self._queue.get()
+            try:
+                if request is None:
+                    return
+                self._write(**request)
+            finally:
+                self._queue.task_done()
+
+    def _start(self):
+        with self._lock:
+            if len(self._threads) > 0:
+                return
+
+            for i in range(self.num_workers):
+                thread = threading.Thread(target=self._worker)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def flush(self):
+        """
+        Wait until all the requests are written.
+        """
+        if len(self._threads) > 0:
+            self._queue.join()
+
+    def close(self):
+        """
+        Write out the requests, and stop the workers.
+        """
+        with self._lock:
+            threads = self._threads
+            self._threads = []
+
+        for thread in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
+
+    def __init__(self, num_workers=2, max_queue=32, policy='block',
+                 format=None, jpeg_quality=95, png_compression=None):
+        assert policy in ('block', 'drop')
+        assert (format is None) or (format in _encode_formats)
+
+        self.num_workers = num_workers
+        self.policy = policy
+        self.format = format
+        self.jpeg_quality = jpeg_quality
+        self.png_compression = png_compression
+        self.stats = {'written': 0, 'errors': 0, 'dropped': 0}
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._threads = []
+
+
+# Synchronous writer, used when the engine is not available.
+_sync_writer = ImageWriter(num_workers=0)
+
+
+def get_image_writer(context):
+    """
+    Returns the image writer service of the engine.
+    """
+    engine = context.get('engine', {}).get('engine')
+    writer = None
+    if engine is not None:
+        writer = engine.get_service('image_writer')
+    return writer or _sync_writer
@@ -23,8 +23,8 @@ import numpy as np
 
 from ikalog.utils import matcher
 
-_TRUTH_2_SVM = {True: 1, False: -1}
-_SVM_2_ZEROONE = {-1: 0, 1: 1}
+# Number of bits set, per byte value.
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint16)
 
 
 def normalize_player_name(img_name, debug=False):
@@ -72,97 +72,88 @@ def normalize_player_name(img_name, debug=False):
     return img_name_w_norm
 
 
-def train_svm_classifiers(img_name_list, debug=False):
+def pack_player_names(img_name_list):
     """
-    Train player name classifier for specified img_name list.
+    Pack normalized player name images into bit arrays.
 
-    The images will be training with OpenCV Support Vector Machine functions.
-    Returns list of SVM objects.
-
-    The array would have "None" for the entry that SVM was not properly
-    trained.
+    Each image (from normalize_player_name()) is binarized and packed to
+    one row of bits. Invalid entries (None) are packed as blank images.
+    Returns an array of (len(img_name_list), 15 * 250 / 8) uint8.
     """
-    assert isinstance(img_name_list, list)
-
-    img_name_list = np.array(img_name_list, dtype=np.float32)
-
-    X = np.array(
-        list(map(lambda img: np.array(img).reshape((-1)), img_name_list)))
+    rows = []
+    for img_name in img_name_list:
+        if img_name is None:
+            img_name = np.zeros((15, 250), dtype=np.uint8)
+        rows.append(np.packbits(np.asarray(img_name).reshape((-1)) > 127))
 
-    # Train SVM per counter player.
-    H = []
-    for img in img_name_list:
-        # y = Response for SVM Training. e.g. [1, -1, -1, -1]
-        y = list(map(lambda e: _TRUTH_2_SVM[
-                 np.array_equal(e, img)], img_name_list))
-        y = np.array(y, dtype=np.int)
+    return np.array(rows, dtype=np.uint8).reshape((len(rows), -1))
 
-        h = cv2.ml.SVM_create()
-        h.setGamma(1)
-        h.setC(1)
-        h.setKernel(cv2.ml.SVM_LINEAR)
-        h.setType(cv2.ml.SVM_C_SVC)
 
-        h.train(X, cv2.ml.ROW_SAMPLE, y)
-
-        # Test the model.
-        r, predicted = h.predict(X)
-        predicted_01 = None
-        if r == 0:
-            predicted_01 = map(lambda e: _SVM_2_ZEROONE[int(e)], predicted)
-            predicted_01 = list(predicted_01)
-            ok = (np.sum(predicted_01) == 1) and \
-                (np.argmax(y) == np.argmax(predicted_01))
+class PlayerNameClassifier(object):
+    """
+    Nearest-template classifier for normalized player name images.
 
-            if not ok:
-                h = None
+    The templates (e.g. names on the result screen) are packed as bits
+    once, and queries (e.g. names in the kill log) are compared with all
+    the templates at once by normalized Hamming distance:
 
-        else:
-            # SVM Classification failed.
-            h = None
+        distance = popcount(a XOR b) / popcount(a OR b)
 
-        H.append(h)
+    The best match is accepted only if it is close enough, and clearly
+    closer than the second best one.
+    """
 
-    print(H)
-    import time
-    time.sleep(3)
-    return H
+    def _distances(self, queries):
+        """
+        Returns matrix of normalized distances (queries x templates).
+        """
+        q = queries[:, np.newaxis, :]
+        t = self._templates[np.newaxis, :, :]
 
+        diff = _POPCOUNT[np.bitwise_xor(q, t)].sum(axis=2)
+        union = _POPCOUNT[np.bitwise_or(q, t)].sum(axis=2)
 
-def predict(self, H_list, img_name):
-    """
-    Predict the specified image.
+        return diff / np.maximum(union, 1)
 
-    Returns index number, or None if it is not certain.
-    """
+    def match_list(self, img_name_list):
+        """
+        Match the specified images with the templates.
 
-    features = np.array(img_name, dtype=np.float32).reshape((1, -1))
+        Returns list of (index, confidence). index is None if the match
+        is not certain. confidence is 1.0 for the exact match, and 0.0
+        for completely different images.
+        """
+        if len(img_name_list) == 0 or len(self._templates) == 0:
+            return [(None, 0.0)] * len(img_name_list)
 
-    matched = 0
-    index = None
+        distances = self._distances(pack_player_names(img_name_list))
+        distances[:, np.logical_not(self._valid)] = 1.0
 
-    for h in H_list:
-        # Skip invalid hypothesises.
-        if h is None:
-            continue
+        results = []
+        for row in distances:
+            order = np.argsort(row)
+            best = order[0]
+            confidence = 1.0 - float(row[best])
+            second = float(row[order[1]]) if len(order) > 1 else 1.0
 
-        r, predicted = h.predict(features)
-        if predicted[0] > 0:
-            matched = matched + 1
-            index = H_list.index(h)
+            ok = (row[best] <= self._max_distance) and \
+                (row[best] < second * self._max_ratio)
 
-    # If there are more than two or no matches, return None.
-    if matched != 1:
-        return None
+            if self._debug:
+                print('%s: best %d (%3.3f) second %3.3f ok %s' %
+                      (self, best, row[best], second, ok))
 
-    # If there is the exact match, return the index.
-    return index
+            results.append((int(best) if ok else None, confidence))
 
+        return results
 
-class PlayerNameClassifier(object):
+    def match(self, img_name):
+        """
+        Match the specified image with the templates.
 
-    def __init__(self, img_name_list, debug=False):
-        self._models = train_svm_classifiers(img_name_list, debug=debug)
+        Returns tuple of (index, confidence).
+        """
+        return self.match_list([img_name])[0]
 
     def predict(self, img_name, debug=False):
         """
@@ -170,5 +161,19 @@ class PlayerNameClassifier(object):
 
         Returns index number, or None if it is not certain.
         """
-
-        return predict(self, self._models, img_name)
+        return self.match(img_name)[0]
+
+    def __init__(self, img_name_list, max_distance=0.5, max_ratio=0.8,
+                 debug=False):
+        assert isinstance(img_name_list, list)
+
+        self._templates = pack_player_names(img_name_list)
+        # Blank names (e.g. cropping errors) never match.
+        self._valid = np.array(
+            list(map(lambda img: img is not None, img_name_list)),
+            dtype=np.bool_
+        ) & (self._templates.sum(axis=1) > 0)
+
+        self._max_distance = max_distance
+        self._max_ratio = max_ratio
+        self._debug = debug
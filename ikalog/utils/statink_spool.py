@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import heapq
+import os
+import threading
+import time
+import traceback
+import uuid
+
+from ikalog.utils import *
+from ikalog.utils.statink_uploader import PostToStatInk
+
+
+class StatInkSpool(object):
+    """
+    Durable upload queue for stat.ink.
+
+    Each payload (the msgpack body to POST) is written to a file in the
+    spool directory before it is uploaded, and the file is removed once
+    stat.ink has accepted it. The files left in the directory, after a
+    crash or a stat.ink outage, are uploaded when the spool starts again.
+
+    A fixed number of worker threads upload the payloads over a shared
+    keep-alive connection pool. When stat.ink could not be reached, or
+    returned 5xx, the upload is retried with exponential backoff. The
+    payloads rejected by stat.ink are moved to the failed/ subdirectory.
+
+    callback(job, error, response, context) is called on worker threads
+    when the upload is done, or has failed.
+    """
+
+    suffix = '.msgpack'
+    failed_dir = 'failed'
+
+    def _list_files(self):
+        try:
+            files = os.listdir(self.spool_dir)
+        except OSError:
+            return []
+
+        for f in files:
+            if f.endswith(self.suffix + '.tmp'):
+                # Incomplete write.
+                os.remove(os.path.join(self.spool_dir, f))
+
+        return sorted(filter(lambda f: f.endswith(self.suffix), files))
+
+    def _write(self, body):
+        if not os.path.exists(self.spool_dir):
+            os.makedirs(self.spool_dir)
+
+        job = '%s_%s%s' % (
+            time.strftime('%Y%m%d_%H%M%S'), uuid.uuid4().hex[:8], self.suffix)
+        filename = os.path.join(self.spool_dir, job)
+
+        f = open(filename + '.tmp', 'wb')
+        try:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            f.close()
+        os.replace(filename + '.tmp', filename)
+
+        return job
+
+    def _schedule(self, job, due, attempts=0, context=None):
+        with self._cond:
+            self._seq = self._seq + 1
+            heapq.heappush(self._jobs, (due, self._seq, job, attempts))
+            self._contexts[job] = context
+            self._cond.notify()
+
+    def put(self, body, context=None):
+        """
+        Spool the msgpack body, and upload it. Returns the job name.
+        """
+        job = self._write(body)
+        self._schedule(job, 0, context=context)
+        self.start()
+        return job
+
+    def pending(self):
+        """
+        Returns the number of payloads not uploaded yet.
+        """
+        with self._cond:
+            return len(self._jobs) + self._active
+
+    def wait(self, timeout=None):
+        """
+        Wait until the queue gets empty. Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while len(self._jobs) + self._active > 0:
+                remaining = None if deadline is None else \
+                    deadline - time.time()
+                if (remaining is not None) and (remaining <= 0):
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _next_job(self):
+        with self._cond:
+            while not self._stop:
+                if len(self._jobs) > 0:
+                    due = self._jobs[0][0]
+                    now = time.time()
+                    if due <= now:
+                        self._active = self._active + 1
+                        return heapq.heappop(self._jobs)
+                    self._cond.wait(due - now)
+                else:
+                    self._cond.wait()
+        return None
+
+    def _get_retry_interval(self, attempts):
+        return min(self.retry_interval * (2 ** (attempts - 1)),
+                   self.max_retry_interval)
+
+    def _upload(self, job, attempts):
+        filename = os.path.join(self.spool_dir, job)
+        try:
+            f = open(filename, 'rb')
+            body = f.read()
+            f.close()
+        except IOError:
+            IkaUtils.dprint('%s: Failed to read %s' % (self, filename))
+            return
+
+        status, error, response = PostToStatInk(
+            body, self.url, show_response=self.show_response, pool=self._pool)
+        context = self._contexts.get(job)
+
+        transient = (status is None) or (status == 429) or (status >= 500)
+        if transient:
+            attempts = attempts + 1
+            if (self.max_retries is None) or (attempts <= self.max_retries):
+                interval = self._get_retry_interval(attempts)
+                IkaUtils.dprint('%s: Retrying %s in %.1f second(s)' %
+                                (self, job, interval))
+                self._schedule(job, time.time() + interval, attempts, context)
+                return
+
+            # Keep the file, so that it is retried on the next start.
+            IkaUtils.dprint('%s: Gave up %s for now' % (self, job))
+
+        elif error:
+            failed_dir = os.path.join(self.spool_dir, self.failed_dir)
+            if not os.path.exists(failed_dir):
+                os.makedirs(failed_dir)
+            os.replace(filename, os.path.join(failed_dir, job))
+
+        else:
+            os.remove(filename)
+
+        with self._cond:
+            self._contexts.pop(job, None)
+
+        if self.callback:
+            self.callback(job, error, response, context)
+
+    def _worker(self):
+        while True:
+            item = self._next_job()
+            if item is None:
+                return
+
+            due, seq, job, attempts = item
+            try:
+                self._upload(job, attempts)
+            except:
+                IkaUtils.dprint('%s: Failed to upload %s' % (self, job))
+                IkaUtils.dprint(traceback.format_exc())
+            finally:
+                with self._cond:
+                    self._active = self._active - 1
+                    self._cond.notify_all()
+
+    def start(self):
+        """
+        Start the workers, and resume the payloads left in the spool.
+        """
+        with self._cond:
+            if len(self._threads) > 0:
+                return
+            self._stop = False
+            queued = set(item[2] for item in self._jobs)
+
+        for job in self._list_files():
+            if not (job in queued):
+                IkaUtils.dprint('%s: Resuming %s' % (self, job))
+                self._schedule(job, 0)
+
+        for i in range(self.num_workers):
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """
+        Stop the workers. Payloads not uploaded stay in the spool.
+        """
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+        with self._cond:
+            self._jobs = []
+            self._contexts = {}
+
+    def __init__(self, spool_dir, url=None, num_workers=2, max_retries=8,
+                 retry_interval=5.0, max_retry_interval=600.0,
+                 callback=None, show_response=False, pool=None):
+        self.spool_dir = spool_dir
+        self.url = url
+        self.num_workers = num_workers
+        self.max_retries = max_retries
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.callback = callback
+        self.show_response = show_response
+
+        self._pool = pool
+        self._cond = threading.Condition()
+        self._jobs = []
+        self._contexts = {}
+        self._seq = 0
+        self._active = 0
+        self._stop = False
+        self._threads = []
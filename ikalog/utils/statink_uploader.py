@@ -21,19 +21,38 @@
 import json
 import os
 import sys
+import threading
 import time
 import umsgpack
 import urllib3
 
 from ikalog.utils import *
 
-
-def UploadToStatInk(payload, api_key, url=None, video_id=None,
-                    show_response=False, dry_run=False):
-    name = 'UploadToStatInk'
-    if not url:
-        url = 'https://stat.ink/api/v1/battle'
-
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the connection pool shared by the uploaders, so that the
+    connections to stat.ink are kept alive between uploads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = urllib3.PoolManager(
+                cert_reqs='CERT_REQUIRED',  # Force certificate check
+                ca_certs=Certifi.where(),   # Path to the Certifi bundle.
+                timeout=120.0,              # Timeout (in sec)
+                maxsize=4,
+            )
+    return _pool
+
+
+def PackPayload(payload, api_key, video_id=None, dry_run=False):
+    """
+    Returns the msgpack body to POST.
+    """
     # Payload data will be modified, so we copy it.
     # It is not deep copy, so only dict object is duplicated.
     payload = payload.copy()
@@ -44,8 +63,22 @@ def UploadToStatInk(payload, api_key, url=None, video_id=None,
     if isinstance(video_id, str) and (video_id != ''):
         payload['link_url'] = 'https://www.youtube.com/watch?v=%s' % video_id
 
-    mp_payload_bytes = umsgpack.packb(payload)
-    mp_payload = ''.join(map(chr, mp_payload_bytes))
+    return umsgpack.packb(payload)
+
+
+def PostToStatInk(body, url=None, show_response=False, pool=None):
+    """
+    POST the msgpack body to stat.ink.
+
+    Returns [status, error, response]. status is the HTTP status code,
+    or None if the server could not be reached.
+    """
+    name = 'PostToStatInk'
+    if not url:
+        url = 'https://stat.ink/api/v1/battle'
+
+    if pool is None:
+        pool = get_pool()
 
     http_headers = {
         'Content-Type': 'application/x-msgpack',
@@ -54,34 +87,31 @@ def UploadToStatInk(payload, api_key, url=None, video_id=None,
     IkaUtils.dprint('%s: POST %s' % (name, url))
     time_post_start = time.time()
 
-    pool = urllib3.PoolManager(
-        cert_reqs='CERT_REQUIRED',  # Force certificate check
-        ca_certs=Certifi.where(),   # Path to the Certifi bundle.
-        timeout=120.0,              # Timeout (in sec)
-    )
-
     # Post the payload
 
     try:
+        # Retries are up to the caller.
         req = pool.urlopen('POST', url,
                            headers=http_headers,
-                           body=mp_payload,
+                           body=body,
+                           retries=False,
                            )
-    except urllib3.exceptions.SSLError as e:
-        # Handle incorrect certificate error.
-        IkaUtils.dprint('%s: SSLError, value: %s' % (name, e.value))
+    except urllib3.exceptions.HTTPError as e:
+        # Includes incorrect certificate error.
+        IkaUtils.dprint('%s: %s: %s' % (name, e.__class__.__name__, e))
+        return [None, True, {'error': str(e)}]
 
     # Error detection
 
     error = False
     try:
         statink_response = json.loads(req.data.decode('utf-8'))
-        error = 'error' in statink_response
+        error = (req.status >= 400) or ('error' in statink_response)
         if error:
-            IkaUtils.dprint('%s: API Error occured')
+            IkaUtils.dprint('%s: API Error occured' % name)
     except:
         error = True
-        IkaUtils.dprint('%s: Stat.ink return non-JSON response')
+        IkaUtils.dprint('%s: Stat.ink return non-JSON response' % name)
         statink_response = {
             'error': 'Not a JSON response',
         }
@@ -90,16 +120,24 @@ def UploadToStatInk(payload, api_key, url=None, video_id=None,
 
     if show_response or error:
         IkaUtils.dprint('%s: == Response begin ==' % name)
-        print(req.data.decode('utf-8'))
+        print(req.data.decode('utf-8', 'replace'))
         IkaUtils.dprint('%s: == Response end ===' % name)
 
     IkaUtils.dprint(
         '%s: POST Done. %d bytes in %f second(s).' % (
             name,
-            len(mp_payload),
+            len(body),
             int((time.time() - time_post_start) * 10) / 10,
         )
     )
     IkaUtils.dprint(statink_response.get('url'))
 
+    return [req.status, error, statink_response]
+
+
+def UploadToStatInk(payload, api_key, url=None, video_id=None,
+                    show_response=False, dry_run=False):
+    body = PackPayload(payload, api_key, video_id, dry_run)
+    status, error, statink_response = PostToStatInk(
+        body, url, show_response=show_response)
     return [error, statink_response]
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import numpy as np
+
+
+class VoteAccumulator(object):
+    """
+    Streaming vote counter with an early-stop rule.
+
+    Recognizers which run on every frame of a scene can vote their
+    results here, and stop recognizing once the election is settled.
+
+    The election is settled when the leader has min_votes or more votes
+    and leads the runner-up by margin votes or more. For two candidates,
+    this is the sequential probability ratio test of the leader being
+    the right answer (the vote difference is a random walk, and margin
+    is its decision boundary). It is also settled when max_votes votes
+    were casted.
+    """
+
+    def vote(self, key):
+        """
+        Cast a vote. None is ignored.
+        Returns True if the election is settled.
+        """
+        if key is not None and not self._settled:
+            self.votes[key] = self.votes.get(key, 0) + 1
+            self.num_votes += 1
+            self._settled = self._evaluate()
+
+        return self._settled
+
+    def _evaluate(self):
+        if (self.max_votes is not None) and (self.max_votes <= self.num_votes):
+            return True
+
+        counts = sorted(self.votes.values(), reverse=True)
+        leader = counts[0]
+        runner_up = counts[1] if len(counts) > 1 else 0
+
+        return (self.min_votes <= leader) and \
+            (self.margin <= leader - runner_up)
+
+    def is_settled(self):
+        return self._settled
+
+    def get_winner(self):
+        """
+        Returns tuple of (key, accuracy), or (None, None) if no votes.
+        accuracy is softmax of the leader's votes.
+        """
+        if len(self.votes) == 0:
+            return None, None
+
+        key_list = list(self.votes.keys())
+        count_list = list(map(lambda key: self.votes[key], key_list))
+
+        max_index = np.argmax(count_list)
+
+        # softmax
+        sum_votes_exp = np.sum(np.exp(count_list))
+        accuracy = np.exp(count_list[max_index]) / sum_votes_exp
+
+        return key_list[max_index], accuracy
+
+    def reset(self):
+        self.votes = {}
+        self.num_votes = 0
+        self._settled = False
+
+    def __init__(self, min_votes=3, margin=3, max_votes=None):
+        self.min_votes = min_votes
+        self.margin = margin
+        self.max_votes = max_votes
+        self.reset()
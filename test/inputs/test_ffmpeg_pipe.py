@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for FFmpegPipe.
+#  Usage:
+#    python ./test_ffmpeg_pipe.py
+#  or
+#    py.test ./test_ffmpeg_pipe.py
+#
+#  Set FFMPEG environment variable to use ffmpeg not in PATH.
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.inputs import FFmpegPipe
+
+FFMPEG = os.environ.get('FFMPEG', shutil.which('ffmpeg'))
+
+
+@unittest.skipIf(not FFMPEG, 'ffmpeg command is not available')
+class TestFFmpegPipe(unittest.TestCase):
+
+    num_frames = 60
+    fps = 60
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video_file = os.path.join(self.tmp_dir, 'test.avi')
+
+        # Half size; ffmpeg scales it up to 1280x720.
+        writer = cv2.VideoWriter(
+            self.video_file, cv2.VideoWriter_fourcc(*'MJPG'), self.fps,
+            (640, 360))
+        for i in range(self.num_frames):
+            # Frame number is encoded in the pixel value.
+            frame = np.full((360, 640, 3), i * 4, dtype=np.uint8)
+            writer.write(frame)
+        writer.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_all(self, source):
+        frames = []
+        while True:
+            try:
+                frame = source.read_frame()
+            except EOFError:
+                break
+            if frame is None:
+                break
+            assert frame.shape == (720, 1280, 3)
+            frames.append(
+                (source.get_current_timestamp(), int(frame[0, 0, 0] + 2) // 4))
+        return frames
+
+    def test_read_all_frames(self):
+        source = FFmpegPipe(ffmpeg_path=FFMPEG)
+        source.select_source(name=self.video_file)
+
+        frames = self._read_all(source)
+        assert len(frames) == self.num_frames
+        assert frames[0] == (0, 0)
+        assert abs(frames[30][0] - 500) < 1
+        assert frames[30][1] == 30
+
+    def test_frame_rate(self):
+        source = FFmpegPipe(ffmpeg_path=FFMPEG)
+        source.select_source(name=self.video_file)
+        source.set_frame_rate(10)
+
+        frames = self._read_all(source)
+
+        # 60fps -> 10fps; ffmpeg decimates the frames.
+        assert len(frames) == self.num_frames // 6
+        assert [f[1] for f in frames] == list(range(0, self.num_frames, 6))
+        assert abs(frames[1][0] - 100) < 1
+
+    def test_set_pos_msec(self):
+        source = FFmpegPipe(ffmpeg_path=FFMPEG)
+        source.select_source(name=self.video_file)
+        source.set_pos_msec(500)
+
+        frame = source.read_frame()
+        assert abs(source.get_current_timestamp() - 500) < 20
+        assert abs(int(frame[0, 0, 0] + 2) // 4 - 30) <= 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for input filters.
+#  Usage:
+#    python ./test_filters.py
+#  or
+#    py.test ./test_filters.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.inputs.filters import OffsetFilter, WarpFilter, WhiteBalanceFilter
+
+
+class FakeInput(object):
+    out_width = 1280
+    out_height = 720
+
+
+def random_frame(shape=(720, 1280, 3)):
+    # Smooth image, so that interpolation errors stay small.
+    img = np.random.randint(0, 256, (shape[0] // 20, shape[1] // 20, 3))
+    return cv2.resize(img.astype(np.uint8), (shape[1], shape[0]))
+
+
+class TestWarpFilter(unittest.TestCase):
+
+    def _create_filter(self):
+        f = WarpFilter(FakeInput())
+        f.enable()
+        f.set_bbox(100, 50, 1600, 900)
+        return f
+
+    def test_execute(self):
+        f = self._create_filter()
+        frame = random_frame((1080, 1920, 3))
+
+        expected = cv2.warpPerspective(frame, f.M, (1280, 720))
+        result = f.execute(frame)
+
+        assert result.shape == (720, 1280, 3)
+        diff = np.abs(result.astype(np.int32) - expected.astype(np.int32))
+        assert np.mean(diff) < 1.0
+
+    def test_identity(self):
+        f = WarpFilter(FakeInput())
+        f.enable()
+        frame = random_frame()
+        assert f.execute(frame) is frame
+
+    def test_save_and_load_calibration(self):
+        f = self._create_filter()
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmp_dir, 'warp.pickle')
+            f.saveCalibrationToFile(filename)
+
+            f2 = WarpFilter(FakeInput())
+            f2.enable()
+            f2.loadCalibrationFromFile(filename)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        frame = random_frame((1080, 1920, 3))
+        assert np.array_equal(f.execute(frame), f2.execute(frame))
+
+
+class TestOffsetFilter(unittest.TestCase):
+
+    def test_execute(self):
+        f = OffsetFilter(FakeInput())
+        f.enable()
+        frame = random_frame()
+
+        f.offset = (10, -5)
+        result = f.execute(frame)
+        assert np.array_equal(result[0:715, 10:1280], frame[5:720, 0:1270])
+        assert np.all(result[715:720, :] == 0)
+        assert np.all(result[:, 0:10] == 0)
+
+        f.offset = (0, 0)
+        assert f.execute(frame) is frame
+
+
+class TestWhiteBalanceFilter(unittest.TestCase):
+
+    def test_execute(self):
+        f = WhiteBalanceFilter(FakeInput())
+        frame = random_frame()
+        assert f.execute(frame) is frame
+
+        coffs = (1.1, 0.9, 1.3)
+        f.coffs = coffs
+
+        expected = np.array(frame, np.float32)
+        for n in range(3):
+            expected[:, :, n] = np.minimum(expected[:, :, n] * coffs[n], 255)
+        expected = np.array(expected, np.uint8)
+
+        assert np.array_equal(f.execute(frame), expected)
+        assert np.array_equal(f.filterImage(frame, coffs), expected)
+
+        f.reset()
+        assert f.execute(frame) is frame
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for FrameBus.
+#  Usage:
+#    python ./test_frame_bus.py
+#  or
+#    py.test ./test_frame_bus.py
+
+import multiprocessing
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.inputs.frame_bus import FrameBus, FrameBusInput, shared_memory
+
+
+def _consume(name, queue):
+    bus = FrameBus.attach(name)
+    seq = bus.wait_next(-1, timeout=10.0)
+    frame, msec = bus.get_frame(seq)
+    queue.put((seq, int(frame[0, 0, 0]), msec))
+    bus.close()
+
+
+@unittest.skipIf(shared_memory is None, 'multiprocessing.shared_memory is not available')
+class TestFrameBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = FrameBus.create(num_slots=4)
+
+    def tearDown(self):
+        self.bus.close()
+
+    def _frame(self, value):
+        return np.full((720, 1280, 3), value, np.uint8)
+
+    def test_publish_and_get(self):
+        consumer = FrameBus.attach(self.bus.name)
+        try:
+            assert consumer.get_latest_seq() == -1
+            assert consumer.wait_next(-1, timeout=0.01) is None
+
+            for i in range(6):
+                assert self.bus.publish(self._frame(i), i * 100) == i
+
+            assert consumer.get_latest_seq() == 5
+            frame, msec = consumer.get_frame(5)
+            assert frame[0, 0, 0] == 5
+            assert msec == 500
+
+            # Overwritten by the ring buffer.
+            assert consumer.get_frame(1) == (None, None)
+            assert consumer.is_valid(5)
+            assert not consumer.is_valid(1)
+        finally:
+            consumer.close()
+
+    def test_input(self):
+        source = FrameBusInput(roi=(0, 0, 640, 360))
+        source.select_source(name=self.bus.name)
+        try:
+            frame = self._frame(0)
+            frame[0:360, 0:640] = 255
+            self.bus.publish(frame, 1000)
+
+            img = source.read_frame()
+            assert img.shape == (720, 1280, 3)
+            assert np.all(img == 255)
+            assert source.get_current_timestamp() == 1000
+
+            self.bus.publish(self._frame(1), 1100)
+            self.bus.publish(self._frame(2), 1200)
+            img = source.read_frame()
+            assert source.get_current_timestamp() == 1200
+            assert source.get_skipped_frames() == 1
+        finally:
+            source._cleanup_driver_func()
+
+    def test_another_process(self):
+        ctx = multiprocessing.get_context('spawn')
+        queue = ctx.Queue()
+        p = ctx.Process(target=_consume, args=(self.bus.name, queue))
+        p.start()
+
+        self.bus.publish(self._frame(42), 4200)
+        seq, value, msec = queue.get(timeout=30)
+        p.join()
+
+        assert (seq, value, msec) == (0, 42, 4200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for FrameScheduler.
+#  Usage:
+#    python ./test_frame_scheduler.py
+#  or
+#    py.test ./test_frame_scheduler.py
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.inputs.frame_scheduler import FrameScheduler
+
+
+class FakeClock(object):
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, sec):
+        self.slept.append(sec)
+        self.now = self.now + sec
+
+    def __init__(self):
+        self.now = 100.0
+        self.slept = []
+
+
+class TestFrameScheduler(unittest.TestCase):
+
+    def _create(self, fps=10):
+        clock = FakeClock()
+        scheduler = FrameScheduler(fps, clock=clock.clock, sleep=clock.sleep)
+        return scheduler, clock
+
+    def test_sleeps_until_deadline(self):
+        scheduler, clock = self._create()
+
+        scheduler.wait()
+        assert clock.slept == []
+
+        # Processing took 30ms; sleep the rest of the slot.
+        clock.now += 0.03
+        scheduler.wait()
+        assert abs(clock.slept[-1] - 0.07) < 1e-6
+        assert abs(clock.now - 100.1) < 1e-6
+
+        # Deadlines do not drift.
+        clock.now += 0.05
+        scheduler.wait()
+        assert abs(clock.now - 100.2) < 1e-6
+
+        assert scheduler.get_stats()['late'] == 0
+        assert scheduler.get_stats()['dropped'] == 0
+
+    def test_late_and_dropped(self):
+        scheduler, clock = self._create()
+        scheduler.wait()
+
+        # Slightly late; no slot is missed.
+        clock.now += 0.15
+        assert scheduler.wait() == 0
+        assert scheduler.get_stats()['late'] == 1
+
+        # 370ms behind the slot; 3 more slots have passed.
+        clock.now += 0.37
+        assert scheduler.wait() == 3
+        stats = scheduler.get_stats()
+        assert stats['late'] == 2
+        assert stats['dropped'] == 3
+
+        # The grid is realigned; the next slot is 100ms later.
+        slept = len(clock.slept)
+        scheduler.wait()
+        assert abs(clock.slept[slept] - 0.1) < 1e-6
+
+    def test_no_fps(self):
+        scheduler, clock = self._create(fps=None)
+        for i in range(3):
+            assert scheduler.wait() == 0
+        assert clock.slept == []
+
+    def test_duplicate(self):
+        scheduler, clock = self._create()
+        frame1 = np.zeros((720, 1280, 3), np.uint8)
+        frame2 = np.full((720, 1280, 3), 255, np.uint8)
+
+        assert not scheduler.on_frame(frame1)
+        assert scheduler.on_frame(frame1.copy())
+        assert not scheduler.on_frame(frame2)
+
+        stats = scheduler.get_stats()
+        assert stats['frames'] == 3
+        assert stats['duplicate'] == 1
+
+        scheduler.reset()
+        assert scheduler.get_stats()['frames'] == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for GStreamer input.
+#  Usage:
+#    python ./test_gstreamer.py
+#  or
+#    py.test ./test_gstreamer.py
+
+import os
+import re
+import sys
+import unittest
+
+import cv2
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.inputs import GStreamer
+
+HAS_GSTREAMER = re.search(
+    r'GStreamer:\s+YES', cv2.getBuildInformation()) is not None
+
+
+class TestGStreamer(unittest.TestCase):
+
+    def test_build_pipeline(self):
+        source = GStreamer()
+
+        pipeline = source.build_pipeline('videotestsrc is-live=true')
+        elements = [e.strip() for e in pipeline.split('!')]
+        assert elements[0] == 'videotestsrc is-live=true'
+        assert 'videoconvert' in elements
+        assert 'videoscale' in elements
+        assert 'video/x-raw,format=BGR,width=1280,height=720' in elements
+        assert elements[-1] == 'appsink drop=true max-buffers=1 sync=false'
+
+    def test_build_pipeline_complete(self):
+        source = GStreamer()
+
+        # Pipelines with appsink are used as is.
+        pipeline = 'videotestsrc ! videoconvert ! appsink'
+        assert source.build_pipeline(pipeline) == pipeline
+
+    def test_file_source(self):
+        assert GStreamer.file_source('/tmp/a b.mp4') == \
+            'filesrc location="/tmp/a b.mp4" ! decodebin'
+
+    def test_is_live_source(self):
+        assert GStreamer.is_live_source('videotestsrc is-live=true')
+        assert GStreamer.is_live_source(
+            'decklinksrc connection=hdmi mode=720p5994 device-number=0')
+        assert not GStreamer.is_live_source('videotestsrc')
+        assert not GStreamer.is_live_source(GStreamer.file_source('a.mp4'))
+        assert not GStreamer.is_live_source(
+            'uridecodebin uri=file:///tmp/a.mp4')
+
+    @unittest.skipIf(not HAS_GSTREAMER, 'OpenCV is built without GStreamer')
+    def test_read_frame(self):
+        source = GStreamer()
+        source.select_source(name=GStreamer.test_source())
+
+        frame = source.read_frame()
+        assert frame.shape == (720, 1280, 3)
+        assert source.get_latency_msec() is not None
+        assert not source.cap_recorded_video
+        assert source.get_frame_stats()['frames'] == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for ImageDirectory.
+#  Usage:
+#    python ./test_image_directory.py
+#  or
+#    py.test ./test_image_directory.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.inputs import ImageDirectory
+
+
+class TestImageDirectory(unittest.TestCase):
+
+    num_images = 10
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        for i in range(self.num_images):
+            filename = 'ikalog_20160512_1200%02d.png' % (i * 2)
+            img = np.full((720, 1280, 3), i * 10, np.uint8)
+            cv2.imwrite(os.path.join(self.tmp_dir, filename), img)
+
+        # Not an image.
+        with open(os.path.join(self.tmp_dir, 'notes.txt'), 'w') as f:
+            f.write('hello')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_all(self, source):
+        frames = []
+        while True:
+            try:
+                frame = source.read_frame()
+            except EOFError:
+                break
+            frames.append(
+                (source.get_current_timestamp(), int(frame[0, 0, 0]) // 10))
+        return frames
+
+    def test_read_directory(self):
+        source = ImageDirectory(num_workers=3, queue_size=4)
+        source.select_source(name=self.tmp_dir)
+
+        frames = self._read_all(source)
+        assert [f[1] for f in frames] == list(range(self.num_images))
+        # Taken from the filenames; 2 seconds apart.
+        assert [f[0] for f in frames] == \
+            [i * 2000 for i in range(self.num_images)]
+
+    def test_glob_and_index_timestamp(self):
+        source = ImageDirectory(timestamp='index', interval_msec=100)
+        source.select_source(name=os.path.join(self.tmp_dir, '*_12000*.png'))
+
+        frames = self._read_all(source)
+        assert frames == [(0, 0), (100, 1), (200, 2), (300, 3), (400, 4)]
+        assert source.get_epoch_time() is None
+
+    def test_skip_broken_image(self):
+        with open(os.path.join(self.tmp_dir, 'ikalog_20160512_120001.png'), 'w') as f:
+            f.write('broken')
+
+        source = ImageDirectory()
+        source.select_source(name=self.tmp_dir)
+
+        frames = self._read_all(source)
+        assert len(frames) == self.num_images
+
+    def test_frame_rate(self):
+        source = ImageDirectory(timestamp='index', interval_msec=1000)
+        source.select_source(name=self.tmp_dir)
+        source.set_frame_rate(0.5)
+
+        frames = self._read_all(source)
+        assert [f[1] for f in frames] == [0, 2, 4, 6, 8]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for CVFile.
+#  Usage:
+#    python ./test_opencv_file.py
+#  or
+#    py.test ./test_opencv_file.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.inputs import CVFile
+from ikalog.inputs.video_index import VideoIndex
+
+
+class TestCVFile(unittest.TestCase):
+
+    num_frames = 60
+    fps = 60
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.video_file = os.path.join(self.tmp_dir, 'test.avi')
+
+        writer = cv2.VideoWriter(
+            self.video_file, cv2.VideoWriter_fourcc(*'MJPG'), self.fps,
+            (1280, 720))
+        for i in range(self.num_frames):
+            # Frame number is encoded in the pixel value.
+            frame = np.full((720, 1280, 3), i * 4, dtype=np.uint8)
+            writer.write(frame)
+        writer.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_all(self, source):
+        frames = []
+        while True:
+            try:
+                frame = source.read_frame()
+            except EOFError:
+                break
+            if frame is None:
+                break
+            frames.append(
+                (source.get_current_timestamp(), int(frame[0, 0, 0] + 2) // 4))
+        return frames
+
+    def test_read_all_frames(self):
+        source = CVFile()
+        source.select_source(name=self.video_file)
+
+        frames = self._read_all(source)
+        assert len(frames) == self.num_frames
+        assert frames[0] == (0, 0)
+        assert abs(frames[30][0] - 500) < 1
+        assert frames[30][1] == 30
+
+    def test_frame_rate(self):
+        source = CVFile()
+        source.select_source(name=self.video_file)
+        source.set_frame_rate(10)
+
+        frames = self._read_all(source)
+
+        # 60fps -> 10fps; every 6th frame.
+        assert [f[1] for f in frames] == list(range(0, self.num_frames, 6))
+
+    def test_set_pos_msec_with_index(self):
+        source = CVFile()
+        source.select_source(name=self.video_file)
+        source.set_use_index(True, ffprobe_path=None, allow_slow=True,
+                             cache=True)
+        source.set_pos_msec(500)
+
+        frame = source.read_frame()
+        assert source.get_current_timestamp() == 500
+        assert int(frame[0, 0, 0] + 2) // 4 == 30
+
+        # The index is cached next to the video.
+        assert os.path.exists(self.video_file + VideoIndex.cache_suffix)
+        index = VideoIndex.load(self.video_file)
+        assert index.num_frames() == self.num_frames
+        assert index.frame_at(500) == 30
+        assert index.frame_at(501) == 31
+
+    def test_start_time_with_index(self):
+        source = CVFile()
+        source.select_source(name=self.video_file)
+        source.set_use_index(True, ffprobe_path=None, allow_slow=True)
+        mtime = os.stat(self.video_file).st_mtime
+
+        # The start time is recomputed with the duration in the index,
+        # once the index is built for a seek.
+        with mock.patch.object(VideoIndex, 'get_duration_msec',
+                               return_value=5000):
+            source.set_pos_msec(500)
+        assert source._index is not None
+        assert abs(source.get_epoch_time() - (mtime - 5.0)) < 0.001
+
+    def test_set_pos_msec_without_index(self):
+        source = CVFile()
+        source.select_source(name=self.video_file)
+
+        # No index without ffprobe (the slow index is not allowed), and
+        # no cache file next to the video.
+        source.set_use_index(True, ffprobe_path=None)
+        source.set_pos_msec(0)
+        source.set_pos_msec(500)
+        assert source._index is None
+        assert not os.path.exists(self.video_file + VideoIndex.cache_suffix)
+
+        frame = source.read_frame()
+        assert abs(int(frame[0, 0, 0] + 2) // 4 - 30) <= 1
+
+
+class TestVideoIndex(unittest.TestCase):
+
+    def test_parse_ffprobe_packets(self):
+        # Decoding order with B-frames; N/A packets are ignored.
+        text = '\n'.join([
+            '0.000000,K_',
+            '0.100000,__',
+            '0.033333,__',
+            '0.066667,__',
+            'N/A,__',
+            '0.133333,K_',
+            '0.166667,__',
+        ])
+        index = VideoIndex.parse_ffprobe_packets(text)
+
+        assert index.num_frames() == 6
+        assert abs(index.timestamp(2) - 66.667) < 0.01
+        assert list(index.keyframes) == [0, 4]
+        assert index.keyframe_before(3) == 0
+        assert index.keyframe_before(4) == 4
+        assert index.keyframe_before(5) == 4
+        assert abs(index.get_duration_msec() - 200) < 0.01
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+#  Unit test for ClipRecorder.
+#  Usage:
+#    python ./test_clip_recorder.py
+#  or
+#    py.test ./test_clip_recorder.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.outputs.clip_recorder import ClipRecorder
+
+
+class TestClipRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.dest_dir = tempfile.mkdtemp()
+        self.recorder = ClipRecorder(dest_dir=self.dest_dir, size=(160, 90),
+                                     fps=10, max_queue=1000)
+        self.context = {'engine': {'msec': 0, 'frame': None}}
+
+    def tearDown(self):
+        shutil.rmtree(self.dest_dir)
+
+    def _feed(self, start_sec, end_sec, events={}, frame=None):
+        # 10 frames per second.
+        for i in range(int(start_sec * 10), int(end_sec * 10)):
+            self.context['engine']['msec'] = i * 100
+            if frame is None:
+                self.context['engine']['frame'] = \
+                    np.full((720, 1280, 3), i % 256, np.uint8)
+            else:
+                # The input reuses the buffer.
+                frame[...] = i % 256
+                self.context['engine']['frame'] = frame
+            self.recorder.on_frame_read(self.context)
+
+            event = events.get(i * 100)
+            if event:
+                getattr(self.recorder, event)(self.context)
+
+    def _num_frames(self, filename):
+        cap = cv2.VideoCapture(filename)
+        n = 0
+        while cap.grab():
+            n = n + 1
+        cap.release()
+        return n
+
+    def test_clip(self):
+        self._feed(0, 20, {10000: 'on_game_dead'})
+        self.recorder.close()
+
+        self.assertEqual(len(self.recorder.clips), 1)
+        filename = self.recorder.clips[0]
+        self.assertTrue(filename.endswith('_death.avi'))
+
+        # 6 seconds pre-roll and 2.5 seconds post-roll.
+        self.assertEqual(self._num_frames(filename), 86)
+
+    def test_merge(self):
+        self._feed(0, 30, {
+            10000: 'on_game_killed',
+            11000: 'on_game_dead',
+            25000: 'on_game_finish',
+        })
+        self.recorder.close()
+
+        self.assertEqual(len(self.recorder.clips), 2)
+        self.assertTrue(self.recorder.clips[0].endswith('_kill+death.avi'))
+
+        # The clip in progress is written on close, up to the last frame.
+        self.assertTrue(self.recorder.clips[1].endswith('_finish.avi'))
+        self.assertEqual(self._num_frames(self.recorder.clips[1]), 110)
+
+    def test_reused_buffer(self):
+        self.recorder.size = None
+        frame = np.zeros((90, 160, 3), np.uint8)
+        self._feed(0, 20, {10000: 'on_game_dead'}, frame=frame)
+        self.recorder.close()
+
+        cap = cv2.VideoCapture(self.recorder.clips[0])
+        values = []
+        while True:
+            ret, img = cap.read()
+            if not ret:
+                break
+            values.append(int(round(np.mean(img))))
+        cap.release()
+
+        # Frames 40 (4.0 sec) to 125 (12.5 sec).
+        self.assertEqual(len(values), 86)
+        for expected, value in zip(range(40, 126), values):
+            self.assertLessEqual(abs(expected - value), 2)
+
+    def test_queue_full(self):
+        recorder = ClipRecorder(dest_dir=self.dest_dir, max_queue=1, fps=0)
+        recorder._start = lambda: None
+        self.context['engine']['frame'] = np.zeros((90, 160, 3), np.uint8)
+        recorder.on_frame_read(self.context)
+        recorder.on_frame_read(self.context)
+        recorder._add_clip(self.context, 'kill')
+        recorder._add_clip(self.context, 'death')
+
+        # Only the frames are dropped.
+        self.assertEqual(recorder.stats['dropped_frames'], 1)
+        self.assertEqual(recorder._clip_queue.qsize(), 2)
+
+    def test_memory_budget(self):
+        self.recorder.max_bytes = 1
+        self._feed(0, 12, {10000: 'on_game_dead'})
+        self.recorder.close()
+
+        # Only the latest frame is kept before the event.
+        self.assertEqual(self._num_frames(self.recorder.clips[0]), 20)
+
+if __name__ == '__main__':
+    unittest.main()
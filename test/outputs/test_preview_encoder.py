@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+#  Unit test for PreviewEncoder.
+#  Usage:
+#    python ./test_preview_encoder.py
+#  or
+#    py.test ./test_preview_encoder.py
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.outputs.webserver.preview import PreviewEncoder
+
+
+class TestPreviewEncoder(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = np.zeros((720, 1280, 3), np.uint8)
+        self.encoder = PreviewEncoder(fps=100, width=640, height=360)
+
+    def tearDown(self):
+        self.encoder.stop()
+
+    def test_no_subscribers(self):
+        self.encoder.put_frame(self.frame)
+        time.sleep(0.1)
+        self.assertEqual(self.encoder.encoded, 0)
+
+    def test_shared_jpeg(self):
+        self.encoder.subscribe()
+        self.encoder.subscribe()
+
+        self.encoder.put_frame(self.frame)
+        seq1, jpeg1 = self.encoder.get_jpeg(0)
+        seq2, jpeg2 = self.encoder.get_jpeg(0)
+
+        # All the clients get the same bytes from one encode.
+        self.assertIs(jpeg1, jpeg2)
+        self.assertEqual(seq1, seq2)
+        self.assertEqual(self.encoder.encoded, 1)
+
+        img = cv2.imdecode(np.frombuffer(jpeg1, np.uint8), 1)
+        self.assertEqual(img.shape, (360, 640, 3))
+
+        # No new frame, nothing to send.
+        seq, jpeg = self.encoder.get_jpeg(seq1, timeout=0.1)
+        self.assertIsNone(jpeg)
+        self.assertEqual(self.encoder.encoded, 1)
+
+    def test_skip_if_slow(self):
+        self.encoder.subscribe()
+
+        self.encoder.put_frame(self.frame)
+        seq1, jpeg1 = self.encoder.get_jpeg(0)
+
+        # The client gets only the latest frame after a while.
+        for i in range(5):
+            self.encoder.put_frame(self.frame + i)
+            time.sleep(0.05)
+
+        seq2, jpeg2 = self.encoder.get_jpeg(seq1)
+        self.assertEqual(seq2, self.encoder.encoded)
+        img = cv2.imdecode(np.frombuffer(jpeg2, np.uint8), 0)
+        self.assertEqual(int(np.median(img)), 4)
+
+        seq, jpeg = self.encoder.get_jpeg(seq2, timeout=0.1)
+        self.assertIsNone(jpeg)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -22,6 +22,9 @@ import unittest
 import os.path
 import sys
 
+import cv2
+import numpy as np
+
 # Append the Ikalog root dir to sys.path to import IkaUtils.
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 from ikalog import constants
@@ -151,5 +154,30 @@ class TestStatInk(unittest.TestCase):
 
         # TODO: Test RGB data
 
+    def test_encode_image(self):
+        img = np.zeros((720, 1280, 3), np.uint8)
+        cv2.rectangle(img, (100, 100), (300, 200), (255, 255, 255), -1)
+
+        statink = StatInk()
+        context = {'game': {'image_judge': img, 'image_gears': img}}
+
+        # The screenshots are encoded in background once gathered.
+        statink.on_result_judge(context)
+        statink.on_result_gears_still(context)
+        assert 'image_judge' in statink._image_futures
+
+        png = statink._get_encoded_image('image_judge', img)
+        assert png[:4] == b'\x89PNG'
+        assert np.array_equal(
+            cv2.imdecode(np.frombuffer(png, np.uint8), 1), img)
+
+        # The screenshots gathered before on_game_finish are discarded.
+        statink.on_game_finish({'game': {}, 'engine': {}})
+        assert statink._image_futures == {}
+
+        statink = StatInk(image_format='jpg', image_quality=80)
+        jpg = statink.encode_image(img)
+        assert jpg[:2] == b'\xff\xd8'
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+#  Unit test for WebSocketBroadcaster.
+#  Usage:
+#    python ./test_websocket_server.py
+#  or
+#    py.test ./test_websocket_server.py
+
+import json
+import os
+import sys
+import unittest
+from concurrent.futures import Future
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.outputs.websocket_server import WebSocketBroadcaster
+
+
+class FakeIOLoop(object):
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def call_later(self, delay, callback):
+        self.callbacks.append(callback)
+
+    def run(self):
+        while self.callbacks:
+            self.callbacks.pop(0)()
+
+    def __init__(self):
+        self.callbacks = []
+
+
+class FakeClient(object):
+
+    def write_message(self, message):
+        self.messages.append(message)
+        future = Future()
+        if not self.slow:
+            future.set_result(None)
+        return future
+
+    def close(self):
+        self.closed = True
+
+    def __init__(self, slow=False):
+        self.slow = slow
+        self.messages = []
+        self.closed = False
+        self.pending_writes = 0
+        self.skipped_ticks = 0
+
+
+class TestWebSocketBroadcaster(unittest.TestCase):
+
+    def _create(self, clients, **kwargs):
+        self.ioloop = FakeIOLoop()
+        broadcaster = WebSocketBroadcaster(clients, **kwargs)
+        broadcaster.attach(self.ioloop)
+        return broadcaster
+
+    def test_coalesce(self):
+        client = FakeClient()
+        broadcaster = self._create([client])
+
+        broadcaster.enqueue({'event': 'on_game_paint_score_update',
+                             'paint_score': 100})
+        broadcaster.enqueue({'event': 'on_game_killed'})
+        broadcaster.enqueue({'event': 'on_game_paint_score_update',
+                             'paint_score': 200})
+
+        # Nothing is sent from the engine thread.
+        self.assertEqual(client.messages, [])
+
+        self.ioloop.run()
+        messages = [json.loads(m) for m in client.messages]
+        self.assertEqual(messages, [
+            {'event': 'on_game_killed'},
+            {'event': 'on_game_paint_score_update', 'paint_score': 200},
+        ])
+        self.assertEqual(broadcaster.coalesced, 1)
+        self.assertEqual(client.pending_writes, 0)
+
+    def test_batch(self):
+        clients = [FakeClient(), FakeClient()]
+        broadcaster = self._create(clients, batch=True)
+
+        broadcaster.enqueue({'event': 'on_game_go_sign'})
+        broadcaster.enqueue({'event': 'on_game_killed'})
+        self.ioloop.run()
+
+        for client in clients:
+            self.assertEqual(len(client.messages), 1)
+            self.assertEqual(json.loads(client.messages[0]), [
+                {'event': 'on_game_go_sign'}, {'event': 'on_game_killed'}])
+
+        # The frame is encoded once for all the clients.
+        self.assertIs(clients[0].messages[0], clients[1].messages[0])
+
+    def test_slow_client(self):
+        client = FakeClient(slow=True)
+        fast_client = FakeClient()
+        broadcaster = self._create(
+            [client, fast_client], max_pending_writes=2, max_skipped_ticks=2)
+
+        for i in range(6):
+            broadcaster.enqueue({'event': 'on_game_killed'})
+            self.ioloop.run()
+
+        self.assertEqual(len(client.messages), 2)
+        self.assertTrue(client.closed)
+
+        self.assertEqual(len(fast_client.messages), 6)
+        self.assertFalse(fast_client.closed)
+
+    def test_no_clients(self):
+        broadcaster = self._create([])
+        broadcaster.enqueue({'event': 'on_game_killed'})
+        self.assertEqual(self.ioloop.callbacks, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for DeadlyWeaponRecoginizerRegistry.
+#  Usage:
+#    python ./test_deadly_weapon.py
+#  or
+#    py.test ./test_deadly_weapon.py
+
+import os
+import sys
+import unittest
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.character_recoginizer.deadly_weapon import *
+
+
+class TestDeadlyWeaponRecoginizerRegistry(unittest.TestCase):
+
+    def test_resolve_language(self):
+        resolve = DeadlyWeaponRecoginizer.resolve_language
+        assert resolve('ja') == 'ja'
+        assert resolve('en_NA') == 'en_NA'
+        # No model for 'xx'. Falls back to the first candidate.
+        assert resolve('xx_YY') == 'xx_YY'
+
+    def test_registry_shares_models(self):
+        registry = DeadlyWeaponRecoginizerRegistry()
+
+        registry.load_async('ja').wait()
+        r1 = registry.get('ja', block=False)
+        r2 = registry.get('ja')
+
+        assert r1 is not None
+        assert r1 is r2
+        assert r1.lang == 'ja'
+
+        r3 = registry.get('en_NA')
+        assert r3 is not r1
+        assert r3.lang == 'en_NA'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+#  Unit test for EventStore.
+#  Usage:
+#    python ./test_event_store.py
+#  or
+#    py.test ./test_event_store.py
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.event_store import EventStore
+
+
+class TestEventStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = EventStore(os.path.join(self.tmp_dir, 'ika.sqlite'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _add_sessions(self):
+        games = [
+            (1000, 'area', 'hokke', 'win', 'wakaba'),
+            (2000, 'area', 'arowana', 'lose', 'wakaba'),
+            (3000, 'nawabari', 'hokke', 'win', 'sshooter'),
+            (4000, 'yagura', 'hokke', 'lose', 'wakaba'),
+        ]
+        for end_at, rule, map, result, weapon in games:
+            self.store.add_session(
+                {'end_at': end_at, 'rule': rule, 'map': map,
+                 'result': result, 'weapon': weapon, 'kills': 3},
+                players=[{'me': True, 'team': 1, 'weapon': weapon}],
+                events=[(1200, 'on_game_killed', None),
+                        (500, 'on_game_dead', {'reason': 'trap'})],
+                timelines={'objective': [[0, 0], [1000, 30]],
+                           'splatzone': [[0, (100, 100)]]},
+            )
+
+    def test_query_sessions(self):
+        self._add_sessions()
+
+        sessions = self.store.query_sessions()
+        self.assertEqual([s['end_at'] for s in sessions],
+                         [1000, 2000, 3000, 4000])
+
+        sessions = self.store.query_sessions(map='hokke', weapon='wakaba')
+        self.assertEqual([s['end_at'] for s in sessions], [1000, 4000])
+
+        sessions = self.store.query_sessions(rule='area', result='lose')
+        self.assertEqual([s['map'] for s in sessions], ['arowana'])
+
+        sessions = self.store.query_sessions(since=2000, until=4000)
+        self.assertEqual([s['end_at'] for s in sessions], [2000, 3000])
+
+        # The latest N sessions, in the order of time.
+        sessions = self.store.query_sessions(limit=2)
+        self.assertEqual([s['end_at'] for s in sessions], [3000, 4000])
+
+    def test_players_and_events(self):
+        self._add_sessions()
+        session = self.store.query_sessions(limit=1)[0]
+
+        players = self.store.get_players(session['id'])
+        self.assertEqual(len(players), 1)
+        self.assertEqual(players[0]['weapon'], 'wakaba')
+        self.assertEqual(players[0]['me'], 1)
+
+        events = self.store.get_events(session['id'])
+        self.assertEqual(events, [
+            (500, 'on_game_dead', {'reason': 'trap'}),
+            (1200, 'on_game_killed', None),
+        ])
+
+        events = self.store.get_events(session['id'], 'on_game_killed')
+        self.assertEqual(len(events), 1)
+
+        timelines = self.store.get_timelines(session['id'])
+        self.assertEqual(timelines, {
+            'objective': [[0, 0], [1000, 30]],
+            'splatzone': [[0, [100, 100]]],
+        })
+
+    def test_indexes(self):
+        plan = self.store._db.execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM sessions WHERE map = ? '
+            'ORDER BY end_at', ('hokke',)).fetchall()
+        self.assertIn('sessions_map', ' '.join(str(tuple(r)) for r in plan))
+
+        mode = self.store._db.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+if __name__ == '__main__':
+    unittest.main()
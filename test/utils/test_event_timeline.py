@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for EventSeries and EventTimeline.
+#  Usage:
+#    python ./test_event_timeline.py
+#  or
+#    py.test ./test_event_timeline.py
+
+import copy
+import os
+import sys
+import unittest
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.event_timeline import EventSeries, EventTimeline
+
+
+class TestEventSeries(unittest.TestCase):
+
+    def test_list_compatibility(self):
+        series = EventSeries()
+        series.add(0, 0)
+        series.add(320, 99)
+
+        self.assertEqual(2, len(series))
+        self.assertEqual([[0, 0], [320, 99]], series)
+        self.assertEqual([320, 99], series[-1])
+        self.assertEqual([[320, 99]], series[1:])
+        self.assertEqual([[0, 0], [320, 99]], list(series))
+        self.assertEqual(series, EventSeries([[0, 0], [320, 99]]))
+
+    def test_run_length(self):
+        series = EventSeries()
+        for msec in range(0, 1000, 100):
+            series.add(msec, 50)
+        series.add(1000, 60)
+        self.assertEqual([[0, 50], [1000, 60]], series)
+
+        # Same time: the value is replaced.
+        series.add(1000, 70)
+        self.assertEqual([[0, 50], [1000, 70]], series)
+
+        # Same time, back to the value before.
+        series.add(1000, 50)
+        self.assertEqual([[0, 50]], series)
+        self.assertEqual(50, series.value_at(5000))
+        self.assertIsNone(series.value_at(-1))
+
+    def test_typed_values(self):
+        series = EventSeries()
+        for i in range(100):
+            series.add(i * 100, [i, i // 2])
+
+        self.assertEqual((100, 2), series.get_values().shape)
+        self.assertEqual('i', series.get_values().dtype.kind)
+        self.assertEqual([9900, [99, 49]], series[-1])
+
+    def test_object_values(self):
+        series = EventSeries()
+        state = [[True, False], [True]]
+        series.add(0, state)
+        # The stored value is not affected by the caller.
+        state[1].append(False)
+        series.add(100, [[True], [True]])
+
+        self.assertEqual(
+            [[0, [[True, False], [True]]], [100, [[True], [True]]]], series)
+
+        # The values are stored as immutable tuples, shared with the
+        # snapshots without copying.
+        snapshot = series.snapshot()
+        self.assertEqual(((True, False), (True,)), series[0][1])
+        self.assertIs(series[0][1], snapshot[0][1])
+        with self.assertRaises(AttributeError):
+            series[0][1][0].append(None)
+
+        # Unchanged (equal) values are compressed.
+        series.add(200, [[True], [True]])
+        self.assertEqual(2, len(series))
+
+        # Typed series turns into an object series.
+        series = EventSeries([[0, 1], [100, [[True], [True, False]]]])
+        self.assertEqual([[0, 1], [100, [[True], [True, False]]]], series)
+
+    def test_snapshot(self):
+        series = EventSeries()
+        series.add(0, 1)
+        series.add(100, 2)
+
+        snapshot = series.snapshot()
+        self.assertTrue(snapshot.get_times().base is not None)
+
+        series.add(100, 3)
+        series.add(200, 4)
+        for i in range(100):
+            series.add(300 + i, i)
+
+        self.assertEqual([[0, 1], [100, 2]], snapshot)
+        self.assertEqual([100, 3], series[1])
+        with self.assertRaises(ValueError):
+            snapshot.get_values()[0] = 10
+
+
+class TestEventTimeline(unittest.TestCase):
+
+    def test_deepcopy(self):
+        timeline = EventTimeline({'objective': [[0, 0]]})
+        timeline.add('objective', 100, 10)
+        timeline.add('splatzone', 100, [100, 100])
+
+        context = {'game': {'events': timeline}}
+        copied = copy.deepcopy(context)['game']['events']
+
+        timeline.add('objective', 200, 20)
+        timeline.add('inklings', 200, [[True], [False]])
+
+        self.assertIsInstance(copied, EventTimeline)
+        self.assertEqual(
+            {'objective': [[0, 0], [100, 10]], 'splatzone': [[100, [100, 100]]]},
+            copied.to_dict())
+        self.assertEqual(3, len(timeline['objective']))
+
+    def test_deepcopy_memo(self):
+        timeline = EventTimeline()
+        timeline.add('objective', 0, 1)
+
+        # The same timeline referred twice is copied once.
+        copied = copy.deepcopy([timeline, timeline])
+        self.assertIs(copied[0], copied[1])
+        self.assertIsNot(copied[0], timeline)
+
+
+if __name__ == '__main__':
+    unittest.main()
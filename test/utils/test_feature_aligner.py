@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for FeatureAligner.
+#  Usage:
+#    python ./test_feature_aligner.py
+#  or
+#    py.test ./test_feature_aligner.py
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.feature_aligner import FeatureAligner
+
+
+class TestFeatureAligner(unittest.TestCase):
+
+    def _reference_image(self):
+        rng = np.random.RandomState(0)
+        img = np.zeros((360, 640), dtype=np.uint8)
+        for i in range(80):
+            x, y = rng.randint(20, 620), rng.randint(20, 340)
+            w, h = rng.randint(5, 30), rng.randint(5, 30)
+            cv2.rectangle(img, (x, y), (x + w, y + h),
+                          int(rng.randint(64, 256)), -1)
+        return img
+
+    def _create_aligner(self, img_ref, **kwargs):
+        detector = cv2.AKAZE_create()
+        keypoints, descriptors = detector.detectAndCompute(img_ref, None)
+        return FeatureAligner(keypoints, descriptors, img_ref.shape[:2],
+                              **kwargs)
+
+    def _shift(self, img, dx, dy):
+        M = np.float32([[1, 0, dx], [0, 1, dy]])
+        return cv2.warpAffine(img, M, (img.shape[1], img.shape[0]))
+
+    def test_align(self):
+        img_ref = self._reference_image()
+        img = self._shift(img_ref, 6, -4)
+
+        for use_flann in (False, True):
+            aligner = self._create_aligner(img_ref, use_flann=use_flann)
+
+            H, status = aligner.find_homography(img)
+            assert H is not None
+            assert abs(H[0][2] - 6) < 1.0
+            assert abs(H[1][2] + 4) < 1.0
+
+            img_aligned = aligner.align(img, size=(640, 360))
+            assert img_aligned is not None
+            assert 5.0 < aligner.get_displacement() < 8.0
+
+    def test_align_roi_and_cache(self):
+        img_ref = self._reference_image()
+        img = self._shift(img_ref, 3, 2)
+
+        aligner = self._create_aligner(img_ref, roi=(320, 0, 640, 360))
+
+        H, status = aligner.find_homography(img)
+        pt = cv2.perspectiveTransform(np.float32([[[480, 180]]]), H)
+        assert np.max(np.abs(pt[0][0] - (483, 182))) < 1.0
+
+        calls = []
+
+        def validate_func(img_aligned):
+            calls.append(img_aligned)
+            return True
+
+        assert aligner.align(img, validate_func=validate_func,
+                             size=(640, 360)) is not None
+        M = aligner._last_M
+
+        # The cached homography is used while it validates.
+        aligner.find_homography = None
+        assert aligner.align(img, validate_func=validate_func,
+                             size=(640, 360)) is not None
+        assert aligner._last_M is M
+        assert len(calls) == 2
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+#  Unit test for FluentdForwarder.
+#  Usage:
+#    python ./test_fluentd_forwarder.py
+#  or
+#    py.test ./test_fluentd_forwarder.py
+
+import io
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+
+import umsgpack
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.fluentd_forwarder import FluentdForwarder
+
+
+class FluentdStandIn(object):
+    """
+    Local stand-in for the Fluentd in_forward input. Acks every message.
+    """
+
+    def _serve(self, conn):
+        f = conn.makefile('rb')
+        try:
+            while True:
+                message = umsgpack.unpack(f)
+                self.messages.append(message)
+                conn.sendall(umsgpack.packb({'ack': message[2]['chunk']}))
+        except (umsgpack.InsufficientDataException, OSError):
+            pass
+        finally:
+            f.close()
+            conn.close()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, addr = self.sock.accept()
+            except OSError:
+                return
+            thread = threading.Thread(target=self._serve, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def records(self):
+        records = []
+        for tag, entries, option in self.messages:
+            f = io.BytesIO(entries)
+            for i in range(option['size']):
+                records.append((tag, umsgpack.unpack(f)[1]))
+        return records
+
+    def close(self):
+        self.sock.close()
+
+    def __init__(self, port=0):
+        self.messages = []
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.sock.listen(1)
+        self.port = self.sock.getsockname()[1]
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+
+def _unused_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class TestFluentdForwarder(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer_dir = tempfile.mkdtemp()
+        self.server = None
+
+    def tearDown(self):
+        if self.server:
+            self.server.close()
+        shutil.rmtree(self.buffer_dir)
+
+    def test_packed_forward(self):
+        self.server = FluentdStandIn()
+        forwarder = FluentdForwarder(port=self.server.port,
+                                     flush_interval=60)
+
+        forwarder.emit('ikalog.gameresult', {'result': 'win'})
+        forwarder.emit('ikalog.gameresult', {'result': 'lose'})
+        forwarder.emit('ikalog.other', {'a': 1})
+        self.assertEqual(self.server.messages, [])
+
+        self.assertTrue(forwarder.flush(timeout=10))
+        forwarder.close()
+
+        # One message per tag.
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertCountEqual(self.server.records(), [
+            ('ikalog.gameresult', {'result': 'win'}),
+            ('ikalog.gameresult', {'result': 'lose'}),
+            ('ikalog.other', {'a': 1}),
+        ])
+
+        metrics = forwarder.get_metrics()
+        self.assertEqual(metrics['sent_records'], 3)
+        self.assertEqual(metrics['sent_chunks'], 2)
+        self.assertEqual(metrics['buffered_records'], 0)
+
+    def test_flush_size(self):
+        self.server = FluentdStandIn()
+        forwarder = FluentdForwarder(port=self.server.port,
+                                     flush_size=1, flush_interval=60)
+        forwarder.emit('ikalog.gameresult', {'result': 'win'})
+
+        # Flushed without waiting for flush_interval.
+        self.assertTrue(forwarder.flush(timeout=10))
+        forwarder.close()
+        self.assertEqual(len(self.server.records()), 1)
+
+    def test_retry_and_resume(self):
+        port = _unused_port()
+        forwarder = FluentdForwarder(port=port, buffer_dir=self.buffer_dir,
+                                     flush_interval=0, retry_interval=0.05)
+        forwarder.emit('ikalog.gameresult', {'result': 'win'})
+
+        # Fluentd is down; the chunk is kept on the disk.
+        self.assertFalse(forwarder.flush(timeout=0.5))
+        forwarder.close()
+        self.assertGreater(forwarder.get_metrics()['retries'], 0)
+        self.assertEqual(len(os.listdir(self.buffer_dir)), 1)
+
+        # Sent on the next start.
+        self.server = FluentdStandIn(port)
+        forwarder = FluentdForwarder(port=port, buffer_dir=self.buffer_dir)
+        forwarder.start()
+        self.assertTrue(forwarder.flush(timeout=10))
+        forwarder.close()
+
+        self.assertEqual(self.server.records(),
+                         [('ikalog.gameresult', {'result': 'win'})])
+        self.assertEqual(os.listdir(self.buffer_dir), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -338,6 +338,12 @@ class TestIkaUtils(unittest.TestCase):
         self.assertEqual({'key': [[1, 11], [2, 7]], 'key2': [[1, 13]]},
                          mock_context['game']['events'])
 
+    def test_add_event_without_game_start(self):
+        mock_context = {'game': {'start_offset_msec': None},
+                        'engine': {'msec': 1000}}
+        IkaUtils.add_event(mock_context, 'objective', 3)
+        self.assertEqual({}, mock_context['game']['events'])
+
     def test_get_file_name(self):
         mock_context = {'game': {'index': 0},
                         'engine': {'source_file': None}}
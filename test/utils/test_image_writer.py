@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+#  Unit test for ImageWriter.
+#  Usage:
+#    python ./test_image_writer.py
+#  or
+#    py.test ./test_image_writer.py
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.image_writer import ImageWriter, get_image_writer
+
+
+class TestImageWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.img = np.zeros((72, 128, 3), np.uint8)
+        self.img[10:20, 10:20] = (0, 0, 255)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _path(self, name):
+        return os.path.join(self.tmp_dir, name)
+
+    def test_write_image(self):
+        writer = ImageWriter()
+        img = self.img.copy()
+        written = []
+        writer.write_image(self._path('a.png'), img,
+                           callback=lambda f, s: written.append((f, s)))
+        writer.write_file(self._path('b.bin'), b'data')
+
+        # The image is copied; the caller may reuse it.
+        img[:] = 255
+
+        writer.flush()
+        self.assertEqual(written, [(self._path('a.png'), True)])
+        self.assertTrue(np.array_equal(
+            cv2.imread(self._path('a.png')), self.img))
+        with open(self._path('b.bin'), 'rb') as f:
+            self.assertEqual(f.read(), b'data')
+        self.assertEqual(writer.get_stats()['written'], 2)
+        writer.close()
+
+    def test_format(self):
+        writer = ImageWriter(format='jpg', jpeg_quality=90)
+        writer.write_image(self._path('a.png'), self.img)
+        writer.flush()
+
+        with open(self._path('a.jpg'), 'rb') as f:
+            self.assertEqual(f.read(2), b'\xff\xd8')
+        self.assertFalse(os.path.exists(self._path('a.png')))
+        writer.close()
+
+    def test_drop_policy(self):
+        writer = ImageWriter(num_workers=1, max_queue=1, policy='drop')
+
+        # Stall the worker.
+        event = threading.Event()
+        writer.write_image(self._path('0.png'), self.img,
+                           callback=lambda f, s: event.wait())
+        while writer.get_stats()['pending'] > 0:
+            pass
+
+        self.assertTrue(writer.write_image(self._path('1.png'), self.img))
+        self.assertFalse(writer.write_image(self._path('2.png'), self.img))
+        self.assertEqual(writer.get_stats()['dropped'], 1)
+
+        event.set()
+        writer.close()
+        self.assertTrue(os.path.exists(self._path('1.png')))
+        self.assertFalse(os.path.exists(self._path('2.png')))
+
+    def test_errors(self):
+        writer = ImageWriter(num_workers=0)
+        self.assertTrue(writer.write_image(
+            self._path('no_such_dir/a.png'), self.img))
+        self.assertEqual(writer.get_stats()['errors'], 1)
+
+    def test_get_image_writer(self):
+        class Engine(object):
+            def get_service(self, name):
+                return writer
+
+        writer = ImageWriter()
+        self.assertIs(get_image_writer({'engine': {'engine': Engine()}}),
+                      writer)
+
+        # Falls back to the synchronous writer.
+        fallback = get_image_writer({})
+        self.assertEqual(fallback.num_workers, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for player_name.
+#  Usage:
+#    python ./test_player_name.py
+#  or
+#    py.test ./test_player_name.py
+
+import os
+import sys
+import unittest
+
+import cv2
+import numpy as np
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.player_name import *
+
+
+class TestPlayerNameClassifier(unittest.TestCase):
+
+    def _render_name(self, name):
+        img = np.zeros((30, 250, 3), dtype=np.uint8)
+        cv2.putText(img, name, (2, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                    (255, 255, 255), 2)
+        return normalize_player_name(img)
+
+    def test_predict(self):
+        names = ['hasegaw', 'IkaLog', 'splatoon', 'Squid']
+        img_names = list(map(self._render_name, names))
+
+        classifier = PlayerNameClassifier(img_names)
+
+        for i in range(len(names)):
+            assert classifier.predict(img_names[i]) == i
+            index, confidence = classifier.match(img_names[i])
+            assert index == i
+            assert confidence == 1.0
+
+        # Batch
+        results = classifier.match_list(list(reversed(img_names)))
+        assert [r[0] for r in results] == [3, 2, 1, 0]
+
+    def test_predict_uncertain(self):
+        img_name = self._render_name('hasegaw')
+
+        # Two identical templates; the match is ambiguous.
+        classifier = PlayerNameClassifier([img_name, img_name])
+        assert classifier.predict(img_name) is None
+
+        # Blank templates never match.
+        classifier = PlayerNameClassifier([None])
+        assert classifier.predict(img_name) is None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+
+#  Unit test for StatInkSpool.
+#  Usage:
+#    python ./test_statink_spool.py
+#  or
+#    py.test ./test_statink_spool.py
+
+import http.server
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+import umsgpack
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.statink_spool import StatInkSpool
+from ikalog.utils.statink_uploader import PackPayload
+
+
+class StatInkStandIn(http.server.ThreadingHTTPServer):
+    """
+    Local stand-in for the stat.ink API. Responds with the statuses in
+    self.statuses, then 200.
+    """
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            server = self.server
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            with server.lock:
+                server.bodies.append(body)
+                status = server.statuses.pop(0) if server.statuses else 200
+
+            if status == 200:
+                response = {'id': len(server.bodies), 'url': 'http://test/'}
+            else:
+                response = {'error': {'status': status}}
+            data = json.dumps(response).encode('utf-8')
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    def __init__(self, statuses=None):
+        super(StatInkStandIn, self).__init__(
+            ('127.0.0.1', 0), StatInkStandIn.Handler)
+        self.lock = threading.Lock()
+        self.statuses = list(statuses or [])
+        self.bodies = []
+        self.url = 'http://127.0.0.1:%d/api/v1/battle' % self.server_port
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TestStatInkSpool(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.results = []
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.spool_dir)
+
+    def _callback(self, job, error, response, context):
+        self.results.append((job, error, response, context))
+
+    def _create_spool(self, statuses=None):
+        self.server = StatInkStandIn(statuses)
+        return StatInkSpool(self.spool_dir, url=self.server.url,
+                            retry_interval=0.01, callback=self._callback)
+
+    def _spooled_files(self):
+        return sorted(filter(lambda f: f.endswith('.msgpack'),
+                             os.listdir(self.spool_dir)))
+
+    def test_upload(self):
+        spool = self._create_spool()
+        body = PackPayload({'rule': 'area'}, 'API_KEY', dry_run=True)
+
+        job = spool.put(body, context='context')
+        self.assertTrue(spool.wait(timeout=10))
+        spool.stop()
+
+        # The raw msgpack bytes are posted.
+        self.assertEqual(self.server.bodies, [body])
+        payload = umsgpack.unpackb(self.server.bodies[0])
+        self.assertEqual(payload['apikey'], 'API_KEY')
+        self.assertEqual(payload['test'], 'dry_run')
+
+        self.assertEqual(self.results, [
+            (job, False, {'id': 1, 'url': 'http://test/'}, 'context')])
+        self.assertEqual(self._spooled_files(), [])
+
+    def test_retry(self):
+        spool = self._create_spool(statuses=[503, 500])
+        spool.put(b'\x80')
+        self.assertTrue(spool.wait(timeout=10))
+        spool.stop()
+
+        self.assertEqual(len(self.server.bodies), 3)
+        self.assertEqual(len(self.results), 1)
+        self.assertFalse(self.results[0][1])
+        self.assertEqual(self._spooled_files(), [])
+
+    def test_rejected(self):
+        spool = self._create_spool(statuses=[400])
+        job = spool.put(b'\x80')
+        self.assertTrue(spool.wait(timeout=10))
+        spool.stop()
+
+        self.assertEqual(len(self.server.bodies), 1)
+        self.assertTrue(self.results[0][1])
+        self.assertEqual(self._spooled_files(), [])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.spool_dir, 'failed', job)))
+
+    def test_resume(self):
+        # Payloads left by the last run, and an incomplete write.
+        for name in ['20160101_000000_a.msgpack', '20160101_000001_b.msgpack']:
+            f = open(os.path.join(self.spool_dir, name), 'wb')
+            f.write(name.encode('utf-8'))
+            f.close()
+        f = open(os.path.join(self.spool_dir, 'c.msgpack.tmp'), 'wb')
+        f.close()
+
+        spool = self._create_spool()
+        spool.start()
+        self.assertTrue(spool.wait(timeout=10))
+        spool.stop()
+
+        self.assertEqual(sorted(self.server.bodies), [
+            b'20160101_000000_a.msgpack', b'20160101_000001_b.msgpack'])
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_unreachable(self):
+        self.server = StatInkStandIn()
+        spool = StatInkSpool(self.spool_dir, url='http://127.0.0.1:1/',
+                             max_retries=2, retry_interval=0.01,
+                             callback=self._callback)
+        job = spool.put(b'\x80')
+        self.assertTrue(spool.wait(timeout=10))
+        spool.stop()
+
+        # The payload stays in the spool for the next run.
+        self.assertTrue(self.results[0][1])
+        self.assertEqual(self._spooled_files(), [job])
+
+if __name__ == '__main__':
+    unittest.main()
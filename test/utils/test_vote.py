@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+#  IkaLog
+#  ======
+#  Copyright (C) 2016 Takeshi HASEGAWA
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+#  Unit test for VoteAccumulator.
+#  Usage:
+#    python ./test_vote.py
+#  or
+#    py.test ./test_vote.py
+
+import os
+import sys
+import unittest
+
+# Append the Ikalog root dir to sys.path to import IkaUtils.
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
+from ikalog.utils.vote import VoteAccumulator
+
+
+class TestVoteAccumulator(unittest.TestCase):
+
+    def test_margin(self):
+        votes = VoteAccumulator(min_votes=3, margin=2)
+
+        assert votes.get_winner() == (None, None)
+
+        # a: 3, b: 2; not enough margin.
+        for key in ['a', 'b', 'a', None, 'b', 'a']:
+            assert not votes.vote(key)
+        assert votes.votes == {'a': 3, 'b': 2}
+
+        assert votes.vote('a')
+
+    def test_settle(self):
+        votes = VoteAccumulator(min_votes=3, margin=2)
+
+        for key in ['a', 'b', 'a']:
+            assert not votes.vote(key)
+        assert votes.vote('a')
+
+        # Votes after settlement are ignored.
+        assert votes.vote('b')
+        assert votes.votes == {'a': 3, 'b': 1}
+
+        key, accuracy = votes.get_winner()
+        assert key == 'a'
+        assert 0.5 < accuracy < 1.0
+
+        votes.reset()
+        assert not votes.is_settled()
+        assert votes.votes == {}
+
+    def test_max_votes(self):
+        votes = VoteAccumulator(min_votes=3, margin=3, max_votes=4)
+
+        for key in ['a', 'b', 'a']:
+            assert not votes.vote(key)
+        assert votes.vote('b')
+        assert votes.num_votes == 4
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -19,200 +19,299 @@
 #
 
 # IkaLogを各種シーンを自動的に抜き出す
+#
+# 使い方
+#   python tools/IkaClips.py [--jobs 4] [--out_dir ./] video1.mp4 video2.mp4 ...
+#
+# 複数のファイルをワーカープロセスで並列に分析し、見つかったクリップを
+# マージしてから ffmpeg で切り出します。切り出しはキーフレーム位置からの
+# ストリームコピーなので、再エンコードしません。
+# ffmpeg と ffprobe が必要です。
 
-import sys
+import argparse
 import os
 import pprint
+import subprocess
+import sys
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, \
+    as_completed
 
 sys.path.append('.')
 
-from ikalog.inputs.cvcapture import *
-from ikalog.engine import *
-from ikalog.outputs.preview import *
+from ikalog.engine import IkaEngine
+from ikalog.inputs import CVFile
+from ikalog.inputs.video_index import VideoIndex
 from ikalog.utils import *
 
 
-class IkaClips:
+class IkaClips(object):
+    """
+    Collects the clips in a video file, as an output plugin of IkaEngine.
+    """
+
+    # (pre-roll, post-roll) in seconds.
+    clip_windows = {
+        'kill': (6.0, 2.5),
+        'death': (6.0, 2.5),
+        'finish': (6.0, 10.0),
+    }
+
+    def _add_clip(self, clip_type, start, end):
+        self.clips.append({
+            'file': self.file,
+            'type': clip_type,
+            'start': start,
+            'end': end,
+        })
+
+    def _add_event_clip(self, context, clip_type):
+        pre_roll, post_roll = self.clip_windows[clip_type]
+        msec = context['engine']['msec']
+        self._add_clip(clip_type, msec - pre_roll * 1000,
+                       msec + post_roll * 1000)
 
     def on_game_start(self, context):
         self.t_GameStart = context['engine']['msec']
 
     def on_game_go_sign(self, context):
-        start = context['engine'][
-            'msec'] if not self.t_GameStart else self.t_GameStart
+        msec = context['engine']['msec']
+        start = msec if not self.t_GameStart else self.t_GameStart
+        self.t_GameStart = None
 
-        clip = {
-            'file': self.file,
-            'type': 'GameStart',
-            'start': start - 5 * 1000,
-            'end': context['engine']['msec'] + 1 * 1000,
-        }
-        self.clips.append(clip)
+        self._add_clip('GameStart', start - 5 * 1000, msec + 1 * 1000)
 
-    def on_game_killed(self, context):
-        clip = {
-            'file': self.file,
-            'type': 'kill',
-            'start': context['engine']['msec'] - 6 * 1000,
-            'end': context['engine']['msec'] + 2.5 * 1000,
-        }
-        self.clips.append(clip)
+    def on_game_killed(self, context, params=None):
+        self._add_event_clip(context, 'kill')
 
     def on_game_dead(self, context):
-        clip = {
-            'file': self.file,
-            'type': 'death',
-            'start': context['engine']['msec'] - 6 * 1000,
-            'end': context['engine']['msec'] + 2.5 * 1000,
-        }
-        self.clips.append(clip)
+        self._add_event_clip(context, 'death')
 
     def on_game_finish(self, context):
-        clip = {
-            'file': self.file,
-            'type': 'finish',
-            'start': context['engine']['msec'] - 6 * 1000,
-            'end': context['engine']['msec'] + 10 * 1000,
-        }
-        self.clips.append(clip)
+        self._add_event_clip(context, 'finish')
 
     def on_frame_read_failed(self, context):
         self.engine.stop()
 
-    def on_game_individual_result(self, context):
-        # 強制的にキャプチャを閉じて IkaEngine も止める
-        self.engine.capture.cap.release()
-        self.engine.capture.cap = None
-        self.engine.stop()
-
-    def merge(self):
-        # クリップをマージ
-
-        new_clips = []
-        last_clip = None
-        for clip in self.clips:
-            if last_clip and last_clip['end'] < clip['start']:
-                new_clips.append(last_clip)
-                last_clip = None
-
-            if last_clip is None:
-                last_clip = clip
-                continue
-
-            if clip['start'] < last_clip['end']:
-                last_clip['type'] = '%s+%s' % (last_clip['type'], clip['type'])
-                last_clip['end'] = clip['end']
-
-        if not last_clip is None:
-            new_clips.append(last_clip)
-
-        IkaUtils.dprint('%d clips are merged to %d clips.' %
-                        (len(self.clips), len(new_clips)))
-
-        self.clips = new_clips
-
-    def analyze(self, file):
-        self.file = file
-        self.clips = []
-        self.t_GameStart = None
-
+    def analyze(self, fps=None):
         # インプットとして指定されたファイルを読む
-        source = CVCapture()
-        source.start_recorded_file(file)
-        source.need_resize = True
-
-        # 画面が見えないと進捗が判らないので
-        screen = Screen(0, size=(640, 360))
-
-        # プラグインとして自分自身（画面）を設定しコールバックを受ける
-        outputPlugins = [self, screen]
+        source = CVFile()
+        source.select_source(name=self.file)
+        source.set_frame_rate(fps)
 
-        # IkaEngine を実行
+        # プラグインとして自分自身を設定しコールバックを受ける
+        # 一日分の録画に複数の試合が含まれるので、ファイルの終端まで読む
         self.engine = IkaEngine()
         self.engine.pause(False)
         self.engine.set_capture(source)
-        self.engine.set_plugins(outputPlugins)
+        self.engine.set_plugins([self])
         try:
             self.engine.run()
-        except:
-            pass
-            # print('IkaEngineが落ちたので分析終了です')
-
-        IkaUtils.dprint('%d clips found.' % (len(self.clips)))
-
-    _cut_number = 0
-
-    def msec2time(self, msec):
-        sec = int(msec / 100.0) / 10.0
-        if (sec <= 0.0):
-            return '00:00:00.0'
-
-        hh = '{0:02d}'.format(int(sec / 3600))
-        mm = '{0:02d}'.format(int(sec / 60) % 60)
-        ss = '{0:02d}'.format(int(sec % 60))
-        ms = int((sec - int(sec)) * 10)
-        s = '%s:%s:%s.%s' % (hh, mm, ss, ms)
-        return s
-
-    def duration(self, msec1, msec2):
-        duration = max(msec1, msec2) - min(msec1, msec2)
-        duration = int(duration / 100.0) / 10.0
-        return '%.1f' % duration
-
-    def cutVideoFile1(self, clip):
-        self._cut_number = self._cut_number + 1
+        except Exception:
+            IkaUtils.dprint('%s: IkaEngine stopped with an exception' %
+                            self.file)
+            IkaUtils.dprint(traceback.format_exc())
 
-        srcname, ext = os.path.splitext(os.path.basename(self.file))
-        destfile = os.path.join(self.tmp_dir, '%s.%d.%s.avi' % (
-            srcname, self._cut_number, clip['type']))
+        IkaUtils.dprint('%s: %d clips found.' % (self.file, len(self.clips)))
+        return self.clips
 
-        at = self.msec2time(clip['start'])
-        dur = self.duration(clip['start'], clip['end'])
-
-        cmd = 'ffmpeg -y -i %s -ss %s -t %s -f avi -acodec copy -vcodec huffyuv %s' % (
-            clip['file'], at, dur, destfile)
-        IkaUtils.dprint(cmd)
-
-        os.system(cmd)
-
-        clip['file_out'] = destfile
-
-    def cutVideoFile(self):
-        IkaUtils.dprint('Cutting clips from original file...')
-        for clip in self.clips:
-            self.cutVideoFile1(clip)
-
-    def concatenateClips(self):
-        IkaUtils.dprint('Concatinating clips...')
-        srcname, ext = os.path.splitext(os.path.basename(self.file))
-        destfile = os.path.join(self.out_dir, srcname + '.summary.mp4')
-
-        files = []
-        for clip in self.clips:
-            files.append(clip['file_out'])
-
-        args_i = '-i "concat:%s|"' % ("|".join(files))
+    def __init__(self, file):
+        self.file = file
+        self.clips = []
+        self.t_GameStart = None
+        self.engine = None
+
+
+def merge(clips):
+    """
+    Merge the overlapping clips of a file. Returns the new list.
+    """
+    new_clips = []
+    last_clip = None
+    for clip in sorted(clips, key=lambda c: c['start']):
+        if (last_clip is not None) and (clip['start'] <= last_clip['end']):
+            last_clip['type'] = '%s+%s' % (last_clip['type'], clip['type'])
+            last_clip['end'] = max(last_clip['end'], clip['end'])
+            continue
+
+        if last_clip is not None:
+            new_clips.append(last_clip)
+        last_clip = dict(clip)
+
+    if last_clip is not None:
+        new_clips.append(last_clip)
+
+    IkaUtils.dprint('%d clips are merged to %d clips.' %
+                    (len(clips), len(new_clips)))
+    return new_clips
+
+
+def align_clips(clips, index):
+    """
+    Move the start of the clips back to keyframes, so that they can be
+    cut by stream copy. The clips are kept as is if keyframes are unknown.
+    """
+    for clip in clips:
+        start = max(clip['start'], 0)
+        end = clip['end']
+
+        if index is not None and index.num_frames() > 0:
+            keyframe = index.keyframe_before(index.frame_at(start))
+            if keyframe is not None:
+                start = index.timestamp(keyframe)
+            end = min(end, index.get_duration_msec())
+
+        clip['cut_start'] = start
+        clip['cut_end'] = max(end, start)
+
+    return clips
+
+
+def analyze_file(file, fps=None, ffprobe_path='ffprobe'):
+    """
+    Analyze a file in a worker process. Returns the merged clips.
+    """
+    clips = merge(IkaClips(file).analyze(fps))
+    index = VideoIndex.open(file, ffprobe_path=ffprobe_path)
+    if index is None:
+        IkaUtils.dprint('%s: Keyframes are unknown; ffmpeg cuts at the '
+                        'keyframes before the clips.' % file)
+    return align_clips(clips, index)
+
+
+def run_ffmpeg(args, ffmpeg_path='ffmpeg'):
+    cmd = [ffmpeg_path, '-y', '-v', 'error'] + args
+    IkaUtils.dprint(' '.join(cmd))
+    return subprocess.call(cmd, stdin=subprocess.DEVNULL) == 0
+
+
+def cut_clip(clip, destfile, ffmpeg_path='ffmpeg'):
+    start = clip['cut_start'] / 1000.0
+    duration = (clip['cut_end'] - clip['cut_start']) / 1000.0
+
+    # Input seeking (-ss before -i) with stream copy starts at the
+    # keyframe; the clips are aligned to keyframes in advance.
+    return run_ffmpeg([
+        '-ss', '%.3f' % start,
+        '-i', clip['file'],
+        '-t', '%.3f' % duration,
+        '-map', '0',
+        '-c', 'copy',
+        '-avoid_negative_ts', 'make_zero',
+        destfile,
+    ], ffmpeg_path)
+
+
+def concatenate_clips(files, destfile, ffmpeg_path='ffmpeg'):
+    fd, list_file = tempfile.mkstemp(suffix='.txt', prefix='ikaclips_')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for file in files:
+                path = os.path.abspath(file).replace("'", "'\\''")
+                f.write("file '%s'\n" % path)
+
+        return run_ffmpeg([
+            '-f', 'concat', '-safe', '0',
+            '-i', list_file,
+            '-map', '0',
+            '-c', 'copy',
+            destfile,
+        ], ffmpeg_path)
+    finally:
+        os.remove(list_file)
+
+
+def cut_file(file, clips, out_dir, keep_clips=False, ffmpeg_path='ffmpeg'):
+    """
+    Cut the clips from the file, and concatenate them into
+    <out_dir>/<name>.summary<ext>. Returns the summary file, or None.
+    """
+    if len(clips) == 0:
+        return None
+
+    srcname, ext = os.path.splitext(os.path.basename(file))
+    clip_dir = out_dir if keep_clips else tempfile.mkdtemp(prefix='ikaclips_')
+
+    clip_files = []
+    try:
+        for n, clip in enumerate(clips):
+            destfile = os.path.join(clip_dir, '%s.%d.%s%s' % (
+                srcname, n + 1, clip['type'], ext))
+            if cut_clip(clip, destfile, ffmpeg_path):
+                clip['file_out'] = destfile
+                clip_files.append(destfile)
+            else:
+                IkaUtils.dprint('%s: Failed to cut %s' % (file, destfile))
+
+        destfile = os.path.join(out_dir, srcname + '.summary' + ext)
+        if clip_files and concatenate_clips(clip_files, destfile, ffmpeg_path):
+            return destfile
+        return None
+
+    finally:
+        if not keep_clips:
+            for clip_file in clip_files:
+                os.remove(clip_file)
+            os.rmdir(clip_dir)
+
+
+def get_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+', type=str)
+    parser.add_argument('--jobs', '-j', dest='jobs', type=int,
+                        default=os.cpu_count() or 1,
+                        help='Number of files analyzed in parallel.')
+    parser.add_argument('--fps', dest='fps', type=float, default=10,
+                        help='Frames per second to analyze (0: all).')
+    parser.add_argument('--out_dir', '-o', dest='out_dir', type=str,
+                        default='./')
+    parser.add_argument('--keep_clips', dest='keep_clips',
+                        action='store_true', default=False,
+                        help='Keep the individual clips in out_dir.')
+    parser.add_argument('--ffmpeg', dest='ffmpeg_path', type=str,
+                        default='ffmpeg')
+    parser.add_argument('--ffprobe', dest='ffprobe_path', type=str,
+                        default='ffprobe')
+
+    return vars(parser.parse_args())
+
+
+def main():
+    args = get_args()
+    fps = args['fps'] or None
+    jobs = max(args['jobs'], 1)
+    os.makedirs(args['out_dir'], exist_ok=True)
+
+    # Analyze the files in worker processes, and cut the clips of each file
+    # as soon as its analysis is done. Cutting is I/O bound.
+    with ProcessPoolExecutor(max_workers=jobs) as analyzers, \
+            ThreadPoolExecutor(max_workers=jobs) as cutters:
+        futures = {
+            analyzers.submit(analyze_file, file, fps, args['ffprobe_path']):
+            file for file in args['files']
+        }
 
-        cmd = 'ffmpeg -y %s -vf scale=640:360 -f mp4 -c:v libx264 -b:v 1M -c:a copy %s' % (
-            args_i, destfile)
-        IkaUtils.dprint(cmd)
+        cuts = []
+        for future in as_completed(futures):
+            file = futures[future]
+            try:
+                clips = future.result()
+            except Exception:
+                IkaUtils.dprint('%s: Failed to analyze' % file)
+                IkaUtils.dprint(traceback.format_exc())
+                continue
 
-        os.system(cmd)
+            pprint.pprint(clips)
+            cuts.append(cutters.submit(
+                cut_file, file, clips, args['out_dir'],
+                args['keep_clips'], args['ffmpeg_path']))
 
-        for clip in self.clips:
-            os.remove(clip['file_out'])
+        for future in as_completed(cuts):
+            summary = future.result()
+            if summary is not None:
+                IkaUtils.dprint('Wrote %s' % summary)
 
-    def __init__(self):
-        self.scenes = []
-        self.tmp_dir = '/tmp/'
-        self.out_dir = './'
 
 if __name__ == "__main__":
-    for file in sys.argv[1:]:
-        clips = IkaClips()
-        clips.analyze(file)
-        pprint.pprint(clips.clips)
-        clips.merge()
-        pprint.pprint(clips.clips)
-        clips.cutVideoFile()
-        clips.concatenateClips()
+    main()
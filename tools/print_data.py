@@ -24,6 +24,7 @@
 #    ./tools/print_data.py --statink statink.msgpack
 #    ./tools/print_data.py --tsv --json ika.json
 #    ./tools/print_data.py --tsv --tsv_format reslut,kill,death --json ika.json
+#    ./tools/print_data.py --tsv --db ika.sqlite --rule area --since 2016-05-01
 
 import argparse
 import json
@@ -37,6 +38,7 @@ import umsgpack
 # Append the Ikalog root dir to sys.path to import IkaUtils.
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 from ikalog.utils.ikautils import IkaUtils
+from ikalog.utils.event_store import EventStore
 
 FORMAT_DICT = {
     'TEXT': ('end_at_text,lobby_text,rule_text,map_text,weapon_text,'
@@ -54,10 +56,23 @@ def get_args():
     group.add_argument('--statink', dest='statink',
                        metavar='STATINK_PAYLOAD_FILE', type=str)
     group.add_argument('--json', dest='json', metavar='JSON_FILE', type=str)
+    group.add_argument('--db', dest='db', metavar='SQLITE_FILE', type=str)
     parser.add_argument('--tsv', action='store_true', default=False)
     parser.add_argument('--tsv_format', type=str, default=FORMAT_DICT['TEXT'],
                         help='format separated by commna, otherwise TEXT or ID')
 
+    # Conditions for --db
+    parser.add_argument('--map', type=str)
+    parser.add_argument('--rule', type=str)
+    parser.add_argument('--weapon', type=str)
+    parser.add_argument('--lobby', type=str)
+    parser.add_argument('--result', type=str, choices=['win', 'lose'])
+    parser.add_argument('--since', type=str, metavar='YYYY-MM-DD')
+    parser.add_argument('--until', type=str, metavar='YYYY-MM-DD')
+    parser.add_argument('--limit', type=int, help='the latest N games')
+    parser.add_argument('--events', action='store_true', default=False,
+                        help='print players and events of the games')
+
     return vars(parser.parse_args())
 
 
@@ -169,6 +184,52 @@ def print_json(filepath, tsv_format=None):
                 pprint.pprint(json_data)
 
 
+def get_db_summary(session):
+    summary = {}
+    summary['end_at'] = session['end_at']
+    for key in ['lobby', 'rule', 'map', 'result', 'weapon']:
+        summary[key] = session[key] or ''
+    summary['kill'] = '' if session['kills'] is None else session['kills']
+    summary['death'] = '' if session['deaths'] is None else session['deaths']
+    summary['rank_before'] = ((session['udemae_pre'] or '') +
+                              str(session['udemae_exp_pre'] or ''))
+    summary['rank_after'] = ((session['udemae_after'] or '') +
+                             str(session['udemae_exp_after'] or ''))
+    return summary
+
+
+def _parse_date(date_str):
+    if date_str is None:
+        return None
+    return time.mktime(time.strptime(date_str, '%Y-%m-%d'))
+
+
+def print_db(filepath, args, tsv_format=None):
+    store = EventStore(filepath)
+    sessions = store.query_sessions(
+        map=args.get('map'), rule=args.get('rule'),
+        weapon=args.get('weapon'), lobby=args.get('lobby'),
+        result=args.get('result'),
+        since=_parse_date(args.get('since')),
+        until=_parse_date(args.get('until')),
+        limit=args.get('limit'))
+
+    for session in sessions:
+        if tsv_format:
+            print_tsv(get_db_summary(session), tsv_format)
+        else:
+            pprint.pprint(session)
+
+        if args.get('events'):
+            pprint.pprint(store.get_players(session['id']))
+            for event in store.get_events(session['id']):
+                print('%8.1f\t%s\t%s' % (
+                    event[0] / 1000.0, event[1],
+                    '' if event[2] is None else json.dumps(event[2])))
+
+    store.close()
+
+
 def main():
     args = get_args()
     tsv_format = None
@@ -180,6 +241,8 @@ def main():
         print_statink(args['statink'], tsv_format)
     elif args.get('json'):
         print_json(args['json'], tsv_format)
+    elif args.get('db'):
+        print_db(args['db'], args, tsv_format)
 
 if __name__ == '__main__':
     main()